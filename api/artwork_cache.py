@@ -0,0 +1,79 @@
+"""
+Caché en memoria de portadas ya procesadas (JPEG reducido + paleta).
+
+Está acotada por número de entradas y por bytes (LRU) y la clave es la
+identidad canónica de la portada: la URL sin X-Plex-Token, para que la misma
+portada pedida con tokens distintos no se duplique.
+"""
+import os
+import base64
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+from api.cache import BoundedLRUCache
+
+THUMB_CACHE_MAX_ENTRIES = int(os.getenv('THUMB_CACHE_MAX_ENTRIES', '512'))
+THUMB_CACHE_MAX_BYTES = int(os.getenv('THUMB_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+
+_TOKEN_PARAMS = ('x-plex-token',)
+
+
+def canonical_artwork_key(url):
+    """Identidad de una portada independiente del token: host + ruta + query sin X-Plex-Token."""
+    if not url:
+        return None
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k.lower() not in _TOKEN_PARAMS)
+    key = f"{parts.netloc.lower()}{parts.path}"
+    if query:
+        key += '?' + urlencode(query)
+    return key
+
+
+class ArtworkEntry:
+    """Portada procesada: data URL (JPEG en base64) y paletas ya calculadas ({número de colores: paleta})."""
+    __slots__ = ('data_url', 'palettes')
+
+    def __init__(self, data_url, palettes=None):
+        self.data_url = data_url
+        self.palettes = palettes or {}
+
+    @property
+    def jpeg_bytes(self):
+        # Sólo guardamos el data URL; los bytes se recuperan cuando hacen falta
+        return base64.b64decode(self.data_url.split(',', 1)[1])
+
+    @property
+    def size(self):
+        return len(self.data_url)
+
+
+class ArtworkMemoryCache:
+    def __init__(self, max_entries=None, max_bytes=None):
+        self._cache = BoundedLRUCache(
+            max_entries=max_entries if max_entries is not None else THUMB_CACHE_MAX_ENTRIES,
+            max_bytes=max_bytes if max_bytes is not None else THUMB_CACHE_MAX_BYTES,
+            sizeof=lambda entry: entry.size,
+        )
+
+    def get(self, url):
+        key = canonical_artwork_key(url)
+        return self._cache.get(key) if key else None
+
+    def set(self, url, entry):
+        key = canonical_artwork_key(url)
+        if key:
+            self._cache.set(key, entry)
+        return entry
+
+    def clear(self):
+        self._cache.clear()
+
+    def info(self):
+        return self._cache.info()
+
+    def __len__(self):
+        return len(self._cache)
+
+    def __contains__(self, url):
+        key = canonical_artwork_key(url)
+        return bool(key) and key in self._cache
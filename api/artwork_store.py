@@ -0,0 +1,222 @@
+"""
+Almacén en disco de portadas, direccionado por contenido y compartido entre workers.
+
+Cada portada procesada (JPEG reducido) se guarda una vez por host como
+blobs/<hash del contenido>.jpg, junto con sus paletas en un .json. Un índice
+index/<hash de la identidad> apunta de la URL canónica (sin token) al hash de
+contenido. Las escrituras son atómicas (fichero temporal + rename), las
+lecturas usan mmap y el tamaño total se limita desalojando los blobs usados
+hace más tiempo, junto con sus paletas y las entradas del índice que apuntan
+a ellos.
+
+Cada proceso lleva una estimación del tamaño del almacén y sólo lo recorre
+entero cuando la estimación supera el límite o cada ARTWORK_EVICT_EVERY
+escrituras (para contar también lo que escriben los demás workers).
+"""
+import os
+import json
+import mmap
+import hashlib
+import tempfile
+import threading
+
+from api.artwork_cache import canonical_artwork_key
+
+ARTWORK_DISK_CACHE = os.getenv('ARTWORK_DISK_CACHE', 'true').lower() == 'true'
+ARTWORK_CACHE_DIR = os.getenv('ARTWORK_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'music2sig_artwork')
+ARTWORK_CACHE_MAX_BYTES = int(os.getenv('ARTWORK_CACHE_MAX_BYTES', str(128 * 1024 * 1024)))
+ARTWORK_EVICT_EVERY = int(os.getenv('ARTWORK_EVICT_EVERY', '64'))
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class ArtworkStore:
+    def __init__(self, root=None, max_bytes=None, evict_every=None):
+        self.root = root or ARTWORK_CACHE_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else ARTWORK_CACHE_MAX_BYTES
+        self.evict_every = evict_every if evict_every is not None else ARTWORK_EVICT_EVERY
+        self._index_dir = os.path.join(self.root, 'index')
+        self._blob_dir = os.path.join(self.root, 'blobs')
+        os.makedirs(self._index_dir, exist_ok=True)
+        os.makedirs(self._blob_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._approx_bytes = None  # None: aún sin recorrer el almacén
+        self._puts_since_scan = 0
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0, 'scans': 0, 'index_removed': 0}
+
+    def _index_path(self, url):
+        key = canonical_artwork_key(url)
+        return os.path.join(self._index_dir, _sha256(key.encode('utf-8'))) if key else None
+
+    def _blob_path(self, content_hash, ext='jpg'):
+        return os.path.join(self._blob_dir, f"{content_hash}.{ext}")
+
+    def get(self, url):
+        """Devuelve (jpeg_bytes, {número de colores: paleta}) o None si la portada no está en disco."""
+        index_path = self._index_path(url)
+        try:
+            with open(index_path, 'r', encoding='ascii') as fh:
+                content_hash = fh.read().strip()
+            data = self._read_mmap(self._blob_path(content_hash))
+        except (OSError, TypeError, ValueError):
+            self.stats['misses'] += 1
+            return None
+        self.stats['hits'] += 1
+        return data, self._read_palettes(content_hash)
+
+    def put(self, url, jpeg_bytes):
+        """Guarda la portada y apunta la identidad de `url` a su hash. Devuelve el hash."""
+        index_path = self._index_path(url)
+        if not index_path or not jpeg_bytes:
+            return None
+        content_hash = _sha256(jpeg_bytes)
+        try:
+            blob_path = self._blob_path(content_hash)
+            # Mismo contenido = mismo fichero: si ya existe no se reescribe
+            written = 0
+            if not os.path.exists(blob_path):
+                self._atomic_write(blob_path, jpeg_bytes)
+                written = len(jpeg_bytes)
+            self._atomic_write(index_path, content_hash.encode('ascii'))
+            self.stats['writes'] += 1
+            self._maybe_evict(written)
+        except OSError as e:
+            print(f"[ARTWORK] Error guardando portada en disco: {e}")
+            return None
+        return content_hash
+
+    def set_palette(self, url, count, palette):
+        index_path = self._index_path(url)
+        try:
+            with open(index_path, 'r', encoding='ascii') as fh:
+                content_hash = fh.read().strip()
+        except (OSError, TypeError):
+            # La portada no está en disco (p. ej. se desalojó): nada que anotar
+            return
+        try:
+            palettes = self._read_palettes(content_hash)
+            palettes[count] = palette
+            payload = {str(k): v for k, v in palettes.items()}
+            self._atomic_write(self._blob_path(content_hash, 'json'), json.dumps(payload).encode('utf-8'))
+        except OSError as e:
+            print(f"[ARTWORK] Error guardando paleta en disco: {e}")
+
+    def _read_mmap(self, path):
+        with open(path, 'rb') as fh:
+            size = os.fstat(fh.fileno()).st_size
+            if size == 0:
+                raise ValueError('blob vacío')
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                data = mm[:]
+        # Marca de uso para el desalojo LRU por mtime
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def _read_palettes(self, content_hash):
+        try:
+            with open(self._blob_path(content_hash, 'json'), 'r', encoding='utf-8') as fh:
+                return {int(k): v for k, v in json.load(fh).items()}
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def _atomic_write(self, path, data):
+        fd, tmp = tempfile.mkstemp(prefix='.tmp-', dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                fh.write(data)
+            os.replace(tmp, path)
+        except Exception:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+    def _maybe_evict(self, written):
+        with self._lock:
+            self._puts_since_scan += 1
+            if self._approx_bytes is not None:
+                self._approx_bytes += written
+                if self._approx_bytes <= self.max_bytes and self._puts_since_scan < self.evict_every:
+                    return
+            self._puts_since_scan = 0
+            self._approx_bytes = self._evict()
+
+    def _evict(self):
+        """Recorre el almacén, desaloja hasta caber en max_bytes y limpia el índice. Devuelve el tamaño final."""
+        self.stats['scans'] += 1
+        blobs = {}  # hash -> [mtime del jpg, bytes del jpg + json]
+        for entry in os.scandir(self._blob_dir):
+            if entry.name.startswith('.tmp-'):
+                continue
+            content_hash, _, ext = entry.name.rpartition('.')
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            item = blobs.setdefault(content_hash, [None, 0])
+            item[1] += st.st_size
+            if ext == 'jpg':
+                item[0] = st.st_mtime
+        total = sum(size for _, size in blobs.values())
+        # Paletas sin portada (mtime None) primero, luego los blobs menos usados
+        for content_hash, (mtime, size) in sorted(blobs.items(), key=lambda kv: (kv[1][0] is not None, kv[1][0] or 0)):
+            if mtime is not None and total <= self.max_bytes:
+                break
+            for ext in ('jpg', 'json'):
+                try:
+                    os.unlink(self._blob_path(content_hash, ext))
+                except OSError:
+                    pass
+            del blobs[content_hash]
+            total -= size
+            if mtime is not None:
+                self.stats['evictions'] += 1
+        self._prune_index(blobs)
+        return total
+
+    def _prune_index(self, live):
+        """Borra las entradas del índice que apuntan a blobs desalojados o que no existen."""
+        for entry in os.scandir(self._index_dir):
+            if entry.name.startswith('.tmp-'):
+                continue
+            try:
+                with open(entry.path, 'r', encoding='ascii') as fh:
+                    content_hash = fh.read().strip()
+            except (OSError, ValueError):
+                continue
+            if live.get(content_hash, (None,))[0] is not None:
+                continue
+            try:
+                os.unlink(entry.path)
+                self.stats['index_removed'] += 1
+            except OSError:
+                pass
+
+    def info(self):
+        return dict(self.stats, root=self.root, max_bytes=self.max_bytes, approx_bytes=self._approx_bytes)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_artwork_store():
+    """Almacén compartido, o None si ARTWORK_DISK_CACHE=false o el directorio no es usable."""
+    global _store
+    if not ARTWORK_DISK_CACHE:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                try:
+                    _store = ArtworkStore()
+                except OSError as e:
+                    print(f"[ARTWORK] Caché en disco desactivada: {e}")
+                    return None
+    return _store
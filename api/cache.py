@@ -0,0 +1,122 @@
+"""
+Caché LRU acotada por número de entradas y por bytes, con TTL por entrada.
+
+Base común de las cachés en memoria del proyecto (imágenes renderizadas,
+miniaturas...). Es segura entre hilos y lleva contadores de aciertos,
+fallos, desalojos y expiraciones.
+"""
+import time
+import threading
+from collections import OrderedDict
+
+
+def _default_sizeof(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value)
+    return 0
+
+
+class BoundedLRUCache:
+    def __init__(self, max_entries=256, max_bytes=None, ttl=None, sizeof=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._sizeof = sizeof or _default_sizeof
+        self._data = OrderedDict()  # key -> (value, size, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.last_update = None
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.stats['misses'] += 1
+                return default
+            value, size, expires_at = item
+            if expires_at is not None and time.time() >= expires_at:
+                self._remove(key)
+                self.stats['expirations'] += 1
+                self.stats['misses'] += 1
+                return default
+            self._data.move_to_end(key)
+            self.stats['hits'] += 1
+            return value
+
+    def peek(self, key):
+        """Devuelve (valor, expira_en) sin tocar contadores ni orden LRU, aunque haya expirado."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None, None
+            return item[0], item[2]
+
+    def set(self, key, value, ttl=None):
+        size = self._sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return False
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, size, expires_at)
+            self._bytes += size
+            self.last_update = time.time()
+            self._evict()
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            return self._remove(key)
+
+    def invalidate(self, predicate):
+        """Elimina las entradas cuya clave cumple predicate(key). Devuelve cuántas se borraron."""
+        with self._lock:
+            keys = [k for k in self._data if predicate(k)]
+            for k in keys:
+                self._remove(k)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        item = self._data.pop(key, None)
+        if item is None:
+            return False
+        self._bytes -= item[1]
+        return True
+
+    def _evict(self):
+        while self._data and (
+            (self.max_entries is not None and len(self._data) > self.max_entries)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            _, (_, size, _) = self._data.popitem(last=False)
+            self._bytes -= size
+            self.stats['evictions'] += 1
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def info(self):
+        with self._lock:
+            total = self.stats['hits'] + self.stats['misses']
+            return dict(
+                self.stats,
+                entries=len(self._data),
+                bytes=self._bytes,
+                max_entries=self.max_entries,
+                max_bytes=self.max_bytes,
+                hit_ratio=round(self.stats['hits'] / total, 4) if total else None,
+            )
@@ -0,0 +1,165 @@
+"""
+Pool de clientes Plex compartido por todo el proceso.
+
+Construir un PlexClient implica descubrir el servidor en plex.tv y crear un
+PlexServer (2-3 peticiones HTTP). El pool reutiliza los clientes ya
+descubiertos por token, con expiración por TTL, desalojo LRU y una
+revalidación periódica de salud. Un descubrimiento fallido se recuerda
+PLEX_CLIENT_FAILURE_TTL segundos para que un token inválido no repita las
+peticiones a plex.tv en cada petición.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+
+from api.plex_client import create_plex_client
+
+
+class PlexClientPool:
+    def __init__(self, max_size=None, ttl=None, health_interval=None, factory=None, failure_ttl=None):
+        self.max_size = max_size if max_size is not None else int(os.getenv('PLEX_CLIENT_POOL_SIZE', '16'))
+        self.ttl = ttl if ttl is not None else int(os.getenv('PLEX_CLIENT_TTL', '900'))
+        self.health_interval = health_interval if health_interval is not None else int(os.getenv('PLEX_CLIENT_HEALTH_INTERVAL', '120'))
+        self.failure_ttl = failure_ttl if failure_ttl is not None else float(os.getenv('PLEX_CLIENT_FAILURE_TTL', '30'))
+        self._factory = factory or create_plex_client
+        self._entries = OrderedDict()  # token -> {'client', 'created', 'checked'}
+        self._failures = OrderedDict()  # token -> (expira, cliente fallido)
+        self._lock = threading.Lock()
+        self._key_locks = {}  # sólo mientras hay un descubrimiento en curso para el token
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'revalidations': 0, 'failures': 0,
+                      'failure_hits': 0}
+
+    def _key(self, token):
+        return token or os.getenv('PLEX_TOKEN') or ''
+
+    def _key_lock(self, key):
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def get(self, token=None):
+        """Devuelve un cliente conectado para el token (o None si no se pudo crear)."""
+        key = self._key(token)
+        now = time.time()
+        entry = self._lookup(key, now)
+        if entry is not None:
+            return entry['client']
+        failed = self._recent_failure(key, now)
+        if failed is not None:
+            return failed[1]
+
+        # Un único hilo por token hace el descubrimiento; el resto espera y reutiliza
+        with self._key_lock(key):
+            try:
+                entry = self._lookup(key, time.time())
+                if entry is not None:
+                    return entry['client']
+                failed = self._recent_failure(key, time.time())
+                if failed is not None:
+                    return failed[1]
+                with self._lock:
+                    self.stats['misses'] += 1
+                client = self._factory(token)
+                now = time.time()
+                if not client or not client.is_connected():
+                    with self._lock:
+                        self.stats['failures'] += 1
+                        if self.failure_ttl > 0:
+                            self._failures[key] = (now + self.failure_ttl, client)
+                            while len(self._failures) > self.max_size:
+                                self._failures.popitem(last=False)
+                    return client
+                with self._lock:
+                    self._failures.pop(key, None)
+                    self._entries[key] = {'client': client, 'created': now, 'checked': now}
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_size:
+                        self._entries.popitem(last=False)
+                        self.stats['evictions'] += 1
+                return client
+            finally:
+                # Con la entrada (o el fallo) ya guardados, el lock del token sobra
+                with self._lock:
+                    self._key_locks.pop(key, None)
+
+    def _recent_failure(self, key, now):
+        """(expira, cliente) si el descubrimiento de key falló hace menos de failure_ttl."""
+        with self._lock:
+            failed = self._failures.get(key)
+            if failed is None:
+                return None
+            if now >= failed[0]:
+                del self._failures[key]
+                return None
+            self.stats['failure_hits'] += 1
+            return failed
+
+    def _lookup(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if now - entry['created'] >= self.ttl:
+                del self._entries[key]
+                self.stats['evictions'] += 1
+                return None
+            needs_check = now - entry['checked'] >= self.health_interval
+            if not needs_check:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry
+
+        # Revalidar fuera del lock global: ping() hace una petición al servidor
+        with self._lock:
+            self.stats['revalidations'] += 1
+        if entry['client'].ping():
+            with self._lock:
+                entry['checked'] = now
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+            return entry
+        self.invalidate(key)
+        return None
+
+    def has_client(self, token=None):
+        """True si ya hay un cliente conectado para el token (sin revalidarlo ni crearlo)."""
+        with self._lock:
+            return self._key(token) in self._entries
+
+    def invalidate(self, token=None):
+        key = self._key(token)
+        with self._lock:
+            self._failures.pop(key, None)
+            return self._entries.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._failures.clear()
+
+    def info(self):
+        with self._lock:
+            return dict(self.stats, size=len(self._entries), max_size=self.max_size,
+                        failed=len(self._failures), pending=len(self._key_locks))
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_client_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PlexClientPool()
+    return _pool
+
+
+def get_plex_client(token=None):
+    """Equivalente a create_plex_client pero reutilizando clientes del pool."""
+    return get_client_pool().get(token)
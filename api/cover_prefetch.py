@@ -0,0 +1,77 @@
+"""
+Precarga en segundo plano de las portadas del historial.
+
+Sin reproducción activa los endpoints rotan entre los primeros elementos del
+historial; cada paso de la rotación puede tocar una portada fría que se
+descargaría dentro de la petición. Cuando se descarga el historial, las
+portadas (y paletas) de la ventana de rotación se piden en paralelo en un
+pool de hilos, de forma que cada paso se renderiza desde la caché caliente.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from api.svg_generator import SVGGenerator
+
+COVER_PREFETCH = os.getenv('COVER_PREFETCH', 'true').lower() == 'true'
+COVER_PREFETCH_WORKERS = int(os.getenv('COVER_PREFETCH_WORKERS', '4'))
+
+
+class CoverPrefetcher:
+    def __init__(self, workers=None, warm=None, is_cached=None):
+        self.workers = workers if workers is not None else COVER_PREFETCH_WORKERS
+        self._warm = warm or SVGGenerator.warm_cover
+        self._is_cached = is_cached or SVGGenerator.has_cover
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='cover-prefetch')
+        self._inflight = set()
+        self._lock = threading.Lock()
+        self.stats = {'scheduled': 0, 'skipped': 0, 'completed': 0, 'failed': 0}
+
+    def prefetch(self, items):
+        """Encola la portada de cada elemento que no esté ya en caché ni en curso. Devuelve los futures."""
+        futures = []
+        for item in items or []:
+            thumb = (item or {}).get('thumb')
+            if not thumb:
+                continue
+            with self._lock:
+                if thumb in self._inflight or self._is_cached(thumb):
+                    self.stats['skipped'] += 1
+                    continue
+                self._inflight.add(thumb)
+                self.stats['scheduled'] += 1
+            futures.append(self._executor.submit(self._run, thumb, item))
+        return futures
+
+    def _run(self, thumb, item):
+        try:
+            ok = self._warm(item)
+        except Exception as e:
+            print(f"[PREFETCH] Error precargando portada: {e!r}")
+            ok = False
+        finally:
+            with self._lock:
+                self._inflight.discard(thumb)
+        with self._lock:
+            self.stats['completed' if ok else 'failed'] += 1
+        return ok
+
+    def info(self):
+        with self._lock:
+            return dict(self.stats, inflight=len(self._inflight), workers=self.workers)
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_cover_prefetcher():
+    """Precargador compartido, o None si COVER_PREFETCH=false."""
+    global _prefetcher
+    if not COVER_PREFETCH:
+        return None
+    if _prefetcher is None:
+        with _prefetcher_lock:
+            if _prefetcher is None:
+                _prefetcher = CoverPrefetcher()
+    return _prefetcher
@@ -0,0 +1,117 @@
+"""
+Caché persistente del descubrimiento de servidores en plex.tv.
+
+Guarda la URI del servidor, el token de acceso, la versión y el propietario
+para que una instancia nueva (p. ej. un cold start en Vercel) pueda conectar
+directamente con el servidor Plex. Usa Redis si REDIS_URL está definida y un
+fichero local en caso contrario.
+"""
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+
+from api.redis_store import get_redis
+
+DISCOVERY_CACHE_TTL = int(os.getenv('DISCOVERY_CACHE_TTL', '3600'))
+DISCOVERY_CACHE_FILE = os.getenv('DISCOVERY_CACHE_FILE') or os.path.join(tempfile.gettempdir(), 'music2sig_discovery.json')
+
+
+def _token_key(token):
+    # No guardamos el token en claro como clave
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()[:24]
+
+
+class DiscoveryCache:
+    def __init__(self, ttl=None, path=None, redis_client=None):
+        self.ttl = ttl if ttl is not None else DISCOVERY_CACHE_TTL
+        self.path = path or DISCOVERY_CACHE_FILE
+        self._redis = redis_client if redis_client is not None else get_redis()
+        self._lock = threading.Lock()
+
+    def _redis_key(self, token):
+        return f"music2sig:discovery:{_token_key(token)}"
+
+    def get(self, token):
+        if not token or self.ttl <= 0:
+            return None
+        try:
+            if self._redis:
+                raw = self._redis.get(self._redis_key(token))
+                if raw:
+                    print("[CACHE-HIT][redis] discovery")
+                    return json.loads(raw)
+                return None
+            entry = self._read_file().get(_token_key(token))
+            if entry and time.time() - entry.get('ts', 0) < self.ttl:
+                print("[CACHE-HIT][file] discovery")
+                return entry.get('data')
+        except Exception as e:
+            print(f"[DEBUG] Error leyendo caché de descubrimiento: {e}")
+        return None
+
+    def set(self, token, data):
+        if not token or not data or self.ttl <= 0:
+            return
+        try:
+            if self._redis:
+                self._redis.setex(self._redis_key(token), self.ttl, json.dumps(data))
+                return
+            with self._lock:
+                entries = self._read_file()
+                now = time.time()
+                entries = {k: v for k, v in entries.items() if now - v.get('ts', 0) < self.ttl}
+                entries[_token_key(token)] = {'ts': now, 'data': data}
+                self._write_file(entries)
+        except Exception as e:
+            print(f"[DEBUG] Error escribiendo caché de descubrimiento: {e}")
+
+    def invalidate(self, token):
+        if not token:
+            return
+        try:
+            if self._redis:
+                self._redis.delete(self._redis_key(token))
+                return
+            with self._lock:
+                entries = self._read_file()
+                if entries.pop(_token_key(token), None) is not None:
+                    self._write_file(entries)
+            print("[CACHE-CLEAR] discovery")
+        except Exception as e:
+            print(f"[DEBUG] Error invalidando caché de descubrimiento: {e}")
+
+    def _read_file(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as fh:
+                data = json.load(fh)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _write_file(self, entries):
+        # Escritura atómica: fichero temporal en el mismo directorio + rename
+        directory = os.path.dirname(self.path) or '.'
+        fd, tmp = tempfile.mkstemp(prefix='.music2sig_discovery.', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as fh:
+                json.dump(entries, fh)
+            os.replace(tmp, self.path)
+        except Exception:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+
+_cache = None
+
+
+def get_discovery_cache():
+    global _cache
+    if _cache is None:
+        _cache = DiscoveryCache()
+    return _cache
@@ -0,0 +1,10 @@
+"""
+Carga del fichero .env.
+
+Los módulos de api.* leen su configuración de variables de entorno al
+importarse, así que app.py importa este módulo antes que cualquier otro de
+api.* para que los valores de .env ya estén en os.environ.
+"""
+from dotenv import load_dotenv
+
+load_dotenv()
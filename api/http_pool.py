@@ -0,0 +1,79 @@
+"""
+Sesiones HTTP compartidas por host (keep-alive).
+
+Cada llamada suelta a requests.get abre una conexión TCP+TLS nueva. Aquí se
+mantiene un requests.Session por esquema+host con su propio pool de
+conexiones (HTTP_POOL_MAXSIZE) reutilizado por el descubrimiento en plex.tv,
+el historial, las portadas y el PlexServer de plexapi. Los timeouts se
+separan en conexión (HTTP_CONNECT_TIMEOUT) y lectura. Cada respuesta se
+anota en las métricas de latencia por endpoint.
+"""
+import os
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from api.metrics import endpoint_label, upstream_latency, upstream_requests
+
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '10'))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '3.05'))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '10'))
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+def _host_key(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc.lower()}"
+
+
+def _observe_response(resp, *args, **kwargs):
+    """Hook de requests: latencia hasta las cabeceras (resp.elapsed) y estado, por endpoint."""
+    endpoint = endpoint_label(urlsplit(resp.url).path)
+    upstream_latency.observe(resp.elapsed.total_seconds(), endpoint=endpoint)
+    upstream_requests.inc(endpoint=endpoint, status=resp.status_code)
+
+
+def timeouts(read=None):
+    """Tupla (conexión, lectura) para requests."""
+    return (HTTP_CONNECT_TIMEOUT, read if read is not None else HTTP_READ_TIMEOUT)
+
+
+def get_session(url):
+    """Sesión con keep-alive para el host de `url` (una por esquema+host, compartida por el proceso)."""
+    key = _host_key(url)
+    session = _sessions.get(key)
+    if session is None:
+        with _lock:
+            session = _sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_MAXSIZE, pool_block=False)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.hooks['response'].append(_observe_response)
+                _sessions[key] = session
+    return session
+
+
+def http_get(url, read_timeout=None, **kwargs):
+    """GET por la sesión del host con timeout separado de conexión y lectura."""
+    kwargs.setdefault('timeout', timeouts(read_timeout))
+    return get_session(url).get(url, **kwargs)
+
+
+def close_sessions():
+    with _lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
+
+
+def pool_info():
+    with _lock:
+        return {'hosts': sorted(_sessions), 'max_size': HTTP_POOL_MAXSIZE,
+                'connect_timeout': HTTP_CONNECT_TIMEOUT, 'read_timeout': HTTP_READ_TIMEOUT}
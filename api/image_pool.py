@@ -0,0 +1,210 @@
+"""
+Pool acotado para el trabajo de imagen de las portadas.
+
+Decodificar, reducir, recodificar a JPEG y cuantizar la paleta es CPU pura;
+hecho en el hilo de la petición bloquea al resto de peticiones del worker.
+Los trabajos se envían a un pool de hilos (o de procesos, o en línea, según
+IMAGE_POOL_KIND) con un máximo de trabajos pendientes: cuando está lleno, el
+envío espera como mucho IMAGE_POOL_QUEUE_TIMEOUT segundos y después se
+rechaza con ImagePoolBusy.
+
+Pillow libera el GIL al decodificar y redimensionar, así que los hilos bastan
+en la mayoría de despliegues. El pool de procesos es opcional: en Vercel o
+Lambda no hay /dev/shm y no puede arrancar, y entonces se pasa a hilos solo.
+"""
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image
+
+from api.palette import extract_palette
+
+IMAGE_POOL_KIND = os.getenv('IMAGE_POOL_KIND', 'thread').lower()
+IMAGE_POOL_WORKERS = int(os.getenv('IMAGE_POOL_WORKERS', str(min(4, os.cpu_count() or 1))))
+IMAGE_POOL_MAX_PENDING = int(os.getenv('IMAGE_POOL_MAX_PENDING', '32'))
+IMAGE_POOL_QUEUE_TIMEOUT = float(os.getenv('IMAGE_POOL_QUEUE_TIMEOUT', '2'))
+IMAGE_POOL_TIMEOUT = float(os.getenv('IMAGE_POOL_TIMEOUT', '10'))
+
+COVER_MAX_DIM = 160
+
+
+class ImagePoolBusy(RuntimeError):
+    """El pool tiene IMAGE_POOL_MAX_PENDING trabajos pendientes y no se liberó hueco a tiempo."""
+
+
+# --- Trabajos (funciones de módulo para poder enviarlas a otro proceso) ---
+
+def shrink_cover(content, max_dim=COVER_MAX_DIM):
+    """JPEG de como mucho max_dim px; si ya lo es (transcodificador de Plex) se usa tal cual."""
+    try:
+        img = Image.open(io.BytesIO(content))
+        if img.format == 'JPEG' and max(img.size) <= max_dim:
+            return content
+        # draft() hace que el JPEG se decodifique ya a escala reducida (1/2, 1/4, 1/8)
+        img.draft('RGB', (max_dim, max_dim))
+        img = img.convert('RGB')
+        img.thumbnail((max_dim, max_dim), Image.LANCZOS)
+        buf = io.BytesIO()
+        img.save(buf, format='JPEG', quality=70, optimize=True)
+        return buf.getvalue()
+    except Exception:
+        return content
+
+
+def cover_palette(jpeg_bytes, count):
+    """Paleta de la portada como colores CSS rgb(), o None si no se pudo calcular."""
+    try:
+        return [f'rgb({c[0]},{c[1]},{c[2]})' for c in extract_palette(jpeg_bytes, count)]
+    except Exception:
+        return None
+
+
+def process_cover(content, max_dim=COVER_MAX_DIM, palette_count=6):
+    """Portada descargada -> (JPEG reducido, {palette_count: paleta}) en un único trabajo."""
+    jpeg_bytes = shrink_cover(content, max_dim)
+    palette = cover_palette(jpeg_bytes, palette_count)
+    return jpeg_bytes, ({palette_count: palette} if palette else {})
+
+
+class ImagePool:
+    def __init__(self, kind=None, workers=None, max_pending=None, queue_timeout=None, timeout=None):
+        self.kind = kind or IMAGE_POOL_KIND
+        self.workers = workers if workers is not None else IMAGE_POOL_WORKERS
+        self.max_pending = max_pending if max_pending is not None else IMAGE_POOL_MAX_PENDING
+        self.queue_timeout = queue_timeout if queue_timeout is not None else IMAGE_POOL_QUEUE_TIMEOUT
+        self.timeout = timeout if timeout is not None else IMAGE_POOL_TIMEOUT
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self.pending = 0
+        self.stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0, 'peak_pending': 0, 'restarts': 0, 'fallbacks': 0}
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.kind == 'process':
+                    try:
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    except (OSError, NotImplementedError, ImportError) as e:
+                        self._use_threads(e)
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='image-pool')
+            return self._executor
+
+    def _use_threads(self, error):
+        """Pasa a hilos cuando el pool de procesos no puede arrancar (llamar con self._lock tomado)."""
+        print(f"[IMAGE-POOL] Pool de procesos no disponible, se usan hilos: {error!r}")
+        self.kind = 'thread'
+        self.stats['fallbacks'] += 1
+
+    def _fallback_to_threads(self, broken, error):
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+                self._use_threads(error)
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, fn, *args):
+        executor = self._get_executor()
+        try:
+            return executor, executor.submit(fn, *args)
+        except OSError as e:
+            # Los procesos se lanzan en el primer submit: sin /dev/shm o sin fork falla aquí
+            if not isinstance(executor, ProcessPoolExecutor):
+                raise
+            self._fallback_to_threads(executor, e)
+            executor = self._get_executor()
+            return executor, executor.submit(fn, *args)
+
+    def _reset_executor(self, broken):
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+                self.stats['restarts'] += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _finished(self, future):
+        with self._lock:
+            self.pending -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.stats['failed'] += 1
+            else:
+                self.stats['completed'] += 1
+        self._slots.release()
+
+    def run(self, fn, *args):
+        """Ejecuta fn(*args) en el pool y devuelve su resultado (bloquea al hilo llamante, no al worker)."""
+        if self.kind == 'inline':
+            with self._lock:
+                self.stats['submitted'] += 1
+            try:
+                result = fn(*args)
+            except Exception:
+                with self._lock:
+                    self.stats['failed'] += 1
+                raise
+            with self._lock:
+                self.stats['completed'] += 1
+            return result
+
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.stats['rejected'] += 1
+            raise ImagePoolBusy(f'{self.pending} trabajos de imagen pendientes')
+        with self._lock:
+            self.pending += 1
+            self.stats['submitted'] += 1
+            self.stats['peak_pending'] = max(self.stats['peak_pending'], self.pending)
+        try:
+            executor, future = self._submit(fn, *args)
+        except BaseException as e:
+            # Sin este release cada fallo al crear o usar el pool perdería un hueco para siempre
+            with self._lock:
+                self.pending -= 1
+                self.stats['failed'] += 1
+                broken = self._executor if isinstance(e, BrokenProcessPool) else None
+            self._slots.release()
+            if broken is not None:
+                self._reset_executor(broken)
+            raise
+        # El hueco se libera cuando el trabajo termina, aunque el llamante deje de esperar
+        future.add_done_callback(self._finished)
+        try:
+            return future.result(timeout=self.timeout)
+        except BrokenProcessPool:
+            self._reset_executor(executor)
+            raise
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def info(self):
+        with self._lock:
+            return dict(
+                self.stats,
+                kind=self.kind,
+                workers=self.workers,
+                pending=self.pending,
+                queued=max(0, self.pending - self.workers),
+                max_pending=self.max_pending,
+            )
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_image_pool():
+    """Pool de imagen compartido por el proceso."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ImagePool()
+    return _pool
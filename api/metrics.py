@@ -0,0 +1,227 @@
+"""
+Métricas en formato de texto de Prometheus (/metrics).
+
+Contadores, gauges e histogramas mínimos, sin dependencias: se registran al
+importar el módulo y se exponen con render(). Lo que ya cuentan otras piezas
+(cachés LRU, pool de imagen, pipeline...) no se duplica: add_collector()
+registra una función que devuelve esas cifras en el momento del scrape.
+
+Cada proceso tiene sus propias métricas; con varios workers Prometheus debe
+rascar cada uno (o agregarlas por instancia).
+"""
+import os
+import re
+import time
+import threading
+from contextlib import contextmanager
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_DIGITS = re.compile(r'/\d+(?=/|$)')
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels_text(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _register(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labels)
+
+    def header(self):
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f'{self.name}{_labels_text(self.labels, key)} {_number(value)}' for key, value in items]
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state[2] if state else 0
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(state[0]), state[1], state[2]) for key, state in self._values.items()]
+        lines = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{_labels_text(self.labels, key, ("le", _number(float(bound))))} {cumulative}')
+            lines.append(f'{self.name}_bucket{_labels_text(self.labels, key, ("le", "+Inf"))} {count}')
+            lines.append(f'{self.name}_sum{_labels_text(self.labels, key)} {_number(total)}')
+            lines.append(f'{self.name}_count{_labels_text(self.labels, key)} {count}')
+        return lines
+
+
+_metrics = []
+_collectors = []
+_registry_lock = threading.Lock()
+
+
+def _register(metric):
+    with _registry_lock:
+        _metrics.append(metric)
+
+
+def add_collector(collect):
+    """
+    collect() se llama en cada scrape y devuelve [(nombre, tipo, ayuda, [(labels, valor), ...]), ...].
+    Para cifras que ya se llevan en otro sitio (stats de las cachés, pools...).
+    """
+    with _registry_lock:
+        _collectors.append(collect)
+
+
+def render():
+    """Todas las métricas en formato de exposición de texto de Prometheus."""
+    with _registry_lock:
+        metrics, collectors = list(_metrics), list(_collectors)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.header())
+        lines.extend(metric.samples())
+    for collect in collectors:
+        try:
+            families = collect()
+        except Exception as e:
+            print(f"[METRICS] Error en un colector: {e!r}")
+            continue
+        for name, kind, help_text, samples in families:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                if value is None:
+                    continue
+                lines.append(f'{name}{_labels_text(labels.keys(), labels.values())} {_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def endpoint_label(path):
+    """Ruta sin query y con los segmentos numéricos como ':id', para acotar la cardinalidad."""
+    path = path.split('?', 1)[0] or '/'
+    return _DIGITS.sub('/:id', path)
+
+
+# --- Métricas compartidas por los módulos de la API ---
+
+history_cache_requests = Counter(
+    'music2sig_history_cache_requests_total',
+    'Lecturas de la caché de historial por backend y resultado',
+    ('backend', 'result'))
+
+palette_cache_requests = Counter(
+    'music2sig_palette_cache_requests_total',
+    'Paletas servidas desde la portada cacheada (hit) o calculadas (miss)',
+    ('result',))
+
+upstream_latency = Histogram(
+    'music2sig_upstream_request_duration_seconds',
+    'Latencia hasta las cabeceras de las peticiones a Plex y plex.tv por endpoint',
+    ('endpoint',))
+
+upstream_requests = Counter(
+    'music2sig_upstream_requests_total',
+    'Peticiones a Plex y plex.tv por endpoint y código de estado',
+    ('endpoint', 'status'))
+
+request_latency = Histogram(
+    'music2sig_request_duration_seconds',
+    'Duración de las peticiones por ruta y tema',
+    ('route', 'theme'))
+
+requests_total = Counter(
+    'music2sig_requests_total',
+    'Peticiones atendidas por ruta y código de estado',
+    ('route', 'status'))
+
+requests_in_flight = Gauge(
+    'music2sig_requests_in_flight',
+    'Peticiones en curso por ruta',
+    ('route',))
@@ -0,0 +1,136 @@
+"""
+Invalidación dirigida por eventos usando el websocket de notificaciones de Plex.
+
+Con PLEX_NOTIFICATIONS=true se abre un AlertListener (plexapi) contra
+/:/websockets/notifications. Cuando una notificación 'playing' indica un
+cambio de pista o de estado, se refresca la instantánea de sesiones y se
+invalidan las cachés de historial e imágenes; el progreso de reproducción
+(viewOffset) no provoca invalidaciones.
+"""
+import os
+import threading
+
+from plexapi.alert import AlertListener
+
+from api.client_pool import get_plex_client
+
+PLEX_NOTIFICATIONS = os.getenv('PLEX_NOTIFICATIONS', 'false').lower() == 'true'
+
+# Entradas 'timeline' de la librería: tipo 10 = pista; estado 5 = procesada, 9 = borrada
+_TIMELINE_TRACK_TYPE = 10
+_TIMELINE_CHANGE_STATES = (5, 9)
+
+_listeners = []
+
+
+def add_invalidation_listener(callback):
+    """Registra callback(token) que se invoca cada vez que cambia lo que se está reproduciendo."""
+    if callback not in _listeners:
+        _listeners.append(callback)
+
+
+def remove_invalidation_listener(callback):
+    if callback in _listeners:
+        _listeners.remove(callback)
+
+
+class NotificationWatcher:
+    def __init__(self, token=None, poller=None, client_getter=None, listener_factory=None, reconnect_delay=None):
+        self.token = token
+        self.poller = poller
+        self._client_getter = client_getter or get_plex_client
+        self._listener_factory = listener_factory or AlertListener
+        self.reconnect_delay = reconnect_delay if reconnect_delay is not None else float(os.getenv('PLEX_NOTIFICATIONS_RECONNECT', '5'))
+        self._states = {}  # sessionKey -> (ratingKey, state)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._listener = None
+        self.connected = False
+        self.stats = {'notifications': 0, 'invalidations': 0, 'reconnects': 0}
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='music2sig-notifications', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        listener = self._listener
+        if listener is not None and getattr(listener, '_ws', None) is not None:
+            try:
+                listener.stop()
+            except Exception:
+                pass
+
+    def _run(self):
+        while not self._stop.is_set():
+            client = None
+            try:
+                client = self._client_getter(self.token)
+            except Exception as e:
+                print(f"[NOTIFY] No se pudo obtener cliente Plex: {e}")
+            if client is not None and getattr(client, 'server', None) is not None:
+                self._listener = self._listener_factory(client.server, callback=self.handle_notification, callbackError=self._on_error)
+                self._listener.start()
+                self.connected = True
+                if self.poller:
+                    self.poller.refresh_now()
+                self._listener.join()
+                self._listener = None
+            self.connected = False
+            if self._stop.is_set():
+                break
+            # Sin websocket no hay garantía de frescura: volver a consultar Plex directamente
+            if self.poller:
+                self.poller.invalidate()
+            self.stats['reconnects'] += 1
+            self._stop.wait(self.reconnect_delay)
+
+    def _on_error(self, error):
+        print(f"[NOTIFY] Error en websocket de Plex: {error}")
+
+    def handle_notification(self, data):
+        """Procesa un NotificationContainer ya decodificado. Devuelve True si invalidó cachés."""
+        if not isinstance(data, dict):
+            return False
+        self.stats['notifications'] += 1
+        ntype = data.get('type')
+        changed = False
+        if ntype == 'playing':
+            for entry in data.get('PlaySessionStateNotification') or []:
+                session_key = entry.get('sessionKey')
+                current = (entry.get('ratingKey'), entry.get('state'))
+                with self._lock:
+                    if self._states.get(session_key) != current:
+                        changed = True
+                    if entry.get('state') == 'stopped':
+                        self._states.pop(session_key, None)
+                    else:
+                        self._states[session_key] = current
+        elif ntype == 'timeline':
+            for entry in data.get('TimelineEntry') or []:
+                if entry.get('type') == _TIMELINE_TRACK_TYPE and entry.get('state') in _TIMELINE_CHANGE_STATES:
+                    changed = True
+        if changed:
+            self._invalidate()
+        return changed
+
+    def _invalidate(self):
+        self.stats['invalidations'] += 1
+        # Refresco síncrono: la instantánea nueva debe existir antes de invalidar las imágenes
+        if self.poller:
+            self.poller.poll_once()
+        try:
+            client = self._client_getter(self.token)
+            if client is not None:
+                client.clear_history_cache()
+        except Exception as e:
+            print(f"[NOTIFY] Error invalidando historial: {e}")
+        for callback in list(_listeners):
+            try:
+                callback(self.token)
+            except Exception as e:
+                print(f"[NOTIFY] Error en listener de invalidación: {e}")
@@ -0,0 +1,85 @@
+"""
+Extracción de la paleta de una portada.
+
+Por defecto se usa un median-cut vectorizado con NumPy sobre la portada
+reducida a PALETTE_SAMPLE_SIZE px de lado: cada corte divide la caja con más
+píxeles × rango por la mediana de su canal más ancho. Si NumPy no está
+disponible (o PALETTE_EXTRACTOR=colorthief) se usa ColorThief y, sin él, el
+color medio de la imagen.
+"""
+import io
+import os
+
+from PIL import Image
+
+try:
+    import numpy as np
+    _NUMPY_AVAILABLE = True
+except Exception:
+    _NUMPY_AVAILABLE = False
+
+try:
+    from colorthief import ColorThief
+    _COLORTHIEF_AVAILABLE = True
+except Exception:
+    _COLORTHIEF_AVAILABLE = False
+
+PALETTE_EXTRACTOR = os.getenv('PALETTE_EXTRACTOR', 'numpy').lower()
+PALETTE_SAMPLE_SIZE = int(os.getenv('PALETTE_SAMPLE_SIZE', '64'))
+
+# Igual que ColorThief: los píxeles casi blancos no cuentan para la paleta
+_WHITE_THRESHOLD = 250
+# Una caja con menos rango que esto es un único color (más ruido JPEG): no se divide
+_MIN_SPLIT_RANGE = 16
+
+
+def _sample_pixels(jpeg_bytes, size):
+    img = Image.open(io.BytesIO(jpeg_bytes))
+    # En JPEG, draft() decodifica directamente a escala reducida
+    img.draft('RGB', (size, size))
+    img = img.convert('RGB')
+    img.thumbnail((size, size), Image.BILINEAR)
+    pixels = np.asarray(img, dtype=np.uint8).reshape(-1, 3)
+    keep = ~(pixels > _WHITE_THRESHOLD).all(axis=1)
+    return pixels[keep] if keep.any() else pixels
+
+
+def median_cut(pixels, count):
+    """Cuantiza un array Nx3 de píxeles en hasta `count` colores, del más al menos frecuente."""
+    boxes = [pixels]
+    while len(boxes) < count:
+        ranges = [np.ptp(box, axis=0) if len(box) > 1 else np.zeros(3, dtype=pixels.dtype) for box in boxes]
+        scores = [len(box) * int(rng.max()) if rng.max() >= _MIN_SPLIT_RANGE else 0
+                  for box, rng in zip(boxes, ranges)]
+        idx = max(range(len(boxes)), key=scores.__getitem__)
+        if scores[idx] == 0:
+            break
+        box = boxes.pop(idx)
+        channel = int(ranges[idx].argmax())
+        mid = len(box) // 2
+        order = np.argpartition(box[:, channel], mid)
+        boxes.extend((box[order[:mid]], box[order[mid:]]))
+    boxes.sort(key=len, reverse=True)
+    return [tuple(int(c) for c in box.mean(axis=0).round()) for box in boxes]
+
+
+def _numpy_palette(jpeg_bytes, count):
+    return median_cut(_sample_pixels(jpeg_bytes, PALETTE_SAMPLE_SIZE), count)
+
+
+def _colorthief_palette(jpeg_bytes, count):
+    return ColorThief(io.BytesIO(jpeg_bytes)).get_palette(color_count=count)
+
+
+def _average_color(jpeg_bytes):
+    img = Image.open(io.BytesIO(jpeg_bytes)).convert('RGB')
+    return [img.resize((1, 1), Image.LANCZOS).getpixel((0, 0))]
+
+
+def extract_palette(jpeg_bytes, count=6):
+    """Paleta de la portada como lista de tuplas (r, g, b), con el color dominante primero."""
+    if _NUMPY_AVAILABLE and PALETTE_EXTRACTOR != 'colorthief':
+        return _numpy_palette(jpeg_bytes, count)
+    if _COLORTHIEF_AVAILABLE:
+        return _colorthief_palette(jpeg_bytes, count)
+    return _average_color(jpeg_bytes)
@@ -0,0 +1,109 @@
+"""
+Pipeline concurrente de now-playing.
+
+Sin el pipeline cada petición encadena: sesión actual -> (si no hay) historial
+-> descarga de portada -> paleta. Aquí el historial sólo se adelanta si
+sessions() tarda más de PIPELINE_HISTORY_HEDGE segundos (o siempre, con
+PIPELINE_SPECULATIVE_HISTORY=true; si hay sesión su resultado se descarta), y
+la portada empieza a descargarse en cuanto se conoce el thumb, en paralelo
+con el cálculo de ETag y la respuesta 304. El render sólo espera a la
+portada si realmente tiene que generar el SVG.
+
+Cada petición ocupa hasta dos hilos del pool (sesión e historial) más la
+portada, así que por defecto PIPELINE_WORKERS es el doble de
+REQUEST_CONCURRENCY, las peticiones simultáneas que atiende el servidor.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from api.svg_generator import SVGGenerator
+from api.timing import bind
+
+REQUEST_CONCURRENCY = int(os.getenv('REQUEST_CONCURRENCY', '4'))
+PIPELINE_WORKERS = int(os.getenv('PIPELINE_WORKERS', str(2 * REQUEST_CONCURRENCY)))
+PIPELINE_SPECULATIVE_HISTORY = os.getenv('PIPELINE_SPECULATIVE_HISTORY', 'false').lower() == 'true'
+PIPELINE_HISTORY_HEDGE = float(os.getenv('PIPELINE_HISTORY_HEDGE', '0.3'))
+PIPELINE_COVER_TIMEOUT = float(os.getenv('PIPELINE_COVER_TIMEOUT', '10'))
+
+
+class NowPlayingPipeline:
+    def __init__(self, workers=None, speculative_history=None, warm=None, is_cached=None, history_hedge=None):
+        self.workers = workers if workers is not None else PIPELINE_WORKERS
+        self.speculative_history = PIPELINE_SPECULATIVE_HISTORY if speculative_history is None else speculative_history
+        self.history_hedge = history_hedge if history_hedge is not None else PIPELINE_HISTORY_HEDGE
+        self._warm = warm or SVGGenerator.warm_cover
+        self._is_cached = is_cached or SVGGenerator.has_cover
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='now-playing')
+        self._covers = {}  # thumb -> Future de la descarga en curso
+        self._lock = threading.Lock()
+        self.stats = {'resolved': 0, 'from_history': 0, 'speculative_history': 0, 'hedged_history': 0, 'covers_started': 0, 'covers_shared': 0}
+
+    def resolve(self, fetch_session, fetch_history):
+        """
+        Ejecuta fetch_session() y, si hace falta o se retrasa, fetch_history() en paralelo.
+        Devuelve (session_data, from_history); la portada ya queda en descarga.
+        """
+        # bind(): las etapas medidas en los hilos del pool cuentan para la petición que los lanza
+        session_future = self._executor.submit(bind(fetch_session))
+        history_future = None
+        if self.speculative_history:
+            history_future = self._executor.submit(bind(fetch_history))
+        elif self.history_hedge > 0:
+            # sessions() lento: adelantar el historial por si resulta que no hay reproducción
+            done, _ = wait([session_future], timeout=self.history_hedge)
+            if not done:
+                history_future = self._executor.submit(bind(fetch_history))
+        session_data = session_future.result()
+        with self._lock:
+            self.stats['resolved'] += 1
+            if history_future:
+                self.stats['speculative_history' if self.speculative_history else 'hedged_history'] += 1
+        if session_data:
+            self.start_cover(session_data)
+            return session_data, False
+
+        history_data = history_future.result() if history_future else fetch_history()
+        with self._lock:
+            self.stats['from_history'] += 1
+        self.start_cover(history_data)
+        return history_data, True
+
+    def start_cover(self, session_data):
+        """Empieza a descargar la portada de session_data (una sola descarga por thumb). Devuelve el future."""
+        thumb = (session_data or {}).get('thumb')
+        if not thumb or self._is_cached(thumb):
+            return None
+        with self._lock:
+            future = self._covers.get(thumb)
+            if future is not None:
+                self.stats['covers_shared'] += 1
+                return future
+            # Se envía con el lock tomado: _run_cover no puede retirar la entrada antes de registrarla
+            future = self._covers[thumb] = self._executor.submit(bind(self._run_cover), thumb, session_data)
+            self.stats['covers_started'] += 1
+        return future
+
+    def _run_cover(self, thumb, session_data):
+        try:
+            return self._warm(session_data)
+        finally:
+            with self._lock:
+                self._covers.pop(thumb, None)
+
+    def wait_cover(self, session_data, timeout=None):
+        """Espera a la descarga de portada en curso para session_data, si la hay."""
+        thumb = (session_data or {}).get('thumb')
+        with self._lock:
+            future = self._covers.get(thumb) if thumb else None
+        if future is None:
+            return
+        try:
+            future.result(timeout=timeout if timeout is not None else PIPELINE_COVER_TIMEOUT)
+        except Exception as e:
+            print(f"[PIPELINE] Portada no disponible a tiempo: {e!r}")
+
+    def info(self):
+        with self._lock:
+            return dict(self.stats, inflight_covers=len(self._covers), workers=self.workers,
+                        speculative_history_enabled=self.speculative_history, history_hedge=self.history_hedge)
@@ -1,18 +1,38 @@
 
 import os
 import time
-import requests
 import xml.etree.ElementTree as ET
 import random
 import json
+from urllib.parse import urlencode
 from plexapi.server import PlexServer
 from plexapi.myplex import MyPlexAccount
 
-try:
-    import redis
-    _REDIS_AVAILABLE = True
-except Exception:
-    _REDIS_AVAILABLE = False
+from api.redis_store import get_redis
+from api.discovery_cache import get_discovery_cache
+from api.http_pool import get_session, http_get, timeouts
+from api.timing import stage
+from api.metrics import history_cache_requests
+
+# Base de la API de plex.tv (configurable para apuntar a un Plex local de pruebas)
+PLEX_TV_URL = os.getenv('PLEX_TV_URL', 'https://plex.tv').rstrip('/')
+
+# Las portadas se piden ya reducidas al transcodificador de fotos de Plex
+PLEX_PHOTO_TRANSCODE = os.getenv('PLEX_PHOTO_TRANSCODE', 'true').lower() == 'true'
+COVER_TRANSCODE_SIZE = int(os.getenv('COVER_TRANSCODE_SIZE', '160'))
+
+_history_listeners = []
+
+
+def add_history_listener(callback):
+    """Registra callback(items) que se invoca cada vez que se descarga el historial desde Plex."""
+    if callback not in _history_listeners:
+        _history_listeners.append(callback)
+
+
+def remove_history_listener(callback):
+    if callback in _history_listeners:
+        _history_listeners.remove(callback)
 
 
 class PlexClient:
@@ -27,23 +47,58 @@ class PlexClient:
         # Historial cache
         self._history_cache = None  # {'items': [...], 'ts': epoch}
         self._history_ttl = int(os.getenv('HISTORY_CACHE_TTL', '60'))
-        self._redis = None
-        if _REDIS_AVAILABLE:
-            try:
-                redis_url = os.getenv('REDIS_URL')
-                if redis_url:
-                    self._redis = redis.Redis.from_url(redis_url)
-            except Exception:
-                self._redis = None
+        self._redis = get_redis()
 
         if self.token:
-            self._discover_server_and_owner()
-            if self.url:
-                try:
-                    self.server = PlexServer(self.url, self.token)
-                except Exception as e:
-                    self.server = None
-                    print(f"Error conectando a Plex: {e}")
+            discovery_cache = get_discovery_cache()
+            from_cache = self._load_discovery(discovery_cache.get(self.token))
+            if not from_cache:
+                with stage('discovery'):
+                    self._discover_server_and_owner()
+                discovery_cache.set(self.token, self._discovery_snapshot())
+            self._connect()
+            if not self.server and from_cache:
+                # La URI cacheada ya no responde: invalidar y descubrir de nuevo
+                discovery_cache.invalidate(self.token)
+                self.url = None
+                self._resource = None
+                with stage('discovery'):
+                    self._discover_server_and_owner()
+                discovery_cache.set(self.token, self._discovery_snapshot())
+                self._connect()
+
+    def _connect(self):
+        if not self.url:
+            return
+        try:
+            with stage('connect'):
+                # plexapi pasa timeout tal cual a requests: la tupla separa conexión y lectura
+                # también en sessions(), historial y ping()
+                self.server = PlexServer(self.url, self.token, session=get_session(self.url), timeout=timeouts())
+        except Exception as e:
+            self.server = None
+            print(f"Error conectando a Plex: {e}")
+
+    def _discovery_snapshot(self):
+        """Datos mínimos del descubrimiento que se guardan en la caché persistente."""
+        if not self.url:
+            return None
+        resource = self._resource or {}
+        return {
+            'url': self.url,
+            'resource': {'name': resource.get('name'), 'accessToken': resource.get('accessToken')},
+            'server_version': self.server_version,
+            'owner_username': self.owner_username
+        }
+
+    def _load_discovery(self, data):
+        if not data or not data.get('url'):
+            return False
+        self.url = data['url']
+        self._resource = data.get('resource') or {}
+        self.server_version = data.get('server_version')
+        self.owner_username = data.get('owner_username')
+        return True
 
     def _discover_server_and_owner(self):
         headers = {
@@ -53,7 +108,7 @@ class PlexClient:
         }
         print(f"[DEBUG] Usando token: {self.token}")
         try:
-            resp = requests.get('https://plex.tv/api/v2/resources', headers=headers, timeout=10)
+            resp = http_get(f'{PLEX_TV_URL}/api/v2/resources', headers=headers, read_timeout=10)
             print(f"[DEBUG] Status code respuesta Plex: {resp.status_code}")
             if resp.status_code == 200:
                 data = resp.json()
@@ -74,7 +129,7 @@ class PlexClient:
                             else:
                                 # fallback: consultar /users/account
                                 try:
-                                    acct = requests.get('https://plex.tv/users/account', headers=headers, timeout=10)
+                                    acct = http_get(f'{PLEX_TV_URL}/users/account', headers=headers, read_timeout=10)
                                     if acct.status_code == 200:
                                         try:
                                             acct_json = acct.json()
@@ -82,7 +137,7 @@ class PlexClient:
                                             print(f"[DEBUG] Usuario propietario detectado (from account): {self.owner_username}")
                                         except ValueError:
                                             try:
-                                                account = MyPlexAccount(token=self.token)
+                                                account = MyPlexAccount(token=self.token, session=get_session(PLEX_TV_URL), timeout=timeouts(10))
                                                 self.owner_username = account.username
                                                 print(f"[DEBUG] Usuario propietario detectado (from MyPlexAccount): {self.owner_username}")
                                             except Exception as e:
@@ -98,6 +153,17 @@ class PlexClient:
     def is_connected(self):
         return self.server is not None
 
+    def ping(self):
+        """Comprueba que el servidor sigue respondiendo (usado por el pool de clientes)."""
+        if not self.server:
+            return False
+        try:
+            self.server.query('/identity')
+            return True
+        except Exception as e:
+            print(f"[DEBUG] Ping a Plex falló: {e}")
+            return False
+
     def get_server_info(self):
         if not self.server:
             name = None
@@ -124,42 +190,72 @@ class PlexClient:
     def get_current_session(self, user=None):
         if not self.server:
             return None
-        sessions = self.server.sessions()
-        filter_user = user or self.owner_username
-        for session in sessions:
-            session_user = getattr(session.user, 'title', None)
-            if filter_user and session_user != filter_user:
-                continue
+        return select_session(self.get_active_sessions(), user or self.owner_username)
 
-            # Intentar extraer metadata común: artist (grandparentTitle), album (parentTitle), thumb
-            title = getattr(session, 'title', None)
-            itype = getattr(session, 'type', None)
-            state = getattr(session, 'state', None)
-            artist = getattr(session, 'grandparentTitle', None) or getattr(session, 'originalTitle', None) or None
-            album = getattr(session, 'parentTitle', None) or None
-            # thumb puede estar en varias propiedades
-            thumb = None
-            for attr in ('thumb', 'parentThumb', 'grandparentThumb', 'art'):
-                val = getattr(session, attr, None)
-                if val:
-                    thumb = val
-                    break
-            # Normalizar thumb a URL completa si es relativo
-            token = self._resource.get('accessToken') if self._resource else None
-            token = token or self.token
-            if thumb and not thumb.startswith('http') and self.url:
-                thumb = self.url.rstrip('/') + thumb + (f"?X-Plex-Token={token}" if token else '')
-
-            return {
-                'title': title,
-                'artist': artist,
-                'album': album,
-                'thumb': thumb,
-                'type': itype,
-                'state': state,
-                'user': session_user
-            }
-        return None
+    def get_active_sessions(self):
+        """Devuelve todas las sesiones activas normalizadas (una llamada a sessions())."""
+        if not self.server:
+            return []
+        with stage('sessions'):
+            sessions = self.server.sessions()
+        return [self._normalize_session(session) for session in sessions]
+
+    def _normalize_session(self, session):
+        # El usuario viene en el propio XML de la sesión; session.user consultaría plex.tv (MyPlexAccount),
+        # así que sólo se usa como respaldo si el servidor no envía usernames
+        usernames = getattr(session, 'usernames', None)
+        session_user = usernames[0] if usernames else getattr(session.user, 'title', None)
+
+        # Intentar extraer metadata común: artist (grandparentTitle), album (parentTitle), thumb
+        title = getattr(session, 'title', None)
+        itype = getattr(session, 'type', None)
+        state = getattr(session, 'state', None)
+        artist = getattr(session, 'grandparentTitle', None) or getattr(session, 'originalTitle', None) or None
+        album = getattr(session, 'parentTitle', None) or None
+        # thumb puede estar en varias propiedades
+        thumb = None
+        for attr in ('thumb', 'parentThumb', 'grandparentThumb', 'art'):
+            val = getattr(session, attr, None)
+            if val:
+                thumb = val
+                break
+        # Normalizar thumb a URL completa si es relativo
+        token = self._resource.get('accessToken') if self._resource else None
+        token = token or self.token
+        thumb, thumb_original = self._cover_urls(thumb, token)
+
+        return {
+            'title': title,
+            'artist': artist,
+            'album': album,
+            'thumb': thumb,
+            'thumb_original': thumb_original,
+            'type': itype,
+            'state': state,
+            'user': session_user
+        }
+
+    def _cover_urls(self, thumb, token):
+        """
+        URLs de la portada: (transcodificada a COVER_TRANSCODE_SIZE px, original).
+        La original queda como respaldo por si el servidor no transcodifica.
+        """
+        if not thumb or thumb.startswith('http') or not self.url:
+            return thumb, None
+        base = self.url.rstrip('/')
+        original = base + thumb + (f"?X-Plex-Token={token}" if token else '')
+        if not PLEX_PHOTO_TRANSCODE:
+            return original, None
+        params = {
+            'width': COVER_TRANSCODE_SIZE,
+            'height': COVER_TRANSCODE_SIZE,
+            'minSize': 1,
+            'upscale': 0,
+            'url': thumb,
+        }
+        if token:
+            params['X-Plex-Token'] = token
+        return f"{base}/photo/:/transcode?{urlencode(params)}", original
 
     def get_recent_playback_history(self, user=None, limit=25, offset=0):
         """
@@ -182,6 +278,7 @@ class PlexClient:
                     items = json.loads(cached)
                     if items:
                         print(f"[CACHE-HIT][redis] {cache_key} ({len(items)} items)")
+                        history_cache_requests.inc(backend='redis', result='hit')
                         if offset is None or (isinstance(offset, str) and offset.lower() == 'random'):
                             idx = random.randrange(len(items))
                         elif isinstance(offset, int) or (isinstance(offset, str) and offset.isdigit()):
@@ -195,6 +292,7 @@ class PlexClient:
                     items = self._history_cache.get('items') or []
                     if items:
                         print(f"[CACHE-HIT][mem] {cache_key} ({len(items)} items)")
+                        history_cache_requests.inc(backend='memory', result='hit')
                         if offset is None or (isinstance(offset, str) and offset.lower() == 'random'):
                             idx = random.randrange(len(items))
                         elif isinstance(offset, int) or (isinstance(offset, str) and offset.isdigit()):
@@ -205,6 +303,7 @@ class PlexClient:
         except Exception:
             pass
 
+        history_cache_requests.inc(backend='redis' if self._redis else 'memory', result='miss')
         # Reutilizar la nueva función que devuelve la lista completa
         items = self.get_recent_playback_list(user=user, limit=limit)
         if not items:
@@ -222,6 +321,20 @@ class PlexClient:
             idx = random.randrange(len(items))
         return items[idx]
 
+    def _history_item(self, fields, itype, user, token):
+        """Elemento de historial normalizado desde los atributos XML o el dict JSON de Plex."""
+        thumb, thumb_original = self._cover_urls(fields.get('thumb'), token)
+        return {
+            'title': fields.get('title') or fields.get('originalTitle'),
+            'artist': fields.get('grandparentTitle') or '',
+            'album': fields.get('parentTitle') or '',
+            'user': user or self.owner_username,
+            'thumb': thumb,
+            'thumb_original': thumb_original,
+            'type': itype or 'track',
+            'state': 'stopped'
+        }
+
     def get_recent_playback_list(self, user=None, limit=25):
         """
         Devuelve la lista completa normalizada de items de historial (no selecciona uno).
@@ -240,7 +353,9 @@ class PlexClient:
         for ep in candidates:
             try:
                 url = self.url.rstrip('/') + ep
-                resp = requests.get(url, headers=headers, params=params, timeout=8)
+                # Una medida por endpoint probado: 'history' acumula el bucle completo
+                with stage('history'):
+                    resp = http_get(url, headers=headers, params=params, read_timeout=8)
                 if resp.status_code != 200:
                     continue
                 text = resp.text.strip()
@@ -255,13 +370,7 @@ class PlexClient:
                         is_music = itype in ('track', 'song', 'audio') or ('grandparentTitle' in attrib)
                         if not is_music:
                             continue
-                        title = attrib.get('title') or attrib.get('originalTitle')
-                        artist = attrib.get('grandparentTitle') or ''
-                        album = attrib.get('parentTitle') or ''
-                        thumb = attrib.get('thumb')
-                        if thumb and not thumb.startswith('http'):
-                            thumb = self.url.rstrip('/') + thumb + (f"?X-Plex-Token={token}" if token else '')
-                        items.append({'title': title, 'artist': artist, 'album': album, 'user': user or self.owner_username, 'thumb': thumb, 'type': itype or 'track', 'state': 'stopped'})
+                        items.append(self._history_item(attrib, itype, user, token))
                         if len(items) >= limit:
                             break
                     if items:
@@ -279,13 +388,7 @@ class PlexClient:
                         is_music = itype in ('track', 'song', 'audio') or entry.get('grandparentTitle')
                         if not is_music:
                             continue
-                        title = entry.get('title') or entry.get('originalTitle')
-                        artist = entry.get('grandparentTitle') or ''
-                        album = entry.get('parentTitle') or ''
-                        thumb = entry.get('thumb')
-                        if thumb and not thumb.startswith('http'):
-                            thumb = self.url.rstrip('/') + thumb + (f"?X-Plex-Token={token}" if token else '')
-                        items.append({'title': title, 'artist': artist, 'album': album, 'user': user or self.owner_username, 'thumb': thumb, 'type': itype or 'track', 'state': 'stopped'})
+                        items.append(self._history_item(entry, itype, user, token))
                         if len(items) >= limit:
                             break
                     if items:
@@ -294,6 +397,13 @@ class PlexClient:
                 print(f"Warning: fallo leyendo historial desde {ep}: {e}")
                 continue
 
+        if items:
+            for callback in list(_history_listeners):
+                try:
+                    callback(items)
+                except Exception as e:
+                    print(f"[HISTORY] Error en listener de historial: {e}")
+
         # escribir caché
         try:
             cache_key_write = f"music2sig:history:{self.owner_username or 'unknown'}"
@@ -322,6 +432,15 @@ class PlexClient:
             return False
 
 
+def select_session(sessions, user=None):
+    """Primera sesión normalizada que pertenece a `user` (o la primera si no hay filtro)."""
+    for session in sessions or []:
+        if user and session.get('user') != user:
+            continue
+        return session
+    return None
+
+
 def create_plex_client(token=None):
     return PlexClient(token)
 
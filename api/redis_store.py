@@ -0,0 +1,41 @@
+"""
+Conexión Redis compartida (opcional).
+
+Si REDIS_URL no está definida o el paquete redis no está instalado,
+get_redis() devuelve None y cada caché usa su alternativa local.
+"""
+import os
+import threading
+
+try:
+    import redis
+    _REDIS_AVAILABLE = True
+except Exception:
+    _REDIS_AVAILABLE = False
+
+_client = None
+_client_url = None
+_lock = threading.Lock()
+
+
+def redis_configured():
+    """True si hay REDIS_URL y paquete redis, sin crear el cliente ni conectar."""
+    return _REDIS_AVAILABLE and bool(os.getenv('REDIS_URL'))
+
+
+def get_redis():
+    global _client, _client_url
+    redis_url = os.getenv('REDIS_URL')
+    if not _REDIS_AVAILABLE or not redis_url:
+        return None
+    if _client is not None and _client_url == redis_url:
+        return _client
+    with _lock:
+        if _client is None or _client_url != redis_url:
+            try:
+                _client = redis.Redis.from_url(redis_url)
+                _client_url = redis_url
+            except Exception as e:
+                print(f"[REDIS] No se pudo crear cliente Redis: {e}")
+                _client = None
+        return _client
@@ -0,0 +1,272 @@
+"""
+Caché de SVGs renderizados.
+
+La clave combina token, usuario, tema, tamaño y una huella de la sesión
+(título, artista, álbum y portada), de modo que variantes distintas de la
+misma página no se pisan entre sí y una imagen sólo se vuelve a generar
+cuando cambia lo que se está reproduciendo.
+
+Cada entrada guarda además las variantes gzip/brotli del SVG, comprimidas una
+sola vez al entrar en la caché, que se sirven según Accept-Encoding.
+
+Con REDIS_URL (y RENDER_CACHE_REDIS) los renders también se guardan en Redis
+con el TTL de la caché, para que el de un worker o instancia lo sirvan todos.
+El valor es binario y compacto: sólo las variantes comprimidas, sin el SVG en
+claro, que se recupera descomprimiendo la gzip. Un conjunto por token guarda
+sus claves para invalidarlas sin recorrer todo Redis. Si Redis falla se sigue
+sólo con la caché local y no se vuelve a intentar durante
+RENDER_CACHE_REDIS_RETRY segundos.
+"""
+import os
+import gzip
+import time
+import struct
+import hashlib
+import threading
+
+from api.cache import BoundedLRUCache
+from api.redis_store import get_redis, redis_configured
+from api.version import BUILD_VERSION
+
+try:
+    import brotli
+    _BROTLI_AVAILABLE = True
+except Exception:
+    _BROTLI_AVAILABLE = False
+
+RENDER_CACHE_MAX_ENTRIES = int(os.getenv('RENDER_CACHE_MAX_ENTRIES', '256'))
+RENDER_CACHE_MAX_BYTES = int(os.getenv('RENDER_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+
+RENDER_GZIP_LEVEL = int(os.getenv('RENDER_GZIP_LEVEL', '9'))
+RENDER_BROTLI_QUALITY = int(os.getenv('RENDER_BROTLI_QUALITY', '9'))
+
+RENDER_CACHE_REDIS = os.getenv('RENDER_CACHE_REDIS', 'true').lower() == 'true'
+RENDER_CACHE_REDIS_RETRY = float(os.getenv('RENDER_CACHE_REDIS_RETRY', '30'))
+
+# Formato binario: cabecera 'M2S' + versión y por variante (nombre, datos)
+_MAGIC = b'M2S'
+_FORMAT_VERSION = 2
+
+_FINGERPRINT_FIELDS = ('title', 'artist', 'album', 'thumb')
+
+
+def token_fingerprint(token):
+    """Identificador corto del token para usar en claves sin guardar el token en claro."""
+    token = token or os.getenv('PLEX_TOKEN') or ''
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()[:16]
+
+
+def session_fingerprint(session_data):
+    """Huella de los datos de sesión que influyen en la imagen renderizada."""
+    if not session_data:
+        return 'idle'
+    raw = '\x1f'.join(str(session_data.get(field) or '') for field in _FINGERPRINT_FIELDS)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def badge_key(token, user, theme, width, height):
+    """Identidad de una insignia (lo que pide la URL), independiente de lo que se esté reproduciendo."""
+    return f"{token_fingerprint(token)}:{user or ''}:{theme}:{width}:{height}"
+
+
+def render_key(token, user, theme, width, height, session_data):
+    return f"{badge_key(token, user, theme, width, height)}:{session_fingerprint(session_data)}"
+
+
+def render_etag(cache_key, version=''):
+    """
+    ETag estable de una imagen: se calcula sobre las entradas del render (clave de
+    caché y versión del código), no sobre el SVG con su comentario de timestamp.
+    """
+    return hashlib.sha1(f"{version}|{cache_key}".encode('utf-8')).hexdigest()[:20]
+
+
+class RenderedSVG:
+    """
+    SVG renderizado junto con sus variantes precomprimidas. La ETag no se guarda:
+    sale de la clave de caché con render_etag().
+    complete=False marca un render provisional (sin la portada que la sesión sí tiene):
+    no se cachea ni se sirve con ETag, para que el siguiente intento lo sustituya.
+    """
+    __slots__ = ('body', 'encodings', 'complete')
+
+    def __init__(self, body, encodings=None, complete=True):
+        self.body = body if isinstance(body, bytes) else body.encode('utf-8')
+        self.encodings = encodings or {}
+        self.complete = complete
+
+    @classmethod
+    def compress(cls, svg_content, complete=True):
+        body = svg_content.encode('utf-8') if isinstance(svg_content, str) else svg_content
+        encodings = {'gzip': gzip.compress(body, compresslevel=RENDER_GZIP_LEVEL, mtime=0)}
+        if _BROTLI_AVAILABLE:
+            encodings['br'] = brotli.compress(body, quality=RENDER_BROTLI_QUALITY)
+        return cls(body, encodings, complete)
+
+    def to_bytes(self):
+        """Valor compacto para Redis: sólo las variantes comprimidas; el SVG en claro sale de la gzip."""
+        parts = [_MAGIC, struct.pack('>BB', _FORMAT_VERSION, len(self.encodings))]
+        for name, data in self.encodings.items():
+            name = name.encode('ascii')
+            parts.append(struct.pack('>B', len(name)) + name + struct.pack('>I', len(data)))
+            parts.append(data)
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, raw):
+        """Inverso de to_bytes(). ValueError si el valor no tiene el formato esperado."""
+        try:
+            if raw[:3] != _MAGIC or raw[3] != _FORMAT_VERSION:
+                raise ValueError("formato de render desconocido")
+            count = raw[4]
+            pos = 5
+            encodings = {}
+            for _ in range(count):
+                name_len = raw[pos]
+                name = raw[pos + 1:pos + 1 + name_len].decode('ascii')
+                pos += 1 + name_len
+                (data_len,) = struct.unpack_from('>I', raw, pos)
+                pos += 4
+                encodings[name] = raw[pos:pos + data_len]
+                pos += data_len
+            body = gzip.decompress(encodings['gzip'])
+        except (IndexError, KeyError, struct.error, UnicodeDecodeError, OSError, EOFError) as e:
+            raise ValueError(f"render corrupto: {e!r}") from e
+        return cls(body, encodings)
+
+    @property
+    def size(self):
+        return len(self.body) + sum(len(v) for v in self.encodings.values())
+
+    def variant(self, accept_encodings=None):
+        """
+        Devuelve (datos, content_encoding) según Accept-Encoding (p. ej.
+        request.accept_encodings de werkzeug); gana la variante aceptada más pequeña.
+        """
+        best = (self.body, None)
+        if accept_encodings is None:
+            return best
+        for encoding, data in self.encodings.items():
+            if accept_encodings.quality(encoding) > 0 and len(data) < len(best[0]):
+                best = (data, encoding)
+        return best
+
+
+class RenderCache:
+    def __init__(self, ttl, max_entries=None, max_bytes=None, redis_client=None, shared=None):
+        self.ttl = ttl
+        self._cache = BoundedLRUCache(
+            max_entries=max_entries if max_entries is not None else RENDER_CACHE_MAX_ENTRIES,
+            max_bytes=max_bytes if max_bytes is not None else RENDER_CACHE_MAX_BYTES,
+            ttl=ttl,
+            sizeof=lambda rendered: rendered.size,
+        )
+        self.shared = RENDER_CACHE_REDIS if shared is None else shared
+        self._redis = redis_client
+        # La versión del build forma parte de la clave: durante un despliegue no se mezclan renders
+        self.namespace = f"music2sig:render:{BUILD_VERSION}:"
+        self._redis_down_until = 0
+        self._lock = threading.Lock()
+        self.shared_stats = {'shared_hits': 0, 'shared_misses': 0, 'shared_errors': 0}
+
+    def _get_redis(self):
+        if not self.shared or time.monotonic() < self._redis_down_until:
+            return None
+        return self._redis if self._redis is not None else get_redis()
+
+    def _count(self, stat):
+        with self._lock:
+            self.shared_stats[stat] += 1
+
+    def _redis_error(self, error):
+        with self._lock:
+            self.shared_stats['shared_errors'] += 1
+            self._redis_down_until = time.monotonic() + RENDER_CACHE_REDIS_RETRY
+        print(f"[RENDER-CACHE] Redis no disponible, sólo caché local durante {RENDER_CACHE_REDIS_RETRY:.0f}s: {error}")
+
+    def get(self, key):
+        rendered = self._cache.get(key)
+        if rendered is not None:
+            return rendered
+        client = self._get_redis()
+        if client is None:
+            return None
+        try:
+            raw = client.get(self.namespace + key)
+        except Exception as e:
+            self._redis_error(e)
+            return None
+        if raw is None:
+            self._count('shared_misses')
+            return None
+        try:
+            rendered = RenderedSVG.from_bytes(raw)
+        except ValueError as e:
+            print(f"[RENDER-CACHE] Ignorando render de Redis: {e}")
+            self._count('shared_misses')
+            return None
+        self._count('shared_hits')
+        self._cache.set(key, rendered)
+        return rendered
+
+    def _token_set(self, fingerprint):
+        """Conjunto de Redis con las claves de render de un token."""
+        return f"{self.namespace}token:{fingerprint}"
+
+    def set(self, key, svg_content):
+        """Comprime el SVG (una vez) y lo guarda en local y, si hay Redis, compartido. Devuelve el RenderedSVG."""
+        rendered = svg_content if isinstance(svg_content, RenderedSVG) else RenderedSVG.compress(svg_content)
+        self._cache.set(key, rendered)
+        client = self._get_redis()
+        if client is not None:
+            ttl = max(1, int(self.ttl or 60))
+            token_set = self._token_set(key.split(':', 1)[0])
+            try:
+                client.set(self.namespace + key, rendered.to_bytes(), ex=ttl)
+                client.sadd(token_set, key)
+                client.expire(token_set, ttl)
+            except Exception as e:
+                self._redis_error(e)
+        return rendered
+
+    def invalidate_token(self, token=None):
+        """Elimina las imágenes de un token (None = el token de PLEX_TOKEN)."""
+        fingerprint = token_fingerprint(token)
+        prefix = fingerprint + ':'
+        self._cache.invalidate(lambda key: key.startswith(prefix))
+        client = self._get_redis()
+        if client is None:
+            return
+        token_set = self._token_set(fingerprint)
+        try:
+            keys = [self.namespace + (k.decode() if isinstance(k, bytes) else k) for k in client.smembers(token_set)]
+            client.delete(*keys, token_set)
+        except Exception as e:
+            self._redis_error(e)
+
+    def clear(self):
+        self._cache.clear()
+        client = self._get_redis()
+        if client is None:
+            return
+        try:
+            keys = list(client.scan_iter(match=f"{self.namespace}*", count=500))
+            if keys:
+                client.delete(*keys)
+        except Exception as e:
+            self._redis_error(e)
+
+    def info(self):
+        with self._lock:
+            shared = dict(self.shared_stats)
+            # Sin _get_redis(): un scrape de métricas no debe crear el cliente
+            enabled = (self.shared and time.monotonic() >= self._redis_down_until
+                       and (self._redis is not None or redis_configured()))
+        return dict(self._cache.info(), **shared, shared_enabled=enabled)
+
+    def __len__(self):
+        return len(self._cache)
+
+    @property
+    def last_update(self):
+        return self._cache.last_update
@@ -0,0 +1,189 @@
+"""
+Poller en segundo plano de las sesiones activas de Plex.
+
+Con SESSION_POLL_INTERVAL > 0 se arranca un hilo por token que refresca
+periódicamente una instantánea de sessions(); los endpoints la leen en O(1)
+en lugar de llamar al servidor Plex en cada petición. Así la carga sobre
+Plex depende del número de servidores y no del tráfico.
+
+Con PLEX_NOTIFICATIONS=true (ver api.notifications) el poller no consulta
+periódicamente: sólo refresca cuando llega una notificación de Plex, salvo
+que SESSION_POLL_INTERVAL también esté definido como red de seguridad.
+
+Sólo se arrancan pollers para PLEX_TOKEN o para tokens con un cliente ya
+conectado en el pool (nunca para un ?token= cualquiera), como mucho
+SESSION_POLL_MAX_TOKENS a la vez, y cada uno se detiene solo tras
+SESSION_POLL_IDLE_INTERVALS intervalos sin que ninguna petición lo use.
+"""
+import os
+import time
+import threading
+
+from api.client_pool import get_client_pool, get_plex_client
+from api.notifications import NotificationWatcher, PLEX_NOTIFICATIONS
+
+SESSION_POLL_INTERVAL = float(os.getenv('SESSION_POLL_INTERVAL', '0'))
+SESSION_POLL_MAX_TOKENS = int(os.getenv('SESSION_POLL_MAX_TOKENS', '8'))
+SESSION_POLL_IDLE_INTERVALS = int(os.getenv('SESSION_POLL_IDLE_INTERVALS', '30'))
+
+# Sin sondeo periódico (sólo notificaciones) la inactividad se comprueba con este intervalo
+_IDLE_CHECK_INTERVAL = 10.0
+
+
+class SessionSnapshot:
+    def __init__(self, sessions, owner_username=None, ts=None):
+        self.ts = ts if ts is not None else time.time()
+        self.sessions = sessions or []
+        self.owner_username = owner_username
+        # Índice por usuario: primera sesión de cada uno, igual que get_current_session
+        self.by_user = {}
+        for session in self.sessions:
+            self.by_user.setdefault(session.get('user'), session)
+
+    def get(self, user=None):
+        filter_user = user or self.owner_username
+        if not filter_user:
+            return self.sessions[0] if self.sessions else None
+        return self.by_user.get(filter_user)
+
+    def age(self):
+        return time.time() - self.ts
+
+
+class SessionPoller:
+    def __init__(self, token=None, interval=None, client_getter=None, idle_intervals=None, on_idle=None):
+        self.token = token
+        # interval=None: sin sondeo periódico, sólo refrescos explícitos (modo notificaciones)
+        self.interval = interval
+        idle_intervals = idle_intervals if idle_intervals is not None else SESSION_POLL_IDLE_INTERVALS
+        self.idle_timeout = idle_intervals * (interval or _IDLE_CHECK_INTERVAL) if idle_intervals > 0 else None
+        self._on_idle = on_idle
+        self.last_used = time.monotonic()
+        # Una instantánea más vieja que esto se considera caducada (el poller se ha atascado)
+        self.max_age = max(self.interval * 3, 5) if self.interval else None
+        self._client_getter = client_getter or get_plex_client
+        self._snapshot = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self.watcher = None
+        self.stats = {'polls': 0, 'errors': 0}
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='music2sig-session-poller', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self.watcher is not None:
+            self.watcher.stop()
+
+    def invalidate(self):
+        """Descarta la instantánea: los endpoints vuelven a consultar Plex hasta el siguiente refresco."""
+        self._snapshot = None
+
+    def refresh_now(self):
+        """Pide un refresco inmediato (p. ej. al recibir una notificación de Plex)."""
+        self._wake.set()
+
+    def touch(self):
+        """Marca el poller como usado por una petición."""
+        self.last_used = time.monotonic()
+
+    def is_idle(self):
+        return self.idle_timeout is not None and time.monotonic() - self.last_used > self.idle_timeout
+
+    def _run(self):
+        poll = True
+        while not self._stop.is_set():
+            if self.is_idle():
+                print(f"[POLLER] Sin uso durante {self.idle_timeout:g}s, deteniendo")
+                self.stop()
+                if self._on_idle:
+                    self._on_idle(self)
+                break
+            if poll:
+                # Se limpia antes de consultar: un refresh_now() que llegue durante la consulta provoca otra
+                self._wake.clear()
+                self.poll_once()
+            woken = self._wake.wait(self.interval or _IDLE_CHECK_INTERVAL)
+            poll = woken or self.interval is not None
+
+    def poll_once(self):
+        try:
+            client = self._client_getter(self.token)
+            if not client or not client.is_connected():
+                raise RuntimeError('cliente Plex no disponible')
+            self._snapshot = SessionSnapshot(client.get_active_sessions(), client.owner_username)
+            self.stats['polls'] += 1
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"[POLLER] Error refrescando sesiones: {e}")
+        return self._snapshot
+
+    def snapshot(self):
+        """Instantánea vigente o None si no hay ninguna reciente."""
+        snap = self._snapshot
+        if snap is None or (self.max_age is not None and snap.age() > self.max_age):
+            return None
+        return snap
+
+
+_pollers = {}
+_pollers_lock = threading.Lock()
+
+
+def _retire(poller):
+    with _pollers_lock:
+        for key, current in list(_pollers.items()):
+            if current is poller:
+                del _pollers[key]
+
+
+def _may_poll(token):
+    """Sólo el token configurado o uno cuyo cliente ya está conectado: un ?token= inventado no arranca hilos."""
+    configured = os.getenv('PLEX_TOKEN')
+    if not token or token == configured:
+        return bool(configured)
+    return get_client_pool().has_client(token)
+
+
+def get_session_poller(token=None):
+    """Poller (arrancado) para el token, o None si el sondeo no está activo o no procede para este token."""
+    if SESSION_POLL_INTERVAL <= 0 and not PLEX_NOTIFICATIONS:
+        return None
+    key = token or os.getenv('PLEX_TOKEN') or ''
+    poller = _pollers.get(key)
+    if poller is not None:
+        poller.touch()
+        return poller
+    if not _may_poll(token):
+        return None
+    with _pollers_lock:
+        poller = _pollers.get(key)
+        if poller is None:
+            if len(_pollers) >= SESSION_POLL_MAX_TOKENS:
+                return None
+            interval = SESSION_POLL_INTERVAL if SESSION_POLL_INTERVAL > 0 else None
+            poller = _pollers[key] = SessionPoller(token, interval, on_idle=_retire)
+            poller.start()
+            if PLEX_NOTIFICATIONS:
+                poller.watcher = NotificationWatcher(token, poller).start()
+    poller.touch()
+    return poller
+
+
+def get_polled_session(token=None, user=None):
+    """
+    Sesión actual según la instantánea del poller.
+    Devuelve (True, sesión|None) si hay instantánea vigente y (False, None) si no.
+    """
+    poller = get_session_poller(token)
+    snap = poller.snapshot() if poller else None
+    if snap is None:
+        return False, None
+    return True, snap.get(user)
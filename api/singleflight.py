@@ -0,0 +1,142 @@
+"""
+Coalescencia de peticiones idénticas concurrentes (single-flight).
+
+Cuando un README con varias insignias se carga, o camo reparte la misma URL,
+llegan a la vez varias peticiones iguales. Con SingleFlight.do(key, fn) sólo
+la primera ejecuta fn(); las que llegan mientras está en curso esperan y
+reciben el mismo resultado (o la misma excepción).
+
+Con shared=True y SINGLE_FLIGHT_REDIS=true la coalescencia se extiende a
+otros workers: el líder toma un lock en Redis (SET NX PX) y deja el
+resultado, serializado en JSON, durante SINGLE_FLIGHT_RESULT_TTL_MS; los
+demás workers lo esperan en lugar de repetir la consulta. Si Redis falla se
+ejecuta fn() localmente.
+"""
+import os
+import json
+import time
+import uuid
+import threading
+
+from api.redis_store import get_redis
+
+SINGLE_FLIGHT_REDIS = os.getenv('SINGLE_FLIGHT_REDIS', 'false').lower() == 'true'
+SINGLE_FLIGHT_LOCK_TTL_MS = int(os.getenv('SINGLE_FLIGHT_LOCK_TTL_MS', '10000'))
+SINGLE_FLIGHT_RESULT_TTL_MS = int(os.getenv('SINGLE_FLIGHT_RESULT_TTL_MS', '2000'))
+SINGLE_FLIGHT_WAIT = float(os.getenv('SINGLE_FLIGHT_WAIT', '10'))
+
+_POLL_INTERVAL = 0.025
+
+# Borra el lock sólo si sigue siendo nuestro (puede haber expirado y tenerlo otro worker)
+_RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, namespace='music2sig:flight', redis_client=None, use_redis=None, wait=None,
+                 lock_ttl_ms=None, result_ttl_ms=None):
+        self.namespace = namespace
+        self._redis = redis_client
+        self.use_redis = SINGLE_FLIGHT_REDIS if use_redis is None else use_redis
+        self.wait = wait if wait is not None else SINGLE_FLIGHT_WAIT
+        self.lock_ttl_ms = lock_ttl_ms if lock_ttl_ms is not None else SINGLE_FLIGHT_LOCK_TTL_MS
+        self.result_ttl_ms = result_ttl_ms if result_ttl_ms is not None else SINGLE_FLIGHT_RESULT_TTL_MS
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.stats = {'leaders': 0, 'shared': 0, 'timeouts': 0, 'remote_shared': 0, 'remote_errors': 0}
+
+    def _get_redis(self):
+        if not self.use_redis:
+            return None
+        return self._redis if self._redis is not None else get_redis()
+
+    def do(self, key, fn, shared=False):
+        """Ejecuta fn() una sola vez por clave entre las llamadas concurrentes y comparte el resultado."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats['leaders'] += 1
+            else:
+                self.stats['shared'] += 1
+
+        if not leader:
+            if not call.event.wait(self.wait):
+                with self._lock:
+                    self.stats['timeouts'] += 1
+                return fn()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run_remote(key, fn) if shared else fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def _run_remote(self, key, fn):
+        client = self._get_redis()
+        if client is None:
+            return fn()
+        lock_key = f"{self.namespace}:{key}:lock"
+        result_key = f"{self.namespace}:{key}:result"
+        owner = uuid.uuid4().hex
+        try:
+            acquired = client.set(lock_key, owner, nx=True, px=self.lock_ttl_ms)
+        except Exception as e:
+            self._remote_error(e)
+            return fn()
+
+        if acquired:
+            try:
+                result = fn()
+                try:
+                    client.set(result_key, json.dumps(result), px=self.result_ttl_ms)
+                except Exception as e:
+                    self._remote_error(e)
+                return result
+            finally:
+                try:
+                    client.eval(_RELEASE_SCRIPT, 1, lock_key, owner)
+                except Exception as e:
+                    self._remote_error(e)
+
+        # Otro worker es el líder: esperar a su resultado mientras mantenga el lock
+        deadline = time.monotonic() + self.wait
+        try:
+            while time.monotonic() < deadline:
+                raw = client.get(result_key)
+                if raw is not None:
+                    with self._lock:
+                        self.stats['remote_shared'] += 1
+                    return json.loads(raw)
+                if not client.exists(lock_key):
+                    break
+                time.sleep(_POLL_INTERVAL)
+        except Exception as e:
+            self._remote_error(e)
+        return fn()
+
+    def _remote_error(self, error):
+        with self._lock:
+            self.stats['remote_errors'] += 1
+        print(f"[SINGLE-FLIGHT] Redis no disponible: {error}")
+
+    def info(self):
+        with self._lock:
+            return dict(self.stats, inflight=len(self._calls), redis=bool(self._get_redis()))
@@ -1,25 +1,35 @@
 ﻿import base64
-import io
-import requests
-from PIL import Image
+import functools
+import os
 
-try:
-    from colorthief import ColorThief
-    _COLORTHIEF_AVAILABLE = True
-except Exception:
-    _COLORTHIEF_AVAILABLE = False
+from api.svg_templates import field, get_template
+from api.artwork_cache import ArtworkEntry, ArtworkMemoryCache
+from api.artwork_store import get_artwork_store
+from api.http_pool import http_get
+from api.image_pool import cover_palette, get_image_pool, process_cover
+from api.timing import stage
+from api.metrics import palette_cache_requests
+
+SVG_COMPACT_BARS = os.getenv('SVG_COMPACT_BARS', 'false').lower() == 'true'
 
 class SVGGenerator:
-    _thumb_cache = {}
+    # Portadas procesadas, compartidas por todas las instancias (LRU acotada en bytes)
+    _thumb_cache = ArtworkMemoryCache()
+
+    COVER_X = 10
+    COVER_Y = 5
+    COVER_SIZE = 80
 
     NOVATOREM_DURATIONS_MS = [
         692, 881, 812, 949, 773, 802, 817, 699, 575, 538, 826, 843, 649, 606, 930, 714, 859, 506, 544, 659, 770, 896, 867, 700, 671, 639, 751, 525, 865, 785, 734, 576, 641, 785, 840, 979, 797, 752, 512, 659, 853, 568, 813, 656, 884, 646, 825, 668, 710, 585, 825, 775, 626, 522, 827, 861, 554, 772, 559, 677, 651, 548, 952, 816, 519, 541, 683, 889, 844, 535, 587, 896, 592, 680, 508, 954, 853, 582, 553, 618, 552, 990, 803, 749
     ]
 
-    def __init__(self, width=400, height=100, theme='normal'):
+    def __init__(self, width=400, height=100, theme='normal', compact=None):
         self.width = width
         self.height = height
         self.theme = theme
+        # Compact bars: shared CSS keyframes instead of three <animate> per bar
+        self.compact = SVG_COMPACT_BARS if compact is None else compact
 
         if theme == 'dark':
             self.bg_color = '#161b22'
@@ -40,6 +50,23 @@ class SVGGenerator:
 
         self.accent_color = '#9C27B0'
 
+    @classmethod
+    def thumb_cache_info(cls):
+        return cls._thumb_cache.info()
+
+    @classmethod
+    def has_cover(cls, thumb_url):
+        return bool(thumb_url) and thumb_url in cls._thumb_cache
+
+    @classmethod
+    def warm_cover(cls, session_data):
+        """Descarga y procesa la portada (y su paleta) de session_data sin renderizar nada."""
+        generator = cls()
+        if not generator._get_cover_data_url(session_data):
+            return False
+        generator._extract_palette(session_data)
+        return True
+
     def _get_cover_data_url(self, session_data):
         if not session_data:
             return None
@@ -48,29 +75,46 @@ class SVGGenerator:
             return None
 
         cached = SVGGenerator._thumb_cache.get(thumb_url)
-        if cached and cached.get('data_url'):
-            return cached.get('data_url')
-
-        try:
-            resp = requests.get(thumb_url, timeout=6)
-            if resp.status_code == 200 and resp.content:
-                try:
-                    img = Image.open(io.BytesIO(resp.content)).convert('RGB')
-                    max_dim = 160
-                    img.thumbnail((max_dim, max_dim), Image.LANCZOS)
-                    buf = io.BytesIO()
-                    img.save(buf, format='JPEG', quality=70, optimize=True)
-                    b64 = base64.b64encode(buf.getvalue()).decode('ascii')
-                    data_url = f'data:image/jpeg;base64,{b64}'
-                    SVGGenerator._thumb_cache[thumb_url] = {'data_url': data_url, 'bytes': buf.getvalue(), 'palette': None}
-                    return data_url
-                except Exception:
-                    b64 = base64.b64encode(resp.content).decode('ascii')
-                    data_url = f'data:image/jpeg;base64,{b64}'
-                    SVGGenerator._thumb_cache[thumb_url] = {'data_url': data_url, 'bytes': resp.content, 'palette': None}
-                    return data_url
-        except Exception:
-            return None
+        if cached:
+            return cached.data_url
+
+        # Otro worker del mismo host puede haber procesado ya esta portada
+        store = get_artwork_store()
+        if store:
+            stored = store.get(thumb_url)
+            if stored:
+                jpeg_bytes, palettes = stored
+                return self._cache_cover(thumb_url, jpeg_bytes, palettes).data_url
+
+        # Primero la portada transcodificada por Plex; si falla, la original
+        for url in (thumb_url, session_data.get('thumb_original')):
+            if not url:
+                continue
+            try:
+                with stage('cover_download'):
+                    resp = http_get(url, read_timeout=6)
+            except Exception:
+                continue
+            if resp.status_code != 200 or not resp.content:
+                continue
+            # Reducción, recodificación y paleta fuera del hilo de la petición
+            try:
+                with stage('cover_process'):
+                    jpeg_bytes, palettes = get_image_pool().run(process_cover, resp.content)
+            except Exception as e:
+                print(f"[ARTWORK] No se pudo procesar la portada: {e!r}")
+                return None
+            if store and store.put(thumb_url, jpeg_bytes):
+                for count, palette in palettes.items():
+                    store.set_palette(thumb_url, count, palette)
+            return self._cache_cover(thumb_url, jpeg_bytes, palettes).data_url
+        return None
+
+    @staticmethod
+    def _cache_cover(thumb_url, jpeg_bytes, palettes=None):
+        b64 = base64.b64encode(jpeg_bytes).decode('ascii')
+        entry = ArtworkEntry(f'data:image/jpeg;base64,{b64}', palettes)
+        return SVGGenerator._thumb_cache.set(thumb_url, entry)
 
     def _extract_palette(self, session_data, count=6):
         if not session_data:
@@ -79,21 +123,27 @@ class SVGGenerator:
         if not thumb:
             return None
         cached = SVGGenerator._thumb_cache.get(thumb)
-        if not cached or not cached.get('bytes'):
+        if not cached:
             return None
+        if count in cached.palettes:
+            palette_cache_requests.inc(result='hit')
+            return cached.palettes[count]
+        palette_cache_requests.inc(result='miss')
 
         try:
-            if _COLORTHIEF_AVAILABLE:
-                buf = io.BytesIO(cached.get('bytes'))
-                ct = ColorThief(buf)
-                pal = ct.get_palette(color_count=count)
-                return [f'rgb({c[0]},{c[1]},{c[2]})' for c in pal]
-            else:
-                img = Image.open(io.BytesIO(cached.get('bytes'))).convert('RGB')
-                avg = img.resize((1, 1), Image.LANCZOS).getpixel((0, 0))
-                return [f'rgb({avg[0]},{avg[1]},{avg[2]})']
+            with stage('palette'):
+                palette = get_image_pool().run(cover_palette, cached.jpeg_bytes, count)
         except Exception:
             return None
+        if not palette:
+            return None
+
+        # La paleta se guarda junto a la portada (memoria y disco) para no recalcularla
+        cached.palettes[count] = palette
+        store = get_artwork_store()
+        if store:
+            store.set_palette(thumb, count, palette)
+        return palette
 
     def _generate_css_bars(self, num_bars, bar_color):
         css = ""
@@ -119,11 +169,7 @@ class SVGGenerator:
         palette = self._extract_palette(session_data)
         accent = palette[0] if palette else self.accent_color
 
-        cover_x = 10
-        cover_y = 5
-        cover_size = 80
-        text_x = cover_x + cover_size + 12
-        text_y = 20
+        cover_x, cover_y, cover_size = self.COVER_X, self.COVER_Y, self.COVER_SIZE
 
         def esc(t):
             return (t.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;'))
@@ -131,17 +177,41 @@ class SVGGenerator:
         title_esc = esc(title)
         artist_line = f"{esc(artist)}" + (f" - {esc(album)}" if album else '')
 
+        if cover_data:
+            cover = f'<image href="{cover_data}" x="{cover_x}" y="{cover_y}" width="{cover_size}" height="{cover_size}" preserveAspectRatio="xMidYMid slice" />'
+        else:
+            cover = f'<rect x="{cover_x}" y="{cover_y}" width="{cover_size}" height="{cover_size}" rx="6" fill="#ddd" />'
+
+        template = get_template(('now_playing', self.theme, self.width, self.height, self.compact), self._now_playing_template_source)
+        return template.render({
+            'title': title_esc,
+            'artist_line': artist_line,
+            'cover': cover,
+            'stops': self._gradient_stops_markup((palette or [self.accent_color])[:6]),
+            'bar_color': accent.replace('#', ''),
+        })
+
+    @staticmethod
+    def _gradient_stops_markup(colors):
+        stops = ''
+        for idx, col in enumerate(colors):
+            offset = int((idx / max(1, (len(colors) - 1))) * 100)
+            stops += f'<stop offset="{offset}%" stop-color="{col}" />'
+        return stops
+
+    def _now_playing_template_source(self):
+        """Esqueleto del diseño principal; sólo depende del tema y del tamaño."""
+        text_x = self.COVER_X + self.COVER_SIZE + 12
+        text_y = 20
+
         num_bars = 96
-        bar_color = accent.replace('#', '')
         right_margin = 10
         content_width = self.width - text_x - right_margin
-        bars_svg = self._generate_svg_bars(num_bars, bar_color, text_x, text_y + 47, content_width)
+        bars_svg = self._generate_svg_bars(num_bars, field('bar_color'), text_x, text_y + 47, content_width)
 
-        gradient_stops_compact = (palette or [self.accent_color])[:6]
-        stops_compact = ''
-        for idx, col in enumerate(gradient_stops_compact):
-            offset = int((idx / max(1, (len(gradient_stops_compact) - 1))) * 100)
-            stops_compact += f'<stop offset="{offset}%" stop-color="{col}" />'
+        stops_compact = field('stops')
+        title_esc = field('title')
+        artist_line = field('artist_line')
 
         svg = f'''<svg width="{self.width}" height="{self.height}" viewBox="0 0 {self.width} {self.height}" xmlns="http://www.w3.org/2000/svg">
     <defs>
@@ -158,7 +228,7 @@ class SVGGenerator:
         </style>
     </defs>
   <rect class="bg" width="100%" height="100%" rx="8" />
-  {f'<image href="{cover_data}" x="{cover_x}" y="{cover_y}" width="{cover_size}" height="{cover_size}" preserveAspectRatio="xMidYMid slice" />' if cover_data else f'<rect x="{cover_x}" y="{cover_y}" width="{cover_size}" height="{cover_size}" rx="6" fill="#ddd" />'}
+  {field('cover')}
   <g clip-path="url(#contentClip)">
     <text x="{text_x}" y="{text_y}" class="title">{title_esc}</text>
     <text x="{text_x}" y="{text_y + 18}" class="artist">{artist_line}</text>
@@ -170,7 +240,12 @@ class SVGGenerator:
 
     def _generate_svg_bars(self, num_bars, bar_color, start_x, start_y, content_width):
         """Generate SVG bars using native SVG elements with animate tags"""
-        bars_svg = ''
+        return SVGGenerator._svg_bars_markup(num_bars, bar_color, start_x, start_y, content_width, self.compact)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=128)
+    def _svg_bars_markup(num_bars, bar_color, start_x, start_y, content_width, compact=False):
+        """Bars markup only depends on its arguments, so it is memoized across requests"""
         base_height = 4
         max_height = 18
 
@@ -190,32 +265,54 @@ class SVGGenerator:
         # Center the bars in the available space
         start_offset = (content_width - total_width_needed) / 2
 
+        durations = SVGGenerator.NOVATOREM_DURATIONS_MS
+        parts = []
+        if compact:
+            # One shared keyframes rule; each bar only carries its duration and delay
+            scale = max_height / base_height
+            parts.append(
+                f'<style>@keyframes m2s-bar{{0%,100%{{transform:scaleY(1);opacity:.35}}50%{{transform:scaleY({scale:g});opacity:.95}}}}'
+                f'.m2s-bar{{fill:#{bar_color};opacity:.35;transform-box:fill-box;transform-origin:50% 100%;'
+                f'animation:m2s-bar 1s linear infinite}}</style>'
+            )
+
         for i in range(num_bars):
             x = start_x + start_offset + i * (bar_width + spacing)
             y = start_y + (max_height - base_height)  # Position from bottom
 
             # Generate animation values for wave effect
-            duration = self.NOVATOREM_DURATIONS_MS[i % len(self.NOVATOREM_DURATIONS_MS)]
+            duration = durations[i % len(durations)]
             delay = -800 * i  # Staggered delay
 
+            if compact:
+                parts.append(f'<rect class="m2s-bar" x="{x}" y="{y - base_height}" width="{bar_width}" height="{base_height}" style="animation-duration:{duration}ms;animation-delay:{delay}ms"/>')
+                continue
+
             # Create height animation values (base_height to max_height)
             values = f"{base_height};{max_height};{base_height}"
             keytimes = "0;0.5;1"
 
-            bar_svg = f'''<rect x="{x}" y="{y - base_height}" width="{bar_width}" height="{base_height}" fill="#{bar_color}" opacity="0.35">
+            parts.append(f'''<rect x="{x}" y="{y - base_height}" width="{bar_width}" height="{base_height}" fill="#{bar_color}" opacity="0.35">
   <animate attributeName="height" values="{values}" keyTimes="{keytimes}" dur="{duration}ms" begin="{delay}ms" repeatCount="indefinite" />
   <animate attributeName="opacity" values="0.35;0.95;0.35" keyTimes="{keytimes}" dur="{duration}ms" begin="{delay}ms" repeatCount="indefinite" />
   <animate attributeName="y" values="{y - base_height};{y - max_height};{y - base_height}" keyTimes="{keytimes}" dur="{duration}ms" begin="{delay}ms" repeatCount="indefinite" />
-</rect>'''
-
-            bars_svg += bar_svg
+</rect>''')
 
-        return bars_svg
+        return ''.join(parts)
 
     def _generate_bars_only_svg(self, session_data):
         palette = self._extract_palette(session_data, count=6) or [self.accent_color]
         gradient_stops = palette[:6]
+        bar_color = gradient_stops[0].replace('#', '') if gradient_stops[0].startswith('#') else '9C27B0'
 
+        template = get_template(('bars_only', self.theme, self.width, self.height, self.compact), self._bars_only_template_source)
+        return template.render({
+            'stops': self._gradient_stops_markup(gradient_stops),
+            'bar_color': bar_color,
+        })
+
+    def _bars_only_template_source(self):
+        """Esqueleto del diseño de sólo barras; sólo depende del tema y del tamaño."""
         left_margin = 8
         right_margin = 8
         usable_width = max(0, self.width - left_margin - right_margin)
@@ -232,16 +329,13 @@ class SVGGenerator:
 
         bar_width = max(1, bar_width // 2)
 
-        bar_color = gradient_stops[0].replace('#', '') if gradient_stops[0].startswith('#') else '9C27B0'
+        bar_color = field('bar_color')
 
         # For bars-only theme, use full width from left_margin to right_margin
         content_width = self.width - left_margin - 8  # 8px right margin to match other themes
         bars_svg = self._generate_svg_bars(num_bars, bar_color, left_margin, int(self.height * 0.85) - 15, content_width)
 
-        stops_markup = ''
-        for idx, col in enumerate(gradient_stops):
-            offset = int((idx / max(1, (len(gradient_stops) - 1))) * 100)
-            stops_markup += f'<stop offset="{offset}%" stop-color="{col}" />'
+        stops_markup = field('stops')
 
         svg = f'''<svg width="{self.width}" height="{self.height}" viewBox="0 0 {self.width} {self.height}" xmlns="http://www.w3.org/2000/svg">
   <defs>
@@ -0,0 +1,57 @@
+"""
+Plantillas SVG precompiladas.
+
+El esqueleto de cada diseño (defs, estilos, clipPaths, geometría de las barras)
+sólo depende del tema y del tamaño. Se genera una vez con marcadores en los
+campos dinámicos (título, artista, portada, colores) y se convierte en una
+cadena de formato; renderizar es entonces una única llamada a format_map.
+"""
+import os
+
+from api.cache import BoundedLRUCache
+
+_MARK = '\x00'
+
+SVG_TEMPLATE_CACHE_SIZE = int(os.getenv('SVG_TEMPLATE_CACHE_SIZE', '64'))
+
+
+def field(name):
+    """Marcador de un campo dinámico dentro del código fuente de una plantilla."""
+    return f'{_MARK}{name}{_MARK}'
+
+
+class CompiledTemplate:
+    __slots__ = ('fields', '_fmt')
+
+    def __init__(self, source):
+        pieces = source.split(_MARK)
+        literals = [p.replace('{', '{{').replace('}', '}}') for p in pieces[0::2]]
+        self.fields = tuple(dict.fromkeys(pieces[1::2]))
+        fmt = [literals[0]]
+        for name, literal in zip(pieces[1::2], literals[1:]):
+            fmt.append('{' + name + '}')
+            fmt.append(literal)
+        self._fmt = ''.join(fmt)
+
+    def render(self, values):
+        return self._fmt.format_map(values)
+
+
+_templates = BoundedLRUCache(max_entries=SVG_TEMPLATE_CACHE_SIZE)
+
+
+def get_template(key, build):
+    """Plantilla compilada para `key`; build() devuelve el código fuente con marcadores."""
+    template = _templates.get(key)
+    if template is None:
+        template = CompiledTemplate(build())
+        _templates.set(key, template)
+    return template
+
+
+def clear_templates():
+    _templates.clear()
+
+
+def template_cache_info():
+    return _templates.info()
@@ -0,0 +1,131 @@
+"""
+Stale-while-revalidate para las insignias.
+
+Con RENDER_SWR=true se guarda, por insignia (token/usuario/tema/tamaño), el
+último render servido. Mientras tenga menos de RENDER_SWR_TTL segundos se
+sirve sin consultar Plex; hasta RENDER_SWR_MAX_STALENESS se sirve igualmente
+al instante y se programa un refresco en segundo plano. Si Plex no responde,
+el último render bueno se sigue sirviendo durante RENDER_SWR_ERROR_GRACE
+segundos en lugar de una imagen de error.
+"""
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from api.cache import BoundedLRUCache
+from api.render_cache import RENDER_CACHE_MAX_ENTRIES, token_fingerprint
+
+RENDER_SWR = os.getenv('RENDER_SWR', 'false').lower() == 'true'
+RENDER_SWR_TTL = int(os.getenv('RENDER_SWR_TTL', '10'))
+RENDER_SWR_MAX_STALENESS = int(os.getenv('RENDER_SWR_MAX_STALENESS', '300'))
+RENDER_SWR_ERROR_GRACE = int(os.getenv('RENDER_SWR_ERROR_GRACE', '3600'))
+RENDER_SWR_WORKERS = int(os.getenv('RENDER_SWR_WORKERS', '2'))
+
+FRESH = 'fresh'
+STALE = 'stale'
+
+
+class BadgeEntry:
+    __slots__ = ('etag', 'rendered', 'created')
+
+    def __init__(self, etag, rendered, created=None):
+        self.etag = etag
+        self.rendered = rendered
+        self.created = created if created is not None else time.time()
+
+    @property
+    def age(self):
+        return time.time() - self.created
+
+
+class StaleWhileRevalidate:
+    def __init__(self, enabled=None, ttl=None, max_staleness=None, error_grace=None, workers=None, max_entries=None):
+        self.enabled = RENDER_SWR if enabled is None else enabled
+        self.ttl = ttl if ttl is not None else RENDER_SWR_TTL
+        self.max_staleness = max_staleness if max_staleness is not None else RENDER_SWR_MAX_STALENESS
+        self.error_grace = error_grace if error_grace is not None else RENDER_SWR_ERROR_GRACE
+        self.workers = workers if workers is not None else RENDER_SWR_WORKERS
+        self._latest = BoundedLRUCache(
+            max_entries=max_entries if max_entries is not None else RENDER_CACHE_MAX_ENTRIES,
+            sizeof=lambda entry: entry.rendered.size,
+        )
+        self._invalidated = {}  # huella del token -> momento de la última invalidación
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = None
+        self.stats = {'fresh': 0, 'stale': 0, 'expired': 0, 'refreshes': 0, 'refresh_errors': 0, 'grace_served': 0}
+
+    def record(self, badge, etag, rendered):
+        """Guarda el último render bueno de la insignia."""
+        if self.enabled:
+            self._latest.set(badge, BadgeEntry(etag, rendered))
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _invalidated_after(self, badge, entry):
+        return self._invalidated.get(badge.split(':', 1)[0], 0) >= entry.created
+
+    def lookup(self, badge):
+        """(entrada, FRESH|STALE) si se puede servir sin esperar a Plex, o (None, None)."""
+        if not self.enabled:
+            return None, None
+        entry, _ = self._latest.peek(badge)
+        if entry is None:
+            return None, None
+        # Tras una notificación de cambio de pista la entrada sólo vale como respaldo ante errores
+        if self._invalidated_after(badge, entry) or entry.age > self.max_staleness:
+            self._count('expired')
+            return None, None
+        state = FRESH if entry.age <= self.ttl else STALE
+        self._count(state)
+        return entry, state
+
+    def fallback(self, badge):
+        """Último render bueno si está dentro de la ventana de gracia por error, o None."""
+        if not self.enabled:
+            return None
+        entry, _ = self._latest.peek(badge)
+        if entry is None or entry.age > self.error_grace:
+            return None
+        self._count('grace_served')
+        return entry
+
+    def schedule(self, badge, refresh):
+        """Programa refresh() en segundo plano (uno a la vez por insignia). Devuelve False si ya hay uno."""
+        with self._lock:
+            if badge in self._refreshing:
+                return False
+            self._refreshing.add(badge)
+            self.stats['refreshes'] += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='swr-refresh')
+            executor = self._executor
+        executor.submit(self._run_refresh, badge, refresh)
+        return True
+
+    def _run_refresh(self, badge, refresh):
+        try:
+            refresh()
+        except Exception as e:
+            self._count('refresh_errors')
+            print(f"[SWR] Error refrescando {badge}: {e!r}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(badge)
+
+    def invalidate_token(self, token=None):
+        """Las insignias de este token dejan de servirse sin revalidar (siguen como respaldo ante errores)."""
+        with self._lock:
+            self._invalidated[token_fingerprint(token)] = time.time()
+
+    def clear(self):
+        self._latest.clear()
+
+    def info(self):
+        with self._lock:
+            stats = dict(self.stats, refreshing=len(self._refreshing))
+        return dict(stats, enabled=self.enabled, entries=len(self._latest), ttl=self.ttl,
+                    max_staleness=self.max_staleness, error_grace=self.error_grace)
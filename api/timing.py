@@ -0,0 +1,99 @@
+"""
+Tiempos por etapa de cada petición.
+
+Cada petición abre un RequestTimings en una contextvar; las etapas del
+camino de now-playing (descubrimiento, sessions(), historial, portada,
+paleta, render...) se miden con `with stage('nombre'):` y se acumulan en él.
+Al responder se emiten como cabecera Server-Timing (visible en las devtools
+del navegador) y como una línea de log JSON por petición.
+
+Fuera de una petición stage() no hace nada, y dentro sólo cuesta dos
+perf_counter() y una suma, así que puede quedarse activo en producción.
+Los hilos de ThreadPoolExecutor no heredan la contextvar: lo que se envíe a
+un pool debe envolverse con bind() para que sus etapas cuenten.
+"""
+import os
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'true').lower() == 'true'
+TIMING_LOG = os.getenv('TIMING_LOG', 'true').lower() == 'true'
+
+_current = contextvars.ContextVar('music2sig_timings', default=None)
+
+
+class RequestTimings:
+    __slots__ = ('started', 'stages', '_lock')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}  # nombre -> [ms acumulados, veces]
+        self._lock = threading.Lock()
+
+    def add(self, name, ms):
+        with self._lock:
+            entry = self.stages.get(name)
+            if entry is None:
+                self.stages[name] = [ms, 1]
+            else:
+                entry[0] += ms
+                entry[1] += 1
+
+    @property
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def snapshot(self):
+        with self._lock:
+            return {name: (ms, count) for name, (ms, count) in self.stages.items()}
+
+    def header(self):
+        """Valor de Server-Timing: una métrica por etapa más el total."""
+        parts = [f"{name};dur={ms:.1f}" for name, (ms, _) in self.snapshot().items()]
+        parts.append(f"total;dur={self.total_ms:.1f}")
+        return ', '.join(parts)
+
+    def log_line(self, **fields):
+        """Línea JSON con los campos dados, el total y las etapas (ms y veces si se repitió)."""
+        stages = {}
+        for name, (ms, count) in self.snapshot().items():
+            stages[name] = round(ms, 1) if count == 1 else {'ms': round(ms, 1), 'n': count}
+        return json.dumps(dict(fields, total_ms=round(self.total_ms, 1), stages=stages), ensure_ascii=False)
+
+
+def begin():
+    """Abre los tiempos de una petición. Devuelve el token para end()."""
+    return _current.set(RequestTimings())
+
+
+def end(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def stage(name):
+    """Mide el bloque como etapa `name` de la petición en curso (si la hay)."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, (time.perf_counter() - start) * 1000)
+
+
+def bind(fn):
+    """Envuelve fn para que, ejecutada en otro hilo, registre sus etapas en la petición actual."""
+    if _current.get() is None:
+        return fn
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
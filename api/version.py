@@ -0,0 +1,46 @@
+"""
+Versión del build, resuelta una sola vez al importar.
+
+Orden: variable APP_VERSION, commit que expone Vercel
+(VERCEL_GIT_COMMIT_SHA), fichero VERSION en la raíz del proyecto y, por
+último, `git rev-parse --short HEAD`. En Vercel no hay git, y lanzar un
+proceso por petición es caro, así que nunca se consulta en caliente.
+"""
+import os
+import subprocess
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VERSION_FILE = os.getenv('VERSION_FILE') or os.path.join(_ROOT, 'VERSION')
+
+
+def _from_env():
+    version = os.getenv('APP_VERSION')
+    if version:
+        return version.strip()
+    sha = os.getenv('VERCEL_GIT_COMMIT_SHA')
+    return sha.strip()[:7] if sha else None
+
+
+def _from_file(path=VERSION_FILE):
+    try:
+        with open(path, 'r', encoding='utf-8') as fh:
+            return fh.read().strip() or None
+    except OSError:
+        return None
+
+
+def _from_git():
+    try:
+        out = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=_ROOT,
+                                      stderr=subprocess.DEVNULL, timeout=5)
+        return out.decode().strip() or None
+    except Exception:
+        return None
+
+
+def resolve_version():
+    """Primera fuente disponible (entorno, fichero VERSION, git) o 'unknown'."""
+    return _from_env() or _from_file() or _from_git() or 'unknown'
+
+
+BUILD_VERSION = resolve_version()
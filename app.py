@@ -5,14 +5,27 @@ Muestra lo que estás reproduciendo en Plex en tu perfil de GitHub
 import os
 import logging
 import time
-from datetime import datetime, timedelta
-from dotenv import load_dotenv
-from flask import Flask, Response, request, jsonify
-from api.plex_client import create_plex_client
+from datetime import datetime
+
+# Primero: carga .env antes de que los módulos de api.* lean su configuración
+from api import env  # noqa: F401
+from flask import Flask, Response, request, jsonify, g
+from api.client_pool import get_plex_client, get_client_pool
+from api.session_poller import get_polled_session
+from api.notifications import add_invalidation_listener
 from api.svg_generator import SVGGenerator
-
-# Cargar variables de entorno
-load_dotenv()
+from api.image_pool import get_image_pool
+from api.http_pool import pool_info
+from api.cover_prefetch import get_cover_prefetcher
+from api.pipeline import NowPlayingPipeline
+from api.singleflight import SingleFlight
+from api.plex_client import add_history_listener
+from api.render_cache import RenderCache, RenderedSVG, badge_key, render_key, render_etag, token_fingerprint
+from api.swr import StaleWhileRevalidate, STALE
+from api.version import BUILD_VERSION
+from api import timing
+from api.timing import stage
+from api import metrics
 
 # Configurar logging
 logging.basicConfig(
@@ -20,6 +33,8 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
+# Una línea JSON por petición con los tiempos por etapa (filtrable por nombre de logger)
+timing_logger = logging.getLogger('music2sig.timing')
 
 # Crear aplicación Flask
 app = Flask(__name__)
@@ -27,17 +42,313 @@ app = Flask(__name__)
 # Configuración de cache
 CACHE_DURATION = int(os.getenv('CACHE_DURATION', 60))
 
-# Cache en memoria
-image_cache = {
-    'last_update': None,
-    'image_url': None,
-    'session_data': None,
-    'cache_duration': CACHE_DURATION
-}
+# Rotación del historial cuando no hay reproducción activa
+HISTORY_ROTATION_SECONDS = 30
+HISTORY_ROTATION_WINDOW = 5
+
+# Cache en memoria de SVGs renderizados (LRU por token/usuario/tema/tamaño/sesión)
+render_cache = RenderCache(ttl=CACHE_DURATION)
+
+# Sesión, historial y portada en paralelo
+pipeline = NowPlayingPipeline()
+
+# Peticiones idénticas concurrentes comparten una consulta a Plex (también entre workers con Redis) y un render
+session_flights = SingleFlight('music2sig:flight:session')
+render_flights = SingleFlight('music2sig:flight:render', use_redis=False)
+
+# Último render bueno por insignia: se sirve caducado mientras se refresca, o si Plex no responde
+swr = StaleWhileRevalidate()
+
+
+class PlexUnavailable(RuntimeError):
+    """No se pudo obtener un cliente de Plex para el token"""
 
 # Nota: PNGs eliminados - servimos sólo SVG
 
 
+def invalidate_image_cache(token=None):
+    """Elimina las imágenes cacheadas de un token (p. ej. cuando Plex notifica un cambio de pista)"""
+    render_cache.invalidate_token(token)
+    swr.invalidate_token(token)
+
+
+add_invalidation_listener(invalidate_image_cache)
+
+
+def prefetch_history_covers(items):
+    """Precarga en segundo plano las portadas de los elementos por los que rota el historial"""
+    prefetcher = get_cover_prefetcher()
+    if prefetcher:
+        prefetcher.prefetch(items[:HISTORY_ROTATION_WINDOW])
+
+
+add_history_listener(prefetch_history_covers)
+
+
+@app.before_request
+def start_request_timing():
+    g.timing_token = timing.begin()
+
+
+@app.after_request
+def emit_request_timing(resp):
+    """Cabecera Server-Timing y una línea de log estructurada con los tiempos por etapa"""
+    timings = timing.current()
+    if timings is None:
+        return resp
+    if timing.SERVER_TIMING:
+        resp.headers['Server-Timing'] = timings.header()
+    if timing.TIMING_LOG:
+        timing_logger.info(timings.log_line(method=request.method, path=request.path,
+                                            status=resp.status_code, theme=request.args.get('theme')))
+    return resp
+
+
+@app.teardown_request
+def end_request_timing(exc=None):
+    token = g.pop('timing_token', None)
+    if token is not None:
+        timing.end(token)
+
+
+# Temas con etiqueta propia en las métricas; el resto cuenta como 'other' para acotar la cardinalidad
+METRIC_THEMES = frozenset(('normal', 'dark', 'transparent-dark', 'transparent-light', 'bars', 'novatorem', 'only-bars'))
+
+
+def metric_route():
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_started = time.perf_counter()
+    g.metrics_route = metric_route()
+    metrics.requests_in_flight.inc(route=g.metrics_route)
+
+
+@app.after_request
+def record_request_metrics(resp):
+    started = g.get('metrics_started')
+    if started is not None:
+        theme = request.args.get('theme')
+        if theme is not None and theme not in METRIC_THEMES:
+            theme = 'other'
+        metrics.request_latency.observe(time.perf_counter() - started, route=g.metrics_route, theme=theme or '')
+        metrics.requests_total.inc(route=g.metrics_route, status=resp.status_code)
+    return resp
+
+
+@app.teardown_request
+def end_request_metrics(exc=None):
+    route = g.pop('metrics_route', None)
+    if route is not None:
+        metrics.requests_in_flight.dec(route=route)
+
+
+def collect_cache_metrics():
+    """Cifras que ya llevan las cachés y los pools, leídas en cada scrape de /metrics"""
+    caches = {'render': render_cache.info(), 'thumb': SVGGenerator.thumb_cache_info()}
+    families = []
+    for stat, label in (('hits', 'Aciertos'), ('misses', 'Fallos'), ('evictions', 'Desalojos'), ('expirations', 'Expiraciones')):
+        families.append((f'music2sig_cache_{stat}_total', 'counter', f'{label} de las cachés en memoria',
+                         [({'cache': name}, info[stat]) for name, info in caches.items()]))
+    families.append(('music2sig_cache_entries', 'gauge', 'Entradas en las cachés en memoria',
+                     [({'cache': name}, info['entries']) for name, info in caches.items()]))
+    families.append(('music2sig_cache_bytes', 'gauge', 'Bytes ocupados por las cachés en memoria',
+                     [({'cache': name}, info['bytes']) for name, info in caches.items()]))
+    render_info = caches['render']
+    families.append(('music2sig_render_cache_shared_total', 'counter', 'Lecturas de la caché de render compartida en Redis',
+                     [({'result': result}, render_info[f'shared_{stat}']) for result, stat in
+                      (('hit', 'hits'), ('miss', 'misses'), ('error', 'errors'))]))
+    swr_info = swr.info()
+    families.append(('music2sig_swr_served_total', 'counter', 'Insignias servidas por stale-while-revalidate por estado',
+                     [({'state': state}, swr_info[state]) for state in ('fresh', 'stale', 'expired', 'grace_served')]))
+    families.append(('music2sig_image_pool_pending', 'gauge', 'Trabajos de imagen en curso o en cola',
+                     [({}, get_image_pool().info()['pending'])]))
+    families.append(('music2sig_pipeline_covers_in_flight', 'gauge', 'Descargas de portada en curso',
+                     [({}, pipeline.info()['inflight_covers'])]))
+    families.append(('music2sig_single_flight_in_flight', 'gauge', 'Consultas coalescidas en curso',
+                     [({'flight': name}, flights.info()['inflight'])
+                      for name, flights in (('session', session_flights), ('render', render_flights))]))
+    return families
+
+
+metrics.add_collector(collect_cache_metrics)
+
+
+def matched_etag(etag, force_refresh=False):
+    """Etiqueta de If-None-Match que coincide con esta imagen (en cualquier codificación), o None"""
+    if force_refresh:
+        return None
+    for tag in (etag, f"{etag}-gzip", f"{etag}-br"):
+        if request.if_none_match.contains_weak(tag):
+            return tag
+    return None
+
+
+def finalize_badge_response(resp, etag, cache_control):
+    """Cabeceras comunes a todas las respuestas de insignias (200 y 304); etag=None no envía ETag"""
+    if etag:
+        resp.set_etag(etag)
+    resp.headers['Cache-Control'] = cache_control
+    resp.headers['X-SVG-Version'] = BUILD_VERSION
+    return resp
+
+
+def not_modified_response(etag, cache_control):
+    """Respuesta 304 sin cuerpo con la etiqueta que envió el cliente: no hace falta renderizar nada"""
+    resp = Response(status=304)
+    resp.headers['Vary'] = 'Accept-Encoding'
+    return finalize_badge_response(resp, etag, cache_control)
+
+
+def render_svg(cache_key, theme, width, height, session_data, force_refresh=False):
+    """Devuelve el RenderedSVG para la sesión, reutilizando la caché de renderizado (local o Redis) si es posible"""
+    if not force_refresh:
+        rendered = render_cache.get(cache_key)
+        if rendered is not None:
+            logger.info(f"Devolviendo imagen desde caché de renderizado ({cache_key})")
+            return rendered
+
+    def render():
+        # La portada puede estar descargándose todavía desde resolve_session_data
+        with stage('cover_wait'):
+            pipeline.wait_cover(session_data)
+        svg_generator = SVGGenerator(width, height, theme)
+        svg_content = svg_generator.generate_now_playing_svg(session_data)
+        thumb = (session_data or {}).get('thumb')
+        if thumb and not SVGGenerator.has_cover(thumb):
+            # La portada falló o no llegó a tiempo: el render comparte clave y ETag con el
+            # bueno, así que no se cachea ni se etiqueta para no servir el sustituto hasta el cambio de pista
+            logger.warning(f"Render sin portada, no se cachea ({cache_key})")
+            return RenderedSVG.compress(svg_content, complete=False)
+        return render_cache.set(cache_key, svg_content)
+
+    with stage('render'):
+        return render_flights.do(cache_key, render)
+
+
+def svg_response(rendered, etag, cache_control):
+    """Respuesta con la variante precomprimida que acepte el cliente"""
+    if not rendered.complete:
+        etag, cache_control = None, 'no-store, no-cache, must-revalidate, max-age=0'
+    data, encoding = rendered.variant(request.accept_encodings)
+    resp = Response(data, mimetype='image/svg+xml')
+    resp.headers['Vary'] = 'Accept-Encoding'
+    if encoding:
+        resp.headers['Content-Encoding'] = encoding
+        if etag:
+            etag = f"{etag}-{encoding}"
+    return finalize_badge_response(resp, etag, cache_control)
+
+
+def get_current_session_data(plex_client, token, allowed_user):
+    """Sesión actual: instantánea del poller si está activo, o consulta directa a Plex"""
+    polled, session_data = get_polled_session(token, allowed_user)
+    if polled:
+        return session_data
+    return plex_client.get_current_session(allowed_user)
+
+
+def resolve_session_data(plex_client, token, allowed_user, label=None):
+    """Sesión actual o, si no hay reproducción activa, un elemento rotatorio del historial"""
+    # Las insignias que llegan a la vez para el mismo token/usuario esperan a una única consulta
+    flight_key = f"{token_fingerprint(token)}:{allowed_user or ''}"
+    with stage('session'):
+        session_data = session_flights.do(flight_key, lambda: fetch_session_data(plex_client, token, allowed_user, label), shared=True)
+    # Si el resultado vino de otro worker, la portada aún no se ha pedido en este
+    pipeline.start_cover(session_data)
+    return session_data
+
+
+def fetch_session_data(plex_client, token, allowed_user, label=None):
+    """Consulta la sesión actual y, si no hay, el historial (sin coalescencia)"""
+    suffix = f" para {label}" if label else ''
+    # Alternar entre los primeros elementos del historial cada 30 segundos
+    offset = int(time.time() // HISTORY_ROTATION_SECONDS) % HISTORY_ROTATION_WINDOW
+
+    def fetch_history():
+        return plex_client.get_recent_playback_history(allowed_user, limit=25, offset=offset)
+
+    # Con el poller activo la sesión sale de su instantánea sin tocar Plex
+    polled, session_data = get_polled_session(token, allowed_user)
+    if polled:
+        from_history = not session_data
+        if from_history:
+            session_data = fetch_history()
+        pipeline.start_cover(session_data)
+    else:
+        # Sesión e historial (especulativo) a la vez; la portada arranca en cuanto se conoce
+        session_data, from_history = pipeline.resolve(lambda: plex_client.get_current_session(allowed_user), fetch_history)
+
+    if not from_history:
+        logger.info(f"Datos de sesión obtenidos{suffix}: {session_data}")
+    elif session_data:
+        logger.info(f"No hay sesión activa, usando historial de reproducciones{suffix}: {session_data}")
+    else:
+        logger.info("No hay sesión activa, historial ni cache, generando imagen de 'sin actividad'")
+    return session_data
+
+
+def fetch_badge(token, allowed_user, theme, width, height, label=None, force_refresh=False):
+    """Consulta Plex y devuelve (etag, render); render() genera el SVG sólo si hace falta el cuerpo"""
+    with stage('client'):
+        plex_client = get_plex_client(token)
+    if not plex_client:
+        logger.error("No se pudo crear cliente de Plex")
+        raise PlexUnavailable("Plex no configurado")
+    if not plex_client.is_connected():
+        # Cliente recién creado sin servidor: la insignia 'sin actividad' sería falsa,
+        # mejor que resolve_badge sirva el último render bueno (o la imagen de error)
+        logger.error("Servidor Plex no accesible")
+        raise PlexUnavailable("Plex no disponible")
+
+    session_data = resolve_session_data(plex_client, token, allowed_user, label)
+    # La ETag depende de las entradas del render, no del SVG generado
+    cache_key = render_key(token, allowed_user, theme, width, height, session_data)
+    etag = render_etag(cache_key, BUILD_VERSION)
+
+    def render():
+        rendered = render_svg(cache_key, theme, width, height, session_data, force_refresh)
+        if rendered.complete:
+            swr.record(badge_key(token, allowed_user, theme, width, height), etag, rendered)
+        return rendered
+
+    return etag, render
+
+
+def resolve_badge(token, allowed_user, theme, width, height, label=None, force_refresh=False):
+    """(etag, render) de la insignia; con RENDER_SWR sirve el último render sin esperar a Plex"""
+    badge = badge_key(token, allowed_user, theme, width, height)
+    if not force_refresh:
+        entry, state = swr.lookup(badge)
+        if entry is not None:
+            if state == STALE:
+                swr.schedule(badge, lambda: fetch_badge(token, allowed_user, theme, width, height, label)[1]())
+            return entry.etag, lambda: entry.rendered
+    try:
+        etag, render = fetch_badge(token, allowed_user, theme, width, height, label, force_refresh)
+    except Exception as e:
+        entry = swr.fallback(badge)
+        if entry is None:
+            raise
+        logger.warning(f"Plex no disponible ({e}); sirviendo el último render de hace {int(entry.age)}s")
+        return entry.etag, lambda: entry.rendered
+
+    def render_or_fallback():
+        try:
+            return render()
+        except Exception as e:
+            entry = swr.fallback(badge)
+            if entry is None:
+                raise
+            logger.warning(f"Error generando la insignia ({e}); sirviendo el último render de hace {int(entry.age)}s")
+            # La ETag ya calculada no corresponde a este cuerpo: se sirve como provisional, sin ETag
+            return RenderedSVG(entry.rendered.body, entry.rendered.encodings, complete=False)
+
+    return etag, render_or_fallback
+
+
 @app.route('/')
 def index():
     """Página principal con información del proyecto"""
@@ -159,7 +470,7 @@ def api_status():
     """Endpoint para verificar el estado del sistema"""
     # Obtener token de parámetro de consulta o variable de entorno
     token = request.args.get('token')
-    plex_client = create_plex_client(token)
+    plex_client = get_plex_client(token)
     status = {
         'plex': {
             'connected': False,
@@ -167,10 +478,20 @@ def api_status():
             'error': None
         },
         'current_session': None,
-        'cache': {
-            'last_update': image_cache['last_update'].isoformat() if image_cache['last_update'] else None,
-            'has_cached_image': image_cache['image_url'] is not None
-        }
+        'version': BUILD_VERSION,
+        'cache': dict(
+            render_cache.info(),
+            last_update=datetime.fromtimestamp(render_cache.last_update).isoformat() if render_cache.last_update else None,
+            has_cached_image=len(render_cache) > 0
+        ),
+        'thumb_cache': SVGGenerator.thumb_cache_info(),
+        'image_pool': get_image_pool().info(),
+        'pipeline': pipeline.info(),
+        'swr': swr.info(),
+        'single_flight': {'session': session_flights.info(), 'render': render_flights.info()},
+        'cover_prefetch': get_cover_prefetcher().info() if get_cover_prefetcher() else None,
+        'client_pool': get_client_pool().info(),
+        'http_pool': pool_info()
     }
     
     if plex_client and plex_client.is_connected():
@@ -180,7 +501,7 @@ def api_status():
         status['plex']['sessions_count'] = server_info.get('sessions_count', 0)
         
         # Obtener sesión actual
-        session_data = plex_client.get_current_session()
+        session_data = get_current_session_data(plex_client, token, None)
         if session_data:
             status['current_session'] = {
                 'title': session_data.get('title'),
@@ -203,68 +524,31 @@ def api_now_playing():
         width = int(request.args.get('width', os.getenv('IMAGE_WIDTH', 400)))
         height = int(request.args.get('height', 90))  # Forzado a 90, ignorando IMAGE_HEIGHT
         force_refresh = request.args.get('refresh', 'false').lower() == 'true'
-        
-        # Obtener datos de Plex
         token = request.args.get('token')
-        plex_client = create_plex_client(token)
-        if not plex_client:
-            logger.error("No se pudo crear cliente de Plex")
-            return generate_error_image("Error: Plex no configurado")
-
         # Obtener usuario específico si está configurado
         allowed_user = request.args.get('user')
-        session_data = plex_client.get_current_session(allowed_user)
-        logger.info(f"Datos de sesión obtenidos: {session_data}")
-
-        # Si no hay sesión activa, intentar usar historial
-        if not session_data:
-            offset = int(time.time() // 30) % 5
-            history_data = plex_client.get_recent_playback_history(allowed_user, limit=25, offset=offset)
-            logger.info(f"Historial obtenido: {history_data}")
-            if history_data:
-                logger.info("No hay sesión activa, usando historial de reproducciones")
-                session_data = history_data
-            else:
-                logger.info("No hay sesión activa, historial ni cache, generando imagen de 'sin actividad'")
-                session_data = None
-
-        # Clave de caché (solo para logging)
-        cache_key = f"now_playing:{token}:{allowed_user}:{theme}:{width}:{height}"
-        cached_image = None
-
-        # Verificar cache en memoria
-        if image_cache.get('image_url') and image_cache.get('last_update'):
-            elapsed = (datetime.now() - image_cache['last_update']).total_seconds()
-            if elapsed < CACHE_DURATION:
-                cached_image = image_cache['image_url']
-
-        if cached_image:
-            logger.info("Devolviendo imagen desde caché en memoria")
-            resp = Response(cached_image, mimetype='image/svg+xml')
-            # Evitar que los proxies/navegadores cacheen indefinidamente
-            resp.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
-            return resp
+
+        try:
+            etag, render = resolve_badge(token, allowed_user, theme, width, height, force_refresh=force_refresh)
+        except PlexUnavailable as e:
+            return generate_error_image(f"Error: {e}")
+
+        # Permitir que proxies/navegadores guarden la imagen pero revalidando siempre con la ETag
+        cache_control = 'no-cache, must-revalidate, max-age=0'
+        if force_refresh:
+            cache_control = 'no-store, no-cache, must-revalidate, max-age=0'
+        matched = matched_etag(etag, force_refresh)
+        if matched:
+            return not_modified_response(matched, cache_control)
 
         # Ahora devolvemos SVG en lugar de PNG
-        svg_generator = SVGGenerator(width, height, theme)
         try:
-            svg_content = svg_generator.generate_now_playing_svg(session_data)
+            rendered = render()
         except Exception as e:
             logger.error(f"Error generando contenido SVG: {e}")
             return generate_error_image(f"Error: {str(e)}")
 
-        # inject version/timestamp comment (no debe romper la ejecución si git falla)
-        try:
-            import subprocess
-            git_hash = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD']).decode().strip()
-        except Exception:
-            git_hash = 'unknown'
-
-        svg_content = svg_content.replace('<svg', f'<!-- version:{git_hash} ts:{int(time.time())} --><svg', 1)
-        resp = Response(svg_content, mimetype='image/svg+xml')
-        resp.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
-        resp.headers['X-SVG-Version'] = git_hash
-        return resp
+        return svg_response(rendered, etag, cache_control)
     except Exception as e:
         logger.error(f"Error en api_now_playing: {e}")
         return generate_error_image(f"Error: {str(e)}")
@@ -312,54 +596,32 @@ def api_now_playing_svg():
         theme = request.args.get('theme', os.getenv('DEFAULT_THEME', 'normal'))
         width = int(request.args.get('width', os.getenv('IMAGE_WIDTH', 400)))
         height = int(request.args.get('height', 90))  # Forzado a 90, ignorando IMAGE_HEIGHT
-        
-        # Obtener datos de Plex
         token = request.args.get('token')
-        plex_client = create_plex_client(token)
-        if not plex_client:
-            logger.error("No se pudo crear cliente de Plex")
-            return generate_error_svg("Error: Plex no configurado")
-        
         # Obtener usuario específico si está configurado
         allowed_user = request.args.get('user')
-        session_data = plex_client.get_current_session(allowed_user)
-        logger.info(f"Datos de sesión obtenidos para SVG: {session_data}")
-        
-        # Si no hay sesión activa, intentar usar historial
-        if not session_data:
-            offset = int(time.time() // 30) % 5  # Alternar entre 0-4 cada 30 segundos
-            history_data = plex_client.get_recent_playback_history(allowed_user, limit=25, offset=offset)
-            logger.info(f"Historial obtenido: {history_data}")
-            if history_data:
-                logger.info("No hay sesión activa, usando historial de reproducciones para SVG")
-                session_data = history_data
-            else:
-                logger.info("No hay sesión activa, historial ni cache, generando SVG de 'sin actividad'")
-                session_data = None
-        
         # Allow forcing fresh generation by passing refresh=true
         force_refresh = request.args.get('refresh', 'false').lower() == 'true'
 
-        # Generar SVG
-        svg_generator = SVGGenerator(width, height, theme)
-        svg_content = svg_generator.generate_now_playing_svg(session_data)
-
-        logger.info("SVG generado exitosamente")
         try:
-            import subprocess
-            git_hash = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD']).decode().strip()
-        except Exception:
-            git_hash = 'unknown'
-        svg_content = svg_content.replace('<svg', f'<!-- version:{git_hash} ts:{int(time.time())} --><svg', 1)
-        resp = Response(svg_content, mimetype='image/svg+xml')
+            etag, render = resolve_badge(token, allowed_user, theme, width, height, 'SVG', force_refresh)
+        except PlexUnavailable as e:
+            return generate_error_svg(f"Error: {e}")
+
         # Ensure clients and CDNs get fresh content when requested
         if force_refresh:
-            resp.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
+            cache_control = 'no-store, no-cache, must-revalidate, max-age=0'
         else:
             # still recommend short caching for typical requests
-            resp.headers['Cache-Control'] = 'public, max-age=5, must-revalidate'
-        resp.headers['X-SVG-Version'] = git_hash
-        return resp
+            cache_control = 'public, max-age=5, must-revalidate'
+        matched = matched_etag(etag, force_refresh)
+        if matched:
+            return not_modified_response(matched, cache_control)
+
+        # Generar SVG
+        rendered = render()
+
+        logger.info("SVG generado exitosamente")
+        return svg_response(rendered, etag, cache_control)
 
     except Exception as e:
         logger.error(f"Error generando SVG: {e}")
@@ -374,50 +636,37 @@ def api_now_playing_png():
         theme = request.args.get('theme', os.getenv('DEFAULT_THEME', 'normal'))
         width = int(request.args.get('width', os.getenv('IMAGE_WIDTH', 400)))
         height = int(request.args.get('height', 90))  # Forzado a 90, ignorando IMAGE_HEIGHT
-        
-        # Obtener cliente Plex
         token = request.args.get('token')
-        plex_client = create_plex_client(token)
-        if not plex_client:
-            logger.error("No se pudo crear cliente Plex")
-            return "Error: No se pudo conectar a Plex", 500
-        
-        # Obtener sesión actual
         allowed_user = request.args.get('user')
-        session_data = plex_client.get_current_session(allowed_user)
-        logger.info(f"Datos de sesión obtenidos para PNG: {session_data}")
-        
-        # Si no hay sesión activa, intentar usar historial
-        if not session_data:
-            offset = int(time.time() // 30) % 5  # Alternar entre 0-4 cada 30 segundos
-            history_data = plex_client.get_recent_playback_history(allowed_user, limit=25, offset=offset)
-            logger.info(f"PNG: Historial obtenido: {history_data}")
-            if history_data:
-                logger.info("No hay sesión activa, usando historial de reproducciones para PNG")
-                session_data = history_data
-            else:
-                logger.info("No hay sesión activa, historial ni cache, generando PNG de 'sin actividad'")
-                session_data = None
+
+        try:
+            etag, render = resolve_badge(token, allowed_user, theme, width, height, 'PNG')
+        except PlexUnavailable:
+            return "Error: No se pudo conectar a Plex", 500
+        matched = matched_etag(etag)
+        if matched:
+            return not_modified_response(matched, 'no-cache')
         # Este endpoint ya no devuelve PNG; devolvemos SVG
-        svg_generator = SVGGenerator(width, height, theme)
-        svg_content = svg_generator.generate_now_playing_svg(session_data)
-        return Response(svg_content, mimetype='image/svg+xml')
+        return svg_response(render(), etag, 'no-cache')
     except Exception as e:
         logger.error(f"Error generando PNG (ahora retorna SVG): {e}")
         return generate_error_svg(f"Error: {str(e)}")
 
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Métricas en formato de texto de Prometheus"""
+    if not metrics.METRICS_ENABLED:
+        return Response('Not Found', status=404, mimetype='text/plain')
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/api/cache/clear')
 def api_clear_cache():
     """Endpoint para limpiar el cache manualmente"""
-    global image_cache
     try:
-        image_cache = {
-            'last_update': None,
-            'image_url': None,
-            'session_data': None,
-            'cache_duration': CACHE_DURATION
-        }
+        render_cache.clear()
+        swr.clear()
         logger.info("Cache en memoria limpiado")
         return jsonify({'success': True, 'message': 'Cache en memoria limpiado'})
     except Exception as e:
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark de extremo a extremo contra un Plex local (scripts/fake_plex_server.py).
+
+Levanta el Plex simulado (latencia, jitter y tamaño de portada configurables)
+y la aplicación Flask en un servidor con hilos, recorre cada ruta y tema con
+varios niveles de concurrencia y muestra p50/p95/p99 y peticiones por segundo.
+
+Uso: python scripts/bench_e2e.py [--latency 50] [--jitter 10] [--cover-size 600]
+         [--concurrency 1,4,16] [--requests 100] [--themes normal,dark,bars]
+         [--idle] [--json resultados.json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+
+from fake_plex_server import FakePlexServer
+
+BADGE_ROUTES = ('/api/now-playing', '/api/now-playing-svg', '/api/now-playing-png')
+OTHER_ROUTES = ('/api/status', '/')
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def start_app(fake):
+    """Configura el entorno para el Plex simulado e inicia la app en un puerto libre."""
+    workdir = tempfile.mkdtemp(prefix='m2s-bench-')
+    os.environ.update({
+        'PLEX_TV_URL': fake.baseurl,
+        'PLEX_TOKEN': 'bench-token',
+        'DISCOVERY_CACHE_FILE': os.path.join(workdir, 'discovery.json'),
+        'ARTWORK_CACHE_DIR': os.path.join(workdir, 'artwork'),
+    })
+    from werkzeug.serving import make_server
+    import app as app_module
+
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def run_case(url, concurrency, total):
+    local = threading.local()
+
+    def one(_):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            ok = session.get(url, timeout=60).status_code < 400
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    wall = time.perf_counter() - started
+    latencies = sorted(lat * 1000 for lat, _ in results)
+    return {
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'rps': total / wall if wall else 0.0,
+        'errors': sum(1 for _, ok in results if not ok),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--latency', type=float, default=50, help='latencia del Plex simulado (ms)')
+    parser.add_argument('--jitter', type=float, default=10, help='variación de la latencia (± ms)')
+    parser.add_argument('--cover-size', type=int, default=600, help='lado de las portadas originales (px)')
+    parser.add_argument('--concurrency', default='1,4,16', help='niveles de concurrencia, separados por comas')
+    parser.add_argument('--requests', type=int, default=100, help='peticiones por caso')
+    parser.add_argument('--themes', default='normal,dark,bars')
+    parser.add_argument('--idle', action='store_true', help='sin reproducción activa (rota el historial)')
+    parser.add_argument('--json', help='guarda los resultados en este fichero')
+    args = parser.parse_args(argv)
+
+    fake = FakePlexServer(latency=args.latency / 1000, jitter=args.jitter / 1000,
+                          cover_size=args.cover_size, playing=not args.idle).start()
+    server, base = start_app(fake)
+    levels = [int(c) for c in args.concurrency.split(',')]
+    cases = [(route, theme) for route in BADGE_ROUTES for theme in args.themes.split(',')]
+    cases += [(route, None) for route in OTHER_ROUTES]
+
+    results = []
+    print(f"Plex simulado: {args.latency:.0f}±{args.jitter:.0f} ms, portadas {args.cover_size}px, "
+          f"{'historial' if args.idle else 'reproduciendo'}")
+    print(f"{'ruta':<24}{'tema':<9}{'conc':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'err':>5}")
+    try:
+        for concurrency in levels:
+            for route, theme in cases:
+                url = f"{base}{route}" + (f"?theme={theme}" if theme else '')
+                stats = run_case(url, concurrency, args.requests)
+                results.append(dict(stats, route=route, theme=theme, concurrency=concurrency))
+                print(f"{route:<24}{theme or '-':<9}{concurrency:>5}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}"
+                      f"{stats['p99_ms']:>10.1f}{stats['rps']:>10.1f}{stats['errors']:>5}")
+    finally:
+        server.shutdown()
+        fake.stop()
+
+    print(f"Peticiones al Plex simulado: {json.dumps(fake.requests, sort_keys=True)}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as fh:
+            json.dump({'config': vars(args), 'results': results, 'upstream_requests': fake.requests}, fh, indent=2)
+        print(f"Resultados guardados en {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark del extractor de paleta: median-cut con NumPy frente a ColorThief.
+
+Genera portadas sintéticas de 160 px (como las que guarda el generador),
+mide el tiempo medio por extracción y la concordancia de color: para cada
+color de un extractor, distancia RGB al color más cercano del otro (ColorThief
+no ordena su paleta por frecuencia, así que no se comparan posiciones).
+Uso: python scripts/bench_palette.py [iteraciones]
+"""
+import io
+import os
+import sys
+import time
+import random
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from api.palette import _colorthief_palette, _numpy_palette
+
+COUNT = 6
+
+
+def synthetic_cover(seed):
+    rng = random.Random(seed)
+    img = Image.new('RGB', (160, 160), tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(rng.randrange(3, 9)):
+        x0, y0 = rng.randrange(120), rng.randrange(120)
+        box = (x0, y0, x0 + rng.randrange(20, 100), y0 + rng.randrange(20, 100))
+        color = tuple(rng.randrange(256) for _ in range(3))
+        (draw.ellipse if rng.random() < 0.5 else draw.rectangle)(box, fill=color)
+    img = img.filter(ImageFilter.GaussianBlur(rng.choice((0, 2, 6))))
+    buf = io.BytesIO()
+    img.save(buf, format='JPEG', quality=70)
+    return buf.getvalue()
+
+
+def distance(a, b):
+    return sum((x - y) ** 2 for x, y in zip(a, b)) ** 0.5
+
+
+def bench(fn, covers, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for cover in covers:
+            fn(cover, COUNT)
+    return (time.perf_counter() - start) / (iterations * len(covers)) * 1e3
+
+
+def main(iterations=5):
+    covers = [synthetic_cover(seed) for seed in range(40)]
+    ct_ms = bench(_colorthief_palette, covers, iterations)
+    np_ms = bench(_numpy_palette, covers, iterations)
+
+    ct_to_np, np_to_ct = [], []
+    for cover in covers:
+        ct = _colorthief_palette(cover, COUNT)
+        quant = _numpy_palette(cover, COUNT)
+        ct_to_np.extend(min(distance(c, q) for q in quant) for c in ct)
+        np_to_ct.extend(min(distance(q, c) for c in ct) for q in quant)
+
+    print(f"portadas: {len(covers)}  colores: {COUNT}")
+    print(f"ColorThief: {ct_ms:8.2f} ms/portada")
+    print(f"NumPy:      {np_ms:8.2f} ms/portada  ({ct_ms / np_ms:.1f}x)")
+    for label, values in (('ColorThief → NumPy', ct_to_np), ('NumPy → ColorThief', np_to_ct)):
+        values.sort()
+        print(f"{label}: distancia RGB mediana {values[len(values) // 2]:.1f}, "
+              f"p90 {values[int(len(values) * 0.9)]:.1f}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks de las etapas de SVGGenerator.
+
+Aísla la portada (_get_cover_data_url: decodificar, reducir y recodificar),
+la paleta (_extract_palette), las barras (_generate_svg_bars) y los renders
+completos (generate_now_playing_svg y _generate_bars_only_svg) para varios
+anchos, temas y resoluciones de portada. De cada caso mide el tiempo por
+iteración, las asignaciones con tracemalloc (sólo las de Python: los búferes
+internos de Pillow no aparecen) y los bytes de salida.
+
+La descarga se sustituye por una portada generada en memoria y el pool de
+imagen corre en línea, así que sólo se mide el trabajo del propio proceso.
+
+Uso: python scripts/bench_svg_generator.py [--iterations 50] [--json out.json]
+         [--baseline base.json] [--threshold 0.25]
+Compara contra una ejecución de referencia (por defecto
+scripts/bench_baselines/svg_generator.json; --baseline '' no compara) y sale
+con código 1 si algún caso empeora más que el umbral en tiempo o en memoria.
+Para actualizar la referencia tras una mejora, o en otra máquina:
+  python scripts/bench_svg_generator.py --baseline '' --json scripts/bench_baselines/svg_generator.json
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import itertools
+import platform
+import statistics
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Antes de importar el generador: sin procesos auxiliares ni caché en disco
+os.environ['IMAGE_POOL_KIND'] = 'inline'
+os.environ['ARTWORK_DISK_CACHE'] = 'false'
+
+from PIL import Image, ImageDraw
+
+from api import svg_generator
+from api.svg_generator import SVGGenerator
+
+THEMES = ['normal', 'dark', 'transparent-dark', 'transparent-light', 'bars']
+WIDTHS = [400, 640]
+COVER_SIZES = [300, 600, 1200]
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baselines', 'svg_generator.json')
+SESSION = {'title': 'Canción de Prueba', 'artist': 'Artista', 'album': 'Álbum',
+           'thumb': 'http://bench.local/library/metadata/1/thumb/1'}
+
+
+class _Response:
+    status_code = 200
+
+    def __init__(self, content):
+        self.content = content
+
+
+def make_cover(size, seed=7):
+    rng = random.Random(seed)
+    img = Image.new('RGB', (size, size), tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(12):
+        x0, y0 = rng.randrange(size), rng.randrange(size)
+        draw.ellipse((x0, y0, x0 + size // 3, y0 + size // 3), fill=tuple(rng.randrange(256) for _ in range(3)))
+    buf = io.BytesIO()
+    img.save(buf, format='JPEG', quality=90)
+    return buf.getvalue()
+
+
+def use_cover(jpeg_bytes):
+    """Sirve jpeg_bytes como portada de SESSION y vacía la caché de portadas."""
+    svg_generator.http_get = lambda url, **kw: _Response(jpeg_bytes)
+    SVGGenerator._thumb_cache.clear()
+
+
+def measure(fn, iterations):
+    """Tiempo por iteración (µs) y asignaciones de una llamada medidas con tracemalloc."""
+    output = fn()  # calentamiento
+    times = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1e6)
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        fn()
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    diff = after.compare_to(before, 'filename')
+    return {
+        'mean_us': statistics.fmean(times),
+        'median_us': statistics.median(times),
+        'min_us': min(times),
+        'alloc_peak_bytes': peak,
+        'alloc_net_bytes': sum(stat.size_diff for stat in diff),
+        'alloc_blocks': sum(stat.count_diff for stat in diff if stat.count_diff > 0),
+        'output_bytes': len(output.encode('utf-8')) if isinstance(output, str) else len(json.dumps(output)),
+    }
+
+
+def cover_cases(cover_sizes):
+    gen = SVGGenerator()
+    for size in cover_sizes:
+        jpeg = make_cover(size)
+
+        def cover():
+            SVGGenerator._thumb_cache.clear()
+            return gen._get_cover_data_url(SESSION)
+
+        def palette():
+            SVGGenerator._thumb_cache.get(SESSION['thumb']).palettes.clear()
+            return gen._extract_palette(SESSION)
+
+        use_cover(jpeg)
+        yield {'stage': 'cover', 'cover': size}, cover
+        use_cover(jpeg)
+        gen._get_cover_data_url(SESSION)
+        yield {'stage': 'palette', 'cover': size}, palette
+
+
+def render_cases(widths, themes, cover_size):
+    use_cover(make_cover(cover_size))
+    SVGGenerator().warm_cover(SESSION)
+    for width in widths:
+        gen = SVGGenerator(width, 90)
+        text_x = gen.COVER_X + gen.COVER_SIZE + 12
+
+        def bars():
+            SVGGenerator._svg_bars_markup.cache_clear()
+            return gen._generate_svg_bars(96, '9C27B0', text_x, 67, width - text_x - 10)
+
+        yield {'stage': 'svg_bars', 'width': width}, bars
+        for theme in themes:
+            gen = SVGGenerator(width, 90, theme)
+            if theme == 'bars':
+                yield {'stage': 'render_bars_only', 'width': width, 'theme': theme}, \
+                    (lambda g=gen: g._generate_bars_only_svg(SESSION))
+            else:
+                yield {'stage': 'render_now_playing', 'width': width, 'theme': theme}, \
+                    (lambda g=gen: g.generate_now_playing_svg(SESSION))
+
+
+def case_id(case):
+    return '/'.join(f'{k}={case[k]}' for k in ('stage', 'width', 'theme', 'cover') if k in case)
+
+
+def compare(results, baseline, threshold):
+    """Casos que empeoran más de `threshold` (fracción) en mediana de tiempo o en pico de memoria."""
+    previous = {r['id']: r for r in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        old = previous.get(result['id'])
+        if not old:
+            continue
+        for metric in ('median_us', 'alloc_peak_bytes'):
+            if old[metric] and result[metric] > old[metric] * (1 + threshold):
+                regressions.append((result['id'], metric, old[metric], result[metric]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--widths', default=','.join(map(str, WIDTHS)))
+    parser.add_argument('--themes', default=','.join(THEMES))
+    parser.add_argument('--covers', default=','.join(map(str, COVER_SIZES)), help='lados de portada (px)')
+    parser.add_argument('--json', help='guarda los resultados en este fichero')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help="resultados de referencia contra los que comparar ('' para no comparar)")
+    parser.add_argument('--threshold', type=float, default=0.25, help='empeoramiento tolerado (0.25 = 25%%)')
+    args = parser.parse_args(argv)
+
+    widths = [int(w) for w in args.widths.split(',')]
+    covers = [int(c) for c in args.covers.split(',')]
+    themes = args.themes.split(',')
+    # La referencia se lee antes de medir: --json puede sobrescribir ese mismo fichero
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as fh:
+            baseline = json.load(fh)
+    real_http_get = svg_generator.http_get
+    results = []
+    print(f"{'caso':<62}{'mediana µs':>12}{'pico KiB':>10}{'bloques':>9}{'salida B':>10}")
+    try:
+        # Los generadores preparan cada caso justo antes de medirlo: se consumen de uno en uno
+        for case, fn in itertools.chain(cover_cases(covers), render_cases(widths, themes, covers[len(covers) // 2])):
+            stats = measure(fn, args.iterations)
+            result = dict(case, id=case_id(case), **stats)
+            results.append(result)
+            print(f"{result['id']:<62}{stats['median_us']:>12.1f}{stats['alloc_peak_bytes'] / 1024:>10.1f}"
+                  f"{stats['alloc_blocks']:>9}{stats['output_bytes']:>10}")
+    finally:
+        svg_generator.http_get = real_http_get
+        SVGGenerator._thumb_cache.clear()
+
+    report = {
+        'config': vars(args),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, indent=2)
+        print(f"Resultados guardados en {args.json}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for case, metric, old, new in regressions:
+            print(f"⚠️  {case}: {metric} {old:.1f} -> {new:.1f} ({(new / old - 1) * 100:+.0f}%)")
+        if regressions:
+            return 1
+        print(f"Sin regresiones frente a {args.baseline} (umbral {args.threshold:.0%})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Benchmark de las plantillas SVG precompiladas.
+
+Compara el render con la plantilla ya compilada frente al camino frío, que
+reconstruye el documento completo como hacía el generador antes de las
+plantillas. Uso: python scripts/bench_svg_templates.py [iteraciones]
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.svg_generator import SVGGenerator
+from api.svg_templates import clear_templates
+
+SESSION = {'title': 'Canción de Prueba', 'artist': 'Artista', 'album': 'Álbum'}
+THEMES = ['normal', 'dark', 'transparent-dark', 'transparent-light', 'bars']
+
+
+def bench(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main(iterations=500):
+    print(f"{'tema':<18}{'ancho':>6}{'frío (µs)':>12}{'plantilla (µs)':>16}{'mejora':>9}")
+    for theme in THEMES:
+        for width in (400, 640):
+            gen = SVGGenerator(width, 90, theme)
+
+            def cold():
+                clear_templates()
+                return gen.generate_now_playing_svg(SESSION)
+
+            def warm():
+                return gen.generate_now_playing_svg(SESSION)
+
+            assert cold() == warm(), "La plantilla debe producir el mismo SVG"
+            cold_us = bench(cold, iterations)
+            warm_us = bench(warm, iterations)
+            print(f"{theme:<18}{width:>6}{cold_us:>12.1f}{warm_us:>16.1f}{cold_us / warm_us:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Servidor websocket local que imita /:/websockets/notifications de Plex.
+
+Reproduce notificaciones grabadas (una por línea, en JSON) a cada cliente que
+se conecta. Sólo implementa lo necesario de RFC 6455: handshake y frames de
+texto sin máscara del servidor al cliente.
+
+Uso: python scripts/fake_plex_notifications.py [fichero.jsonl] [puerto]
+"""
+import os
+import sys
+import time
+import base64
+import socket
+import struct
+import hashlib
+import threading
+
+_WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+DEFAULT_FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'plex_notifications.jsonl')
+
+
+def load_payloads(path=DEFAULT_FIXTURE):
+    with open(path, 'r', encoding='utf-8') as fh:
+        return [line.strip() for line in fh if line.strip()]
+
+
+def _frame(text, opcode=0x1):
+    data = text.encode('utf-8')
+    length = len(data)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+    return header + data
+
+
+class FakeNotificationServer:
+    def __init__(self, payloads=None, host='127.0.0.1', port=0, delay=0.01, close_after_replay=False):
+        self.payloads = payloads if payloads is not None else load_payloads()
+        self.delay = delay
+        self.close_after_replay = close_after_replay
+        self.paths = []  # rutas pedidas (para comprobar el token/endpoint)
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((host, port))
+        self._sock.listen(8)
+        self.host, self.port = self._sock.getsockname()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def baseurl(self):
+        return f'http://{self.host}:{self.port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        try:
+            self._sock.close()
+        except OSError:
+            pass
+
+    def _serve(self):
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        try:
+            request = b''
+            while b'\r\n\r\n' not in request:
+                chunk = conn.recv(4096)
+                if not chunk:
+                    return
+                request += chunk
+            lines = request.decode('latin-1').split('\r\n')
+            self.paths.append(lines[0].split(' ')[1])
+            headers = {}
+            for line in lines[1:]:
+                if ':' in line:
+                    k, v = line.split(':', 1)
+                    headers[k.strip().lower()] = v.strip()
+            accept = base64.b64encode(hashlib.sha1((headers.get('sec-websocket-key', '') + _WS_GUID).encode()).digest()).decode()
+            conn.sendall((
+                'HTTP/1.1 101 Switching Protocols\r\n'
+                'Upgrade: websocket\r\n'
+                'Connection: Upgrade\r\n'
+                f'Sec-WebSocket-Accept: {accept}\r\n\r\n'
+            ).encode())
+            for payload in self.payloads:
+                if self._stop.is_set():
+                    break
+                time.sleep(self.delay)
+                conn.sendall(_frame(payload))
+            if self.close_after_replay:
+                conn.sendall(struct.pack('!BB', 0x88, 0))
+                return
+            # Mantener la conexión abierta hasta que el cliente cierre
+            while not self._stop.is_set():
+                if not conn.recv(1024):
+                    break
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+
+if __name__ == '__main__':
+    fixture = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_FIXTURE
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 32401
+    server = FakeNotificationServer(load_payloads(fixture), port=port, delay=1.0).start()
+    print(f"🔌 Notificaciones falsas en ws://{server.host}:{server.port}/:/websockets/notifications")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Servidor HTTP local que imita plex.tv y un Plex Media Server para benchmarks.
+
+Sirve /api/v2/resources y /users/account (plex.tv), la raíz e /identity del
+servidor, /status/sessions, los endpoints de historial y las portadas
+(/library/metadata/.../thumb y /photo/:/transcode). Cada respuesta se
+retrasa `latency` segundos ± `jitter` y las portadas tienen `cover_size` px.
+Con PLEX_TV_URL=<baseurl> la aplicación descubre este servidor en lugar del
+real.
+
+Uso: python scripts/fake_plex_server.py [puerto] [latencia_ms]
+"""
+import io
+import sys
+import json
+import time
+import random
+import threading
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.sax.saxutils import quoteattr
+
+from PIL import Image, ImageDraw
+
+OWNER = 'benchowner'
+MACHINE_ID = 'fake-plex-0001'
+
+
+def _cover_jpeg(seed, size):
+    rng = random.Random(seed)
+    img = Image.new('RGB', (size, size), tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(6):
+        x0, y0 = rng.randrange(size), rng.randrange(size)
+        draw.ellipse((x0, y0, x0 + size // 3, y0 + size // 3), fill=tuple(rng.randrange(256) for _ in range(3)))
+    buf = io.BytesIO()
+    img.save(buf, format='JPEG', quality=85)
+    return buf.getvalue()
+
+
+def _track_xml(i, session=False):
+    attrs = {
+        'type': 'track',
+        'ratingKey': str(1000 + i),
+        'key': f'/library/metadata/{1000 + i}',
+        'title': f'Canción {i}',
+        'grandparentTitle': f'Artista {i % 7}',
+        'parentTitle': f'Álbum {i % 11}',
+        'thumb': f'/library/metadata/{1000 + i}/thumb/1700000000',
+    }
+    if session:
+        attrs['sessionKey'] = str(i)
+        attrs['viewOffset'] = '1000'
+    body = ''.join(f' {k}={quoteattr(v)}' for k, v in attrs.items())
+    if not session:
+        return f'<Track{body}/>'
+    return (f'<Track{body}><User id="1" title={quoteattr(OWNER)}/>'
+            f'<Player state="playing" title="Bench" machineIdentifier="player-{i}"/></Track>')
+
+
+class FakePlexServer:
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, cover_size=600,
+                 playing=True, history_size=25):
+        self.latency = latency
+        self.jitter = jitter
+        self.cover_size = cover_size
+        self.playing = playing
+        self.history_size = history_size
+        self.requests = {}  # ruta -> número de peticiones
+        self._covers = {}
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Cabeceras y cuerpo van en escrituras separadas: sin esto Nagle + ACK retardado añaden ~40 ms
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                server._handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self.host, self.port = self._httpd.server_address[:2]
+        self._thread = None
+
+    @property
+    def baseurl(self):
+        return f'http://{self.host}:{self.port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _cover(self, key):
+        with self._lock:
+            data = self._covers.get(key)
+            if data is None:
+                size = self.cover_size if key[1] is None else min(self.cover_size, key[1])
+                data = self._covers[key] = _cover_jpeg(key[0], size)
+            return data
+
+    def _route(self, path, query):
+        if path == '/api/v2/resources':
+            return 'application/json', json.dumps([{
+                'name': 'Fake Plex', 'provides': 'server', 'productVersion': '1.40.0',
+                'clientIdentifier': MACHINE_ID, 'accessToken': 'fake-server-token',
+                'owner': {'username': OWNER},
+                'connections': [{'uri': self.baseurl, 'local': False}],
+            }]).encode()
+        if path == '/users/account':
+            return 'application/json', json.dumps({'username': OWNER}).encode()
+        if path in ('/', '/identity'):
+            return 'application/xml', (
+                f'<MediaContainer size="0" friendlyName="Fake Plex" machineIdentifier="{MACHINE_ID}" '
+                f'version="1.40.0" myPlexUsername="{OWNER}"/>').encode()
+        if path == '/status/sessions':
+            items = _track_xml(1, session=True) if self.playing else ''
+            return 'application/xml', f'<MediaContainer size="{int(self.playing)}">{items}</MediaContainer>'.encode()
+        if path in ('/status/sessions/history/all', '/system/history/all'):
+            items = ''.join(_track_xml(i) for i in range(self.history_size))
+            return 'application/xml', f'<MediaContainer size="{self.history_size}">{items}</MediaContainer>'.encode()
+        if path == '/photo/:/transcode':
+            source = query.get('url', [''])[0]
+            size = int(query.get('width', [self.cover_size])[0])
+            return 'image/jpeg', self._cover((hash(source) & 0xffff, size))
+        if path.startswith('/library/metadata/') and '/thumb' in path:
+            return 'image/jpeg', self._cover((hash(path) & 0xffff, None))
+        return None, None
+
+    def _handle(self, handler):
+        parts = urlsplit(handler.path)
+        with self._lock:
+            self.requests[parts.path] = self.requests.get(parts.path, 0) + 1
+        delay = self.latency + (random.uniform(-self.jitter, self.jitter) if self.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+        content_type, body = self._route(parts.path, parse_qs(parts.query))
+        if body is None:
+            handler.send_response(404)
+            handler.send_header('Content-Length', '0')
+            handler.end_headers()
+            return
+        handler.send_response(200)
+        handler.send_header('Content-Type', content_type)
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 32400
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.05
+    fake = FakePlexServer(port=port, latency=latency).start()
+    print(f"Fake Plex en {fake.baseurl} (latencia {latency * 1000:.0f} ms). PLEX_TV_URL={fake.baseurl}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Informe de tamaño del SVG por tema: barras con <animate> frente al modo compacto
+(SVG_COMPACT_BARS=true, keyframes CSS compartidos). Muestra bytes sin comprimir
+y con gzip. Uso: python scripts/report_svg_sizes.py [ancho]
+"""
+import os
+import sys
+import gzip
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.svg_generator import SVGGenerator
+
+SESSION = {'title': 'Canción de Prueba', 'artist': 'Artista', 'album': 'Álbum'}
+THEMES = ['normal', 'dark', 'transparent-dark', 'transparent-light', 'bars']
+
+
+def sizes(svg):
+    raw = svg.encode('utf-8')
+    return len(raw), len(gzip.compress(raw))
+
+
+def main(width=400):
+    print(f"{'tema':<18}{'normal':>10}{'compacto':>10}{'ahorro':>9}{'gzip':>9}{'gzip comp.':>12}")
+    for theme in THEMES:
+        full, full_gz = sizes(SVGGenerator(width, 90, theme, compact=False).generate_now_playing_svg(SESSION))
+        compact, compact_gz = sizes(SVGGenerator(width, 90, theme, compact=True).generate_now_playing_svg(SESSION))
+        saving = 100 * (1 - compact / full)
+        print(f"{theme:<18}{full:>10}{compact:>10}{saving:>8.1f}%{full_gz:>9}{compact_gz:>12}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 400)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Test de las cachés de portadas: identidad canónica sin token, presupuesto de bytes y almacén en disco."""
+import sys
+import os
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.artwork_cache import ArtworkEntry, ArtworkMemoryCache, canonical_artwork_key
+from api.artwork_store import ArtworkStore
+
+
+def test_canonical_key_ignores_token():
+    a = canonical_artwork_key('https://Plex.example:32400/library/metadata/1/thumb/169?X-Plex-Token=aaa')
+    b = canonical_artwork_key('https://plex.example:32400/library/metadata/1/thumb/169?x-plex-token=bbb')
+    assert a == b and 'aaa' not in a
+    assert a != canonical_artwork_key('https://plex.example:32400/library/metadata/2/thumb/169?X-Plex-Token=aaa')
+
+
+def test_memory_cache_dedups_and_evicts():
+    cache = ArtworkMemoryCache(max_entries=10, max_bytes=100)
+    cache.set('http://plex/thumb/1?X-Plex-Token=a', ArtworkEntry('data:image/jpeg;base64,' + 'A' * 40))
+    assert cache.get('http://plex/thumb/1?X-Plex-Token=b') is not None, "Otro token debe reutilizar la portada"
+    cache.set('http://plex/thumb/2?X-Plex-Token=a', ArtworkEntry('data:image/jpeg;base64,' + 'B' * 40))
+    cache.set('http://plex/thumb/3?X-Plex-Token=a', ArtworkEntry('data:image/jpeg;base64,' + 'C' * 40))
+    info = cache.info()
+    assert info['bytes'] <= 100 and info['evictions'] >= 1
+    assert cache.get('http://plex/thumb/1?X-Plex-Token=a') is None, "La entrada menos reciente debe desalojarse"
+
+
+def test_disk_store_shared_between_instances():
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = ArtworkStore(root=tmp, max_bytes=10_000)
+        jpeg = b'\xff\xd8' + b'x' * 1000
+        content_hash = writer.put('http://plex/thumb/1?X-Plex-Token=a', jpeg)
+        writer.set_palette('http://plex/thumb/1?X-Plex-Token=a', 6, ['rgb(1,2,3)'])
+        # Otro worker (otra instancia) con otro token lee la misma portada y paleta
+        reader = ArtworkStore(root=tmp, max_bytes=10_000)
+        data, palettes = reader.get('http://plex/thumb/1?X-Plex-Token=b')
+        assert data == jpeg and palettes == {6: ['rgb(1,2,3)']}
+        # Mismo contenido con otra identidad: un único blob
+        assert writer.put('http://plex/thumb/99?X-Plex-Token=a', jpeg) == content_hash
+        assert len([n for n in os.listdir(os.path.join(tmp, 'blobs')) if n.endswith('.jpg')]) == 1
+        assert reader.get('http://plex/thumb/2') is None
+
+
+def test_disk_store_evicts_oldest_blobs():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ArtworkStore(root=tmp, max_bytes=2500)
+        for i in range(4):
+            content_hash = store.put(f'http://plex/thumb/{i}', bytes([i]) * 1000)
+            # mtime explícito y creciente: el orden LRU no depende de la resolución del reloj
+            os.utime(os.path.join(tmp, 'blobs', f'{content_hash}.jpg'), (1000 + i, 1000 + i))
+        assert store.stats['evictions'] >= 2
+        assert store.get('http://plex/thumb/3') is not None, "La portada más reciente debe conservarse"
+        assert len(os.listdir(os.path.join(tmp, 'index'))) == len(
+            [n for n in os.listdir(os.path.join(tmp, 'blobs')) if n.endswith('.jpg')]), "Sin índices huérfanos"
+
+
+def test_disk_store_throttles_scans_and_prunes_orphans():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ArtworkStore(root=tmp, max_bytes=1_000_000, evict_every=4)
+        for i in range(3):
+            store.put(f'http://plex/thumb/{i}', bytes([i]) * 100)
+        assert store.stats['scans'] == 1, "Por debajo del límite sólo se recorre al empezar"
+        os.unlink(os.path.join(tmp, 'blobs', f"{store.put('http://plex/thumb/0', bytes([0]) * 100)}.jpg"))
+        store.put('http://plex/thumb/9', b'9' * 100)  # cuarta escritura desde el recorrido
+        assert store.stats['scans'] == 2 and store.stats['index_removed'] == 1
+        assert len(os.listdir(os.path.join(tmp, 'index'))) == 3
+    print('✅ Test artwork cache passed')
+
+
+if __name__ == '__main__':
+    try:
+        test_canonical_key_ignores_token()
+        test_memory_cache_dedups_and_evicts()
+        test_disk_store_shared_between_instances()
+        test_disk_store_evicts_oldest_blobs()
+        test_disk_store_throttles_scans_and_prunes_orphans()
+        sys.exit(0)
+    except AssertionError as e:
+        print('❌', e)
+        sys.exit(1)
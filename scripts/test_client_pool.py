@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Test del pool de clientes Plex: reutilización por token, TTL, LRU y revalidación."""
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.client_pool import PlexClientPool
+
+
+class FakeClient:
+    def __init__(self, token):
+        self.token = token
+        self.healthy = True
+
+    def is_connected(self):
+        return True
+
+    def ping(self):
+        return self.healthy
+
+
+def make_pool(**kwargs):
+    built = []
+
+    def factory(token):
+        client = FakeClient(token)
+        built.append(client)
+        return client
+
+    return PlexClientPool(factory=factory, **kwargs), built
+
+
+def test_pool_reuses_clients_per_token():
+    pool, built = make_pool(max_size=4, ttl=60, health_interval=60)
+    a = pool.get('token-a')
+    assert pool.get('token-a') is a
+    assert pool.get('token-b') is not a
+    assert len(built) == 2
+    assert pool.info()['hits'] == 1
+
+
+def test_pool_evicts_lru_and_expired():
+    pool, built = make_pool(max_size=2, ttl=0.05, health_interval=60)
+    pool.get('a')
+    pool.get('b')
+    pool.get('a')
+    pool.get('c')  # desaloja 'b'
+    assert pool.info()['size'] == 2
+    pool.get('b')
+    assert len(built) == 4
+    time.sleep(0.06)
+    pool.get('a')
+    assert len(built) == 5, "Las entradas expiradas deben reconstruirse"
+
+
+def test_pool_revalidates_unhealthy_clients():
+    pool, built = make_pool(max_size=2, ttl=60, health_interval=0)
+    first = pool.get('a')
+    first.healthy = False
+    second = pool.get('a')
+    assert second is not first
+    assert pool.info()['revalidations'] >= 1
+
+
+def test_pool_negative_caches_failures_and_drops_key_locks():
+    attempts = []
+
+    class DeadClient(FakeClient):
+        def is_connected(self):
+            return False
+
+    def factory(token):
+        attempts.append(token)
+        return DeadClient(token)
+
+    pool = PlexClientPool(factory=factory, max_size=2, ttl=60, health_interval=60, failure_ttl=0.05)
+    pool.get('bad')
+    pool.get('bad')
+    assert attempts == ['bad'], "Un fallo reciente no debe repetir el descubrimiento"
+    time.sleep(0.06)
+    pool.get('bad')
+    assert attempts == ['bad', 'bad']
+    for i in range(5):
+        pool.get(f'bad-{i}')
+    info = pool.info()
+    assert info['failed'] <= 2 and info['pending'] == 0, info
+    print('✅ Test client pool passed')
+
+
+if __name__ == '__main__':
+    try:
+        test_pool_reuses_clients_per_token()
+        test_pool_evicts_lru_and_expired()
+        test_pool_revalidates_unhealthy_clients()
+        test_pool_negative_caches_failures_and_drops_key_locks()
+        sys.exit(0)
+    except AssertionError as e:
+        print('❌', e)
+        sys.exit(1)
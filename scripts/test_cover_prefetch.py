@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Test de la precarga de portadas del historial: en paralelo, sin duplicados y disparada por el historial."""
+import sys
+import os
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api.plex_client as plex_client
+from api.cover_prefetch import CoverPrefetcher
+
+
+def test_prefetch_skips_cached_and_inflight_covers():
+    release = threading.Event()
+    warmed = []
+
+    def warm(item):
+        release.wait(5)
+        warmed.append(item['thumb'])
+        return True
+
+    prefetcher = CoverPrefetcher(workers=4, warm=warm, is_cached=lambda thumb: thumb == 'cached')
+    items = [{'thumb': 'a'}, {'thumb': 'b'}, {'thumb': 'cached'}, {'thumb': None}]
+    futures = prefetcher.prefetch(items)
+    # Mientras 'a' y 'b' están en curso no se vuelven a encolar
+    assert prefetcher.prefetch([{'thumb': 'a'}]) == []
+    release.set()
+    assert all(f.result(5) for f in futures)
+    info = prefetcher.info()
+    assert sorted(warmed) == ['a', 'b']
+    assert info['scheduled'] == 2 and info['skipped'] == 2 and info['completed'] == 2 and info['inflight'] == 0
+
+
+def test_history_listeners_receive_loaded_items():
+    received = []
+    plex_client.add_history_listener(received.append)
+
+    class FakeResp:
+        status_code = 200
+        text = '<MediaContainer><Track type="track" title="T" grandparentTitle="A" parentTitle="B" thumb="/library/metadata/1/thumb/2"/></MediaContainer>'
+
+    client = plex_client.PlexClient.__new__(plex_client.PlexClient)
+    client.url, client.token, client._resource, client._redis = 'http://plex:32400', 'tok', None, None
+    client.owner_username, client._history_cache, client._history_ttl = 'owner', None, 60
+    saved = plex_client.http_get
+    plex_client.http_get = lambda *a, **kw: FakeResp()
+    try:
+        items = client.get_recent_playback_list(limit=5)
+    finally:
+        plex_client.http_get = saved
+        plex_client.remove_history_listener(received.append)
+    assert received == [items] and items[0]['thumb'].startswith('http://plex:32400/')
+    print('✅ Test cover prefetch passed')
+
+
+if __name__ == '__main__':
+    try:
+        test_prefetch_skips_cached_and_inflight_covers()
+        test_history_listeners_receive_loaded_items()
+        sys.exit(0)
+    except AssertionError as e:
+        print('❌', e)
+        sys.exit(1)
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""Test de la caché de descubrimiento en fichero: TTL, escritura atómica e invalidación."""
+import sys
+import os
+import time
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.discovery_cache import DiscoveryCache
+
+
+def test_discovery_cache_file_backend():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'discovery.json')
+        cache = DiscoveryCache(ttl=60, path=path, redis_client=False)
+        data = {'url': 'https://plex.example:32400', 'owner_username': 'owner'}
+        cache.set('secret-token', data)
+        assert 'secret-token' not in open(path).read(), "El token no debe guardarse en claro"
+        # Una instancia nueva (cold start) lee lo mismo del fichero
+        assert DiscoveryCache(ttl=60, path=path, redis_client=False).get('secret-token') == data
+        cache.invalidate('secret-token')
+        assert cache.get('secret-token') is None
+
+        short = DiscoveryCache(ttl=0.05, path=path, redis_client=False)
+        short.set('secret-token', data)
+        time.sleep(0.06)
+        assert short.get('secret-token') is None
+    print('✅ Test discovery cache passed')
+
+
+if __name__ == '__main__':
+    try:
+        test_discovery_cache_file_backend()
+        sys.exit(0)
+    except AssertionError as e:
+        print('❌', e)
+        sys.exit(1)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Test de las sesiones HTTP por host: reutilización de conexiones y timeouts separados."""
+import sys
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.http_pool import close_sessions, get_session, http_get, timeouts, HTTP_CONNECT_TIMEOUT
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    peers = set()
+
+    def do_GET(self):
+        _Handler.peers.add(self.client_address)
+        body = b'ok'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_sessions_are_shared_per_host():
+    assert get_session('https://plex.tv/api/v2/resources') is get_session('https://PLEX.tv/users/account')
+    assert get_session('https://plex.tv/') is not get_session('http://192.168.1.2:32400/')
+    assert timeouts(6) == (HTTP_CONNECT_TIMEOUT, 6)
+    close_sessions()
+
+
+def test_keep_alive_reuses_connection():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+    try:
+        for i in range(5):
+            assert http_get(f'{base}/thumb/{i}', read_timeout=2).text == 'ok'
+    finally:
+        server.shutdown()
+        server.server_close()
+        close_sessions()
+    assert len(_Handler.peers) == 1, f"Cinco peticiones deben ir por una conexión: {_Handler.peers}"
+    print('✅ Test HTTP pool passed')
+
+
+if __name__ == '__main__':
+    try:
+        test_sessions_are_shared_per_host()
+        test_keep_alive_reuses_connection()
+        sys.exit(0)
+    except AssertionError as e:
+        print('❌', e)
+        sys.exit(1)
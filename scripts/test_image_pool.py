@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Test del pool de imagen: trabajos en otro proceso, contrapresión, métricas de cola y paso a hilos."""
+import sys
+import os
+import io
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from api import image_pool
+from api.image_pool import ImagePool, ImagePoolBusy, process_cover
+
+
+def _idle_info(pool, timeout=2):
+    """info() una vez procesado el callback de fin del último trabajo (corre en otro hilo)."""
+    deadline = time.time() + timeout
+    while pool.info()['pending'] and time.time() < deadline:
+        time.sleep(0.01)
+    return pool.info()
+
+
+def test_process_pool_shrinks_cover_and_extracts_palette():
+    buf = io.BytesIO()
+    Image.new('RGB', (1200, 1200), (30, 120, 200)).save(buf, format='JPEG')
+    pool = ImagePool(kind='process', workers=1)
+    try:
+        jpeg_bytes, palettes = pool.run(process_cover, buf.getvalue())
+        info = _idle_info(pool)
+    finally:
+        pool.shutdown()
+    assert max(Image.open(io.BytesIO(jpeg_bytes)).size) <= 160
+    assert palettes and palettes[6][0].startswith('rgb(')
+    assert info['completed'] == 1 and info['pending'] == 0
+
+
+def test_backpressure_rejects_when_full():
+    pool = ImagePool(kind='thread', workers=1, max_pending=1, queue_timeout=0.05)
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return 'ok'
+
+    results = []
+    worker = threading.Thread(target=lambda: results.append(pool.run(slow)))
+    worker.start()
+    started.wait(5)
+    try:
+        assert pool.info()['pending'] == 1
+        try:
+            pool.run(lambda: 'no')
+            assert False, "Con la cola llena el envío debe rechazarse"
+        except ImagePoolBusy:
+            pass
+    finally:
+        release.set()
+        worker.join(5)
+        info = _idle_info(pool)
+        pool.shutdown()
+    assert results == ['ok'] and info['rejected'] == 1 and info['peak_pending'] == 1 and info['pending'] == 0
+    print('✅ Test image pool passed')
+
+
+def test_process_pool_unavailable_falls_back_to_threads():
+    class NoProcesses:
+        def __init__(self, *args, **kwargs):
+            raise OSError("sin /dev/shm")
+
+    real = image_pool.ProcessPoolExecutor
+    image_pool.ProcessPoolExecutor = NoProcesses
+    pool = ImagePool(kind='process', workers=1, max_pending=1)
+    try:
+        assert pool.run(lambda: 'ok') == 'ok'
+        info = _idle_info(pool)
+    finally:
+        image_pool.ProcessPoolExecutor = real
+        pool.shutdown()
+    assert info['kind'] == 'thread' and info['fallbacks'] == 1 and info['pending'] == 0
+
+
+def test_failed_submit_releases_slot():
+    pool = ImagePool(kind='thread', workers=1, max_pending=2, queue_timeout=0.05)
+
+    def broken_executor():
+        raise RuntimeError("no se pudo crear el pool")
+
+    pool._get_executor = broken_executor
+    for _ in range(5):
+        try:
+            pool.run(lambda: 'no')
+            assert False, "El fallo al crear el pool debe propagarse"
+        except ImagePoolBusy:
+            assert False, "Un fallo al enviar no puede dejar el hueco ocupado"
+        except RuntimeError:
+            pass
+    info = pool.info()
+    assert info['pending'] == 0 and info['failed'] == 5 and info['rejected'] == 0
+
+
+if __name__ == '__main__':
+    try:
+        test_process_pool_shrinks_cover_and_extracts_palette()
+        test_backpressure_rejects_when_full()
+        test_process_pool_unavailable_falls_back_to_threads()
+        test_failed_submit_releases_slot()
+        print('✅ Test paso a hilos y liberación de huecos passed')
+        sys.exit(0)
+    except AssertionError as e:
+        print('❌', e)
+        sys.exit(1)
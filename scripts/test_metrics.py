@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Test de las métricas: formato de Prometheus, histogramas, colectores y endpoint /metrics."""
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import metrics
+from api.metrics import Counter, Histogram, endpoint_label
+
+
+def test_counter_and_histogram_exposition():
+    counter = Counter('test_m2s_hits_total', 'Aciertos de prueba', ('cache',))
+    counter.inc(cache='render')
+    counter.inc(2, cache='render')
+    counter.inc(cache='th"umb')
+    hist = Histogram('test_m2s_latency_seconds', 'Latencia de prueba', ('endpoint',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        hist.observe(value, endpoint='/status/sessions')
+
+    text = metrics.render()
+    assert '# TYPE test_m2s_hits_total counter' in text
+    assert 'test_m2s_hits_total{cache="render"} 3' in text
+    assert r'test_m2s_hits_total{cache="th\"umb"} 1' in text, "Las comillas de las etiquetas se escapan"
+    assert 'test_m2s_latency_seconds_bucket{endpoint="/status/sessions",le="0.1"} 1' in text
+    assert 'test_m2s_latency_seconds_bucket{endpoint="/status/sessions",le="1.0"} 2' in text, "Los buckets son acumulados"
+    assert 'test_m2s_latency_seconds_bucket{endpoint="/status/sessions",le="+Inf"} 3' in text
+    assert 'test_m2s_latency_seconds_count{endpoint="/status/sessions"} 3' in text
+
+
+def test_endpoint_label_bounds_cardinality():
+    assert endpoint_label('/library/metadata/1001/thumb/1700000000?X-Plex-Token=x') == '/library/metadata/:id/thumb/:id'
+    assert endpoint_label('/photo/:/transcode') == '/photo/:/transcode'
+    assert endpoint_label('') == '/'
+
+
+def test_metrics_endpoint_reports_requests_and_caches():
+    import app as app_module
+
+    with app_module.app.test_client() as client:
+        client.get('/api/cache/clear')
+        resp = client.get('/metrics')
+    text = resp.get_data(as_text=True)
+    assert resp.status_code == 200 and resp.mimetype == 'text/plain'
+    assert 'music2sig_requests_total{route="/api/cache/clear",status="200"}' in text
+    assert 'music2sig_request_duration_seconds_count{route="/api/cache/clear",theme=""}' in text
+    assert 'music2sig_requests_in_flight{route="/api/cache/clear"} 0' in text
+    assert 'music2sig_cache_hits_total{cache="render"}' in text
+    assert 'music2sig_cache_entries{cache="thumb"}' in text
+
+
+if __name__ == '__main__':
+    test_counter_and_histogram_exposition()
+    print("✅ Test formato de exposición passed")
+    test_endpoint_label_bounds_cardinality()
+    print("✅ Test etiqueta de endpoint passed")
+    test_metrics_endpoint_reports_requests_and_caches()
+    print("✅ Test endpoint /metrics passed")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Test de invalidación por notificaciones: reproduce notificaciones grabadas desde un websocket local."""
+import sys
+import os
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from api.notifications import NotificationWatcher, add_invalidation_listener, remove_invalidation_listener
+from fake_plex_notifications import FakeNotificationServer
+
+
+class FakeServer:
+    def __init__(self, baseurl):
+        self.baseurl = baseurl
+
+    def url(self, key, includeToken=False):
+        return self.baseurl + key + ('?X-Plex-Token=test-token' if includeToken else '')
+
+
+class FakeClient:
+    def __init__(self, baseurl):
+        self.server = FakeServer(baseurl)
+        self.history_clears = 0
+
+    def clear_history_cache(self, user=None):
+        self.history_clears += 1
+        return True
+
+
+class FakePoller:
+    def __init__(self):
+        self.polls = 0
+        self.refreshes = 0
+        self.invalidations = 0
+
+    def poll_once(self):
+        self.polls += 1
+
+    def refresh_now(self):
+        self.refreshes += 1
+
+    def invalidate(self):
+        self.invalidations += 1
+
+
+def test_notifications_invalidate_on_track_changes():
+    server = FakeNotificationServer(delay=0.01).start()
+    client = FakeClient(server.baseurl)
+    poller = FakePoller()
+    invalidated = []
+
+    def listener(token):
+        invalidated.append(token)
+
+    add_invalidation_listener(listener)
+    watcher = NotificationWatcher('test-token', poller, client_getter=lambda token: client, reconnect_delay=0.05)
+    try:
+        watcher.start()
+        deadline = time.time() + 5
+        while watcher.stats['notifications'] < len(server.payloads) and time.time() < deadline:
+            time.sleep(0.02)
+        assert watcher.stats['notifications'] == len(server.payloads), "Deben recibirse todas las notificaciones"
+        # Inicio, cambio de pista, pausa, timeline de pista y stop; el progreso y 'activity' no cuentan
+        assert len(invalidated) == 5, f"Invalidaciones inesperadas: {len(invalidated)}"
+        assert poller.polls == 5 and client.history_clears == 5
+        assert server.paths[0].startswith('/:/websockets/notifications')
+    finally:
+        watcher.stop()
+        remove_invalidation_listener(listener)
+        server.stop()
+    print('✅ Test notifications passed')
+
+
+def test_notifications_reconnect_invalidates_snapshot():
+    server = FakeNotificationServer(payloads=[], delay=0, close_after_replay=True).start()
+    client = FakeClient(server.baseurl)
+    poller = FakePoller()
+    watcher = NotificationWatcher('test-token', poller, client_getter=lambda token: client, reconnect_delay=0.05)
+    try:
+        watcher.start()
+        deadline = time.time() + 5
+        while watcher.stats['reconnects'] < 2 and time.time() < deadline:
+            time.sleep(0.02)
+        assert watcher.stats['reconnects'] >= 2, "El watcher debe reconectar cuando se cierra el websocket"
+        assert poller.invalidations >= 2, "Sin websocket la instantánea debe descartarse"
+    finally:
+        watcher.stop()
+        server.stop()
+
+
+if __name__ == '__main__':
+    try:
+        test_notifications_invalidate_on_track_changes()
+        test_notifications_reconnect_invalidates_snapshot()
+        sys.exit(0)
+    except AssertionError as e:
+        print('❌', e)
+        sys.exit(1)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Test del extractor de paleta: median-cut con NumPy y fallback a ColorThief."""
+import sys
+import os
+import io
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+import api.palette as palette
+
+
+def _cover(colors):
+    """Portada de 160 px en franjas verticales; la primera franja ocupa la mitad."""
+    img = Image.new('RGB', (160, 160), colors[0])
+    step = 80 // max(1, len(colors) - 1)
+    for i, color in enumerate(colors[1:]):
+        img.paste(color, (80 + i * step, 0, 80 + (i + 1) * step, 160))
+    buf = io.BytesIO()
+    img.save(buf, format='JPEG', quality=95)
+    return buf.getvalue()
+
+
+def _close(a, b, tolerance=24):
+    return all(abs(x - y) <= tolerance for x, y in zip(a, b))
+
+
+def test_numpy_palette_finds_dominant_colors():
+    colors = [(200, 30, 30), (30, 30, 200), (30, 180, 60)]
+    result = palette._numpy_palette(_cover(colors), 6)
+    assert _close(result[0], colors[0]), f"El color dominante debe ir primero: {result}"
+    for color in colors:
+        assert any(_close(color, c) for c in result), f"Falta {color} en {result}"
+    # Imagen de un solo color: no se inventan colores
+    assert len(palette._numpy_palette(_cover([(10, 90, 160)]), 6)) == 1
+
+
+def test_extract_palette_falls_back_without_numpy():
+    original = palette._NUMPY_AVAILABLE
+    palette._NUMPY_AVAILABLE = False
+    try:
+        result = palette.extract_palette(_cover([(200, 30, 30), (30, 30, 200)]), 4)
+    finally:
+        palette._NUMPY_AVAILABLE = original
+    assert result and all(len(c) == 3 for c in result)
+    print('✅ Test palette passed')
+
+
+if __name__ == '__main__':
+    try:
+        test_numpy_palette_finds_dominant_colors()
+        test_extract_palette_falls_back_without_numpy()
+        sys.exit(0)
+    except AssertionError as e:
+        print('❌', e)
+        sys.exit(1)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Test del pipeline de now-playing: sesión e historial en paralelo y una sola descarga de portada."""
+import sys
+import os
+import time
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.pipeline import NowPlayingPipeline
+
+
+def test_session_and_history_run_concurrently():
+    warmed = []
+    pipeline = NowPlayingPipeline(workers=4, speculative_history=True, warm=warmed.append, is_cached=lambda thumb: False)
+
+    def slow(value):
+        def fetch():
+            time.sleep(0.2)
+            return value
+        return fetch
+
+    start = time.perf_counter()
+    data, from_history = pipeline.resolve(slow(None), slow({'title': 'H', 'thumb': 'http://plex/h'}))
+    elapsed = time.perf_counter() - start
+    assert from_history and data['title'] == 'H'
+    assert elapsed < 0.35, f"La latencia debe ser la de la dependencia más lenta, no la suma ({elapsed:.2f}s)"
+    pipeline.wait_cover(data)
+    assert warmed == [data]
+
+    data, from_history = pipeline.resolve(lambda: {'title': 'S', 'thumb': None}, slow(None))
+    assert not from_history and data['title'] == 'S'
+
+
+def test_history_only_when_needed_or_sessions_slow():
+    calls = []
+
+    def history():
+        calls.append('history')
+        return {'title': 'H', 'thumb': None}
+
+    pipeline = NowPlayingPipeline(workers=4, warm=lambda s: True, is_cached=lambda thumb: True, history_hedge=0.05)
+    data, from_history = pipeline.resolve(lambda: {'title': 'S', 'thumb': None}, history)
+    assert not from_history and calls == [], "Con sesión rápida no se consulta el historial"
+
+    def slow_session():
+        time.sleep(0.2)
+        return {'title': 'S', 'thumb': None}
+
+    pipeline.resolve(slow_session, history)
+    assert calls == ['history'] and pipeline.info()['hedged_history'] == 1, "Con sessions() lento se adelanta"
+
+
+def test_cover_download_is_shared():
+    release = threading.Event()
+    calls = []
+
+    def warm(session):
+        calls.append(session['thumb'])
+        release.wait(5)
+        return True
+
+    pipeline = NowPlayingPipeline(workers=4, warm=warm, is_cached=lambda thumb: False)
+    session = {'thumb': 'http://plex/c'}
+    first = pipeline.start_cover(session)
+    assert pipeline.start_cover(dict(session)) is first, "Dos peticiones con la misma portada comparten la descarga"
+    release.set()
+    pipeline.wait_cover(session)
+    assert calls == ['http://plex/c'] and first.result(1) is True
+    assert pipeline.info()['covers_shared'] == 1
+    print('✅ Test pipeline passed')
+
+
+if __name__ == '__main__':
+    try:
+        test_session_and_history_run_concurrently()
+        test_history_only_when_needed_or_sessions_slow()
+        test_cover_download_is_shared()
+        sys.exit(0)
+    except AssertionError as e:
+        print('❌', e)
+        sys.exit(1)
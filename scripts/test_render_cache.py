@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""Test de la caché de renderizado: claves por variante, presupuesto de bytes, TTL, invalidación y Redis compartido."""
+import sys
+import os
+import time
+import gzip
+import fnmatch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.cache import BoundedLRUCache
+from api.render_cache import RenderCache, RenderedSVG, render_key, render_etag
+
+SESSION = {'title': 'Canción', 'artist': 'Artista', 'album': 'Álbum', 'thumb': 'http://plex/thumb/1'}
+
+
+def test_render_keys_separate_variants():
+    dark = render_key('tok', None, 'dark', 400, 90, SESSION)
+    light = render_key('tok', None, 'normal', 400, 90, SESSION)
+    other_song = render_key('tok', None, 'dark', 400, 90, dict(SESSION, title='Otra'))
+    assert len({dark, light, other_song}) == 3
+    assert 'tok' not in dark.split(':')[0], "La clave no debe contener el token en claro"
+    # El estado (playing/paused) no cambia la imagen
+    assert dark == render_key('tok', None, 'dark', 400, 90, dict(SESSION, state='paused'))
+
+
+def test_render_etag_is_stable():
+    key = render_key('tok', None, 'dark', 400, 90, SESSION)
+    assert render_etag(key, 'abc123') == render_etag(key, 'abc123')
+    assert render_etag(key, 'abc123') != render_etag(key, 'def456'), "Un despliegue nuevo cambia la ETag"
+    assert render_etag(key, 'abc123') != render_etag(render_key('tok', None, 'dark', 400, 90, None), 'abc123')
+
+
+def test_lru_byte_budget_and_ttl():
+    cache = BoundedLRUCache(max_entries=10, max_bytes=10, ttl=60)
+    cache.set('a', 'xxxx')
+    cache.set('b', 'yyyy')
+    cache.get('a')
+    cache.set('c', 'zzzz')  # supera 10 bytes: desaloja 'b' (menos reciente)
+    assert 'b' not in cache and 'a' in cache and 'c' in cache
+    assert cache.info()['evictions'] == 1
+    assert not cache.set('big', 'x' * 11), "Las entradas mayores que el presupuesto no se guardan"
+
+    short = BoundedLRUCache(ttl=0.05)
+    short.set('a', 'x')
+    time.sleep(0.06)
+    assert short.get('a') is None and short.info()['expirations'] == 1
+
+
+def test_render_cache_invalidate_token():
+    cache = RenderCache(ttl=60)
+    key_a = render_key('tok-a', None, 'dark', 400, 90, SESSION)
+    key_b = render_key('tok-b', None, 'dark', 400, 90, SESSION)
+    cache.set(key_a, '<svg>a</svg>')
+    cache.set(key_b, '<svg>b</svg>')
+    assert cache.get(key_a).body == b'<svg>a</svg>'
+    cache.invalidate_token('tok-a')
+    assert cache.get(key_a) is None and cache.get(key_b).body == b'<svg>b</svg>'
+    info = cache.info()
+    assert info['hits'] == 2 and info['misses'] == 1
+
+
+class Accept:
+    def __init__(self, *encodings):
+        self.encodings = encodings
+
+    def quality(self, encoding):
+        return 1 if encoding in self.encodings else 0
+
+
+def test_rendered_svg_precompressed_variants():
+    svg = '<svg>' + '<rect width="2" height="4"/>' * 200 + '</svg>'
+    rendered = RenderCache(ttl=60).set('key', svg)
+    assert isinstance(rendered, RenderedSVG)
+    data, encoding = rendered.variant(Accept('gzip'))
+    assert encoding == 'gzip' and gzip.decompress(data).decode() == svg
+    assert rendered.variant(Accept()) == (svg.encode(), None)
+    assert rendered.variant(None) == (svg.encode(), None)
+    if 'br' in rendered.encodings:
+        assert rendered.variant(Accept('gzip', 'br'))[1] in ('br', 'gzip')
+    print('✅ Test render cache passed')
+
+
+class FakeRedis:
+    """Lo justo de Redis para la caché compartida (GET, SET EX, SADD, SMEMBERS, EXPIRE, SCAN, DEL)."""
+
+    def __init__(self):
+        self.data = {}
+        self.scans = 0
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+        return True
+
+    def sadd(self, key, *members):
+        self.data.setdefault(key, set()).update(m.encode() for m in members)
+
+    def smembers(self, key):
+        return set(self.data.get(key, ()))
+
+    def expire(self, key, seconds):
+        return key in self.data
+
+    def scan_iter(self, match='*', count=None):
+        self.scans += 1
+        return [key for key in list(self.data) if fnmatch.fnmatchcase(key, match)]
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+
+class DownRedis:
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise ConnectionError("redis caído")
+        return fail
+
+
+def test_binary_format_roundtrip():
+    svg = '<svg>' + '<rect width="2" height="4"/>' * 200 + '</svg>'
+    rendered = RenderedSVG.compress(svg)
+    raw = rendered.to_bytes()
+    assert len(raw) < len(svg) / 4, "El valor guarda sólo las variantes comprimidas"
+    restored = RenderedSVG.from_bytes(raw)
+    assert restored.body == svg.encode() and restored.complete
+    assert restored.encodings == rendered.encodings
+    for bad in (b'', b'XYZ\x01', raw[:20]):
+        try:
+            RenderedSVG.from_bytes(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"Valor corrupto aceptado: {bad[:8]!r}")
+
+
+def test_shared_cache_across_workers():
+    redis = FakeRedis()
+    worker_a = RenderCache(ttl=60, redis_client=redis, shared=True)
+    worker_b = RenderCache(ttl=60, redis_client=redis, shared=True)
+    key = render_key('tok', None, 'dark', 400, 90, SESSION)
+    worker_a.set(key, '<svg>a</svg>')
+    worker_a.set(render_key('otro', None, 'dark', 400, 90, SESSION), '<svg>o</svg>')
+    rendered = worker_b.get(key)
+    assert rendered.body == b'<svg>a</svg>', "El render de un worker lo sirven todos"
+    assert worker_b.info()['shared_hits'] == 1
+    assert worker_b.get(render_key('tok', None, 'normal', 400, 90, SESSION)) is None
+    assert worker_b.info()['shared_misses'] == 1
+
+    worker_b.invalidate_token('tok')
+    assert worker_a.get(key) is not None, "La copia local del otro worker sigue hasta su TTL"
+    assert RenderCache(ttl=60, redis_client=redis, shared=True).get(key) is None
+    assert redis.scans == 0, "Invalidar un token no recorre todo Redis"
+    assert RenderCache(ttl=60, redis_client=redis, shared=True).get(
+        render_key('otro', None, 'dark', 400, 90, SESSION)) is not None
+
+
+def test_redis_failure_degrades_to_local_cache():
+    cache = RenderCache(ttl=60, redis_client=DownRedis(), shared=True)
+    key = render_key('tok', None, 'dark', 400, 90, SESSION)
+    assert cache.set(key, '<svg>a</svg>').body == b'<svg>a</svg>'
+    assert cache.get(key).body == b'<svg>a</svg>'
+    assert cache.get('otra') is None
+    info = cache.info()
+    assert info['shared_errors'] == 1, "Tras un fallo no se reintenta Redis hasta RENDER_CACHE_REDIS_RETRY"
+    assert info['shared_enabled'] is False
+
+
+def test_coverless_render_is_not_cached_or_tagged():
+    import app as app_module
+    from api import svg_generator
+
+    def no_cover(url, **kwargs):
+        raise ConnectionError("portada no disponible")
+
+    session = dict(SESSION, thumb='http://plex/thumb/sin-portada')
+    key = render_key('tok', None, 'dark', 400, 90, session)
+    real_http_get, svg_generator.http_get = svg_generator.http_get, no_cover
+    try:
+        rendered = app_module.render_svg(key, 'dark', 400, 90, session)
+        assert not rendered.complete and b'<svg' in rendered.body
+        assert app_module.render_cache.get(key) is None, "El render sin portada no debe cachearse"
+        with app_module.app.test_request_context('/api/now-playing'):
+            resp = app_module.svg_response(rendered, 'etag-x', 'no-cache')
+        assert 'ETag' not in resp.headers and 'no-store' in resp.headers['Cache-Control']
+    finally:
+        svg_generator.http_get = real_http_get
+
+
+def test_not_modified_echoes_matched_encoding_tag():
+    import app as app_module
+
+    headers = {'If-None-Match': '"etag-x-gzip"'}
+    with app_module.app.test_request_context('/api/now-playing', headers=headers):
+        matched = app_module.matched_etag('etag-x')
+        resp = app_module.not_modified_response(matched, 'no-cache')
+    assert matched == 'etag-x-gzip' and resp.status_code == 304
+    assert resp.headers['ETag'] == '"etag-x-gzip"' and resp.headers['Vary'] == 'Accept-Encoding'
+    with app_module.app.test_request_context('/api/now-playing', headers=headers):
+        assert app_module.matched_etag('etag-x', force_refresh=True) is None
+        assert app_module.matched_etag('etag-y') is None
+
+
+if __name__ == '__main__':
+    try:
+        test_render_keys_separate_variants()
+        test_render_etag_is_stable()
+        test_lru_byte_budget_and_ttl()
+        test_render_cache_invalidate_token()
+        test_rendered_svg_precompressed_variants()
+        test_binary_format_roundtrip()
+        test_shared_cache_across_workers()
+        test_redis_failure_degrades_to_local_cache()
+        print('✅ Test render cache compartida passed')
+        test_coverless_render_is_not_cached_or_tagged()
+        print('✅ Test render sin portada passed')
+        test_not_modified_echoes_matched_encoding_tag()
+        print('✅ Test 304 con la etiqueta de la codificación passed')
+        sys.exit(0)
+    except AssertionError as e:
+        print('❌', e)
+        sys.exit(1)
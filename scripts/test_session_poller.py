@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Test del poller de sesiones: la instantánea se refresca en segundo plano y se lee sin llamar a Plex."""
+import sys
+import os
+import time
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import session_poller
+from api.session_poller import SessionPoller
+
+
+class FakeClient:
+    owner_username = 'owner'
+
+    def __init__(self):
+        self.calls = 0
+
+    def is_connected(self):
+        return True
+
+    def get_active_sessions(self):
+        self.calls += 1
+        return [
+            {'title': 'Otra', 'user': 'guest'},
+            {'title': f'Canción {self.calls}', 'user': 'owner'},
+        ]
+
+
+def test_poller_serves_snapshot():
+    client = FakeClient()
+    poller = SessionPoller('token', interval=0.02, client_getter=lambda token: client).start()
+    try:
+        deadline = time.time() + 2
+        while poller.snapshot() is None and time.time() < deadline:
+            time.sleep(0.01)
+        snap = poller.snapshot()
+        assert snap is not None, "El poller debe publicar una instantánea"
+        assert snap.get()['user'] == 'owner', "Sin usuario se filtra por el propietario"
+        assert snap.get('guest')['title'] == 'Otra'
+        assert snap.get('nadie') is None
+        calls = client.calls
+        for _ in range(100):
+            poller.snapshot().get('owner')
+        assert client.calls - calls <= 5, "Leer la instantánea no debe consultar Plex"
+    finally:
+        poller.stop()
+    print('✅ Test session poller passed')
+
+
+def test_refresh_during_poll_is_not_lost():
+    in_poll, release = threading.Event(), threading.Event()
+
+    class SlowClient(FakeClient):
+        def get_active_sessions(self):
+            if self.calls == 0:
+                in_poll.set()
+                release.wait(5)
+            return super().get_active_sessions()
+
+    client = SlowClient()
+    # Sin intervalo: sólo refresca cuando se le pide (modo notificaciones)
+    poller = SessionPoller('token', interval=None, client_getter=lambda token: client).start()
+    try:
+        assert in_poll.wait(2)
+        poller.refresh_now()  # llega mientras la primera consulta está en curso
+        release.set()
+        deadline = time.time() + 2
+        while client.calls < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        assert client.calls == 2, "Un refresh_now() durante la consulta debe provocar otra"
+    finally:
+        poller.stop()
+
+
+def test_idle_poller_stops_and_retires():
+    client = FakeClient()
+    retired = []
+    poller = SessionPoller('token', interval=0.01, client_getter=lambda token: client,
+                           idle_intervals=3, on_idle=retired.append).start()
+    deadline = time.time() + 2
+    while not retired and time.time() < deadline:
+        time.sleep(0.01)
+    assert retired == [poller], "Sin peticiones el poller se detiene solo"
+    calls = client.calls
+    time.sleep(0.05)
+    assert client.calls == calls
+
+
+def test_pollers_only_for_known_tokens_and_capped():
+    saved = (session_poller.SESSION_POLL_INTERVAL, session_poller.SESSION_POLL_MAX_TOKENS,
+             os.environ.get('PLEX_TOKEN'), session_poller.get_client_pool, session_poller.get_plex_client)
+    known = {'conectado-1', 'conectado-2'}
+
+    class Pool:
+        def has_client(self, token):
+            return token in known
+
+    session_poller.SESSION_POLL_INTERVAL = 60
+    session_poller.SESSION_POLL_MAX_TOKENS = 2
+    session_poller.get_client_pool = Pool
+    session_poller.get_plex_client = lambda token: FakeClient()
+    os.environ['PLEX_TOKEN'] = 'configurado'
+    try:
+        assert session_poller.get_session_poller('basura') is None, "Un token desconocido no arranca un hilo"
+        first = session_poller.get_session_poller()
+        assert first is not None and session_poller.get_session_poller('configurado') is first
+        assert session_poller.get_session_poller('conectado-1') is not None
+        assert session_poller.get_session_poller('conectado-2') is None, "Con el tope alcanzado no se crean más"
+    finally:
+        for poller in list(session_poller._pollers.values()):
+            poller.stop()
+        session_poller._pollers.clear()
+        (session_poller.SESSION_POLL_INTERVAL, session_poller.SESSION_POLL_MAX_TOKENS,
+         token, session_poller.get_client_pool, session_poller.get_plex_client) = saved
+        if token is None:
+            os.environ.pop('PLEX_TOKEN', None)
+        else:
+            os.environ['PLEX_TOKEN'] = token
+
+
+if __name__ == '__main__':
+    try:
+        test_poller_serves_snapshot()
+        test_refresh_during_poll_is_not_lost()
+        print('✅ Test refresco durante la consulta passed')
+        test_idle_poller_stops_and_retires()
+        test_pollers_only_for_known_tokens_and_capped()
+        print('✅ Test límites de pollers passed')
+        sys.exit(0)
+    except AssertionError as e:
+        print('❌', e)
+        sys.exit(1)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Test del usuario de una sesión: sale de session.usernames (XML) sin consultar plex.tv."""
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import plex_client
+
+
+class FakeSession:
+    title, type, state = 'Canción', 'track', 'playing'
+    grandparentTitle, parentTitle, thumb = 'Artista', 'Álbum', None
+
+    def __init__(self, usernames, user_title=None):
+        self.usernames = usernames
+        self._user_title = user_title
+        self.user_lookups = 0
+
+    @property
+    def user(self):
+        # En plexapi session.user resuelve la cuenta en plex.tv
+        self.user_lookups += 1
+        return type('Account', (), {'title': self._user_title})()
+
+
+def make_client():
+    client = plex_client.PlexClient.__new__(plex_client.PlexClient)
+    client.url, client.token, client._resource = 'http://plex:32400', 'tok', None
+    return client
+
+
+def test_session_user_comes_from_usernames():
+    session = FakeSession(['alice'])
+    assert make_client()._normalize_session(session)['user'] == 'alice'
+    assert session.user_lookups == 0, "Con usernames no se consulta plex.tv"
+
+
+def test_session_user_falls_back_to_account():
+    session = FakeSession([], user_title='bob')
+    assert make_client()._normalize_session(session)['user'] == 'bob'
+    assert session.user_lookups == 1
+    print('✅ Test usuario de sesión passed')
+
+
+if __name__ == '__main__':
+    try:
+        test_session_user_comes_from_usernames()
+        test_session_user_falls_back_to_account()
+        sys.exit(0)
+    except AssertionError as e:
+        print('❌', e)
+        sys.exit(1)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""Test de la coalescencia single-flight: en proceso y entre workers con Redis."""
+import sys
+import os
+import time
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.singleflight import SingleFlight
+
+
+class FakeRedis:
+    """Lo justo de Redis para el lock (SET NX PX, GET, EXISTS, EVAL de liberación)."""
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def set(self, key, value, nx=False, px=None):
+        with self.lock:
+            if nx and key in self.data:
+                return None
+            self.data[key] = value.encode() if isinstance(value, str) else value
+            return True
+
+    def get(self, key):
+        with self.lock:
+            return self.data.get(key)
+
+    def exists(self, key):
+        with self.lock:
+            return int(key in self.data)
+
+    def eval(self, script, numkeys, key, owner):
+        with self.lock:
+            if self.data.get(key) == owner.encode():
+                del self.data[key]
+                return 1
+            return 0
+
+
+def _run_concurrently(fns):
+    results = [None] * len(fns)
+
+    def run(i):
+        results[i] = fns[i]()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(fns))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    return results
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight(use_redis=False)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return {'title': 'T'}
+
+    results = _run_concurrently([lambda: flight.do('tok:user', fetch)] * 5)
+    assert len(calls) == 1 and all(r == {'title': 'T'} for r in results)
+    assert flight.info()['leaders'] == 1 and flight.info()['shared'] == 4 and flight.info()['inflight'] == 0
+    # Terminado el vuelo, la siguiente llamada vuelve a ejecutar
+    flight.do('tok:user', fetch)
+    assert len(calls) == 2
+
+
+def test_errors_propagate_to_waiters():
+    flight = SingleFlight(use_redis=False)
+
+    def boom():
+        time.sleep(0.1)
+        raise ValueError('plex caído')
+
+    def call():
+        try:
+            flight.do('k', boom)
+        except ValueError as e:
+            return str(e)
+
+    assert _run_concurrently([call] * 3) == ['plex caído'] * 3
+
+
+def test_workers_share_result_through_redis():
+    redis = FakeRedis()
+    worker_a = SingleFlight(redis_client=redis, use_redis=True)
+    worker_b = SingleFlight(redis_client=redis, use_redis=True)
+    calls = []
+
+    def fetch(name):
+        def run():
+            calls.append(name)
+            time.sleep(0.2)
+            return {'title': name}
+        return run
+
+    def second():
+        time.sleep(0.05)
+        return worker_b.do('tok:user', fetch('b'), shared=True)
+
+    results = _run_concurrently([lambda: worker_a.do('tok:user', fetch('a'), shared=True), second])
+    assert calls == ['a'] and results == [{'title': 'a'}, {'title': 'a'}]
+    assert worker_b.info()['remote_shared'] == 1
+    assert not redis.exists('music2sig:flight:tok:user:lock'), "El lock se libera al terminar"
+    print('✅ Test single-flight passed')
+
+
+if __name__ == '__main__':
+    try:
+        test_concurrent_calls_share_one_execution()
+        test_errors_propagate_to_waiters()
+        test_workers_share_result_through_redis()
+        sys.exit(0)
+    except AssertionError as e:
+        print('❌', e)
+        sys.exit(1)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Tests del generador SVG: plantillas compiladas, modo compacto de barras y descarga de portadas."""
+import sys
+import os
+import io
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+import api.svg_generator as svg_generator
+from api.svg_generator import SVGGenerator
+from api.svg_templates import clear_templates
+from api.image_pool import shrink_cover
+
+SESSION = {'title': 'A & <B>', 'artist': 'Artista', 'album': 'Álbum'}
+
+
+def test_compiled_template_matches_cold_render():
+    gen = SVGGenerator(400, 90, 'dark')
+    clear_templates()
+    cold = gen.generate_now_playing_svg(SESSION)
+    warm = gen.generate_now_playing_svg(SESSION)
+    assert cold == warm
+    assert 'A &amp; &lt;B&gt;' in warm
+    assert 'Artista - Álbum' in warm
+
+
+def test_compact_bars_are_smaller_and_equivalent():
+    for theme in ('normal', 'bars'):
+        full = SVGGenerator(400, 90, theme, compact=False).generate_now_playing_svg(SESSION)
+        compact = SVGGenerator(400, 90, theme, compact=True).generate_now_playing_svg(SESSION)
+        assert '<animate' not in compact and '@keyframes m2s-bar' in compact
+        assert compact.count('<rect class="m2s-bar"') == full.count('attributeName="height"'), "Mismo número de barras"
+        assert len(compact) < len(full) / 2, "El modo compacto debe reducir el tamaño a menos de la mitad"
+
+
+class _Resp:
+    def __init__(self, status_code, content=b''):
+        self.status_code = status_code
+        self.content = content
+
+
+def _jpeg(size):
+    buf = io.BytesIO()
+    Image.new('RGB', (size, size), (200, 30, 30)).save(buf, format='JPEG')
+    return buf.getvalue()
+
+
+def test_cover_falls_back_to_original_artwork():
+    requested = []
+    original = _jpeg(600)
+
+    def fake_get(url, read_timeout=None):
+        requested.append(url)
+        return _Resp(404) if '/photo/:/transcode' in url else _Resp(200, original)
+
+    session = {
+        'title': 'T',
+        'thumb': 'http://plex/photo/:/transcode?width=160&height=160&url=%2Flibrary%2Fmetadata%2F7%2Fthumb%2F1',
+        'thumb_original': 'http://plex/library/metadata/7/thumb/1',
+    }
+    saved = (svg_generator.http_get, svg_generator.get_artwork_store)
+    svg_generator.http_get = fake_get
+    svg_generator.get_artwork_store = lambda: None
+    try:
+        data_url = SVGGenerator(400, 90, 'dark')._get_cover_data_url(session)
+    finally:
+        svg_generator.http_get, svg_generator.get_artwork_store = saved
+    assert requested == [session['thumb'], session['thumb_original']]
+    assert data_url and data_url.startswith('data:image/jpeg;base64,')
+    cached = SVGGenerator._thumb_cache.get(session['thumb'])
+    assert max(Image.open(io.BytesIO(cached.jpeg_bytes)).size) <= 160, "La original se reduce localmente"
+    assert cached.palettes.get(6), "La paleta se calcula en el mismo trabajo que la reducción"
+    # Una portada ya transcodificada (JPEG pequeño) no se vuelve a codificar
+    small = _jpeg(160)
+    assert shrink_cover(small) is small
+    print('✅ Test SVG generator passed')
+
+
+if __name__ == '__main__':
+    try:
+        test_compiled_template_matches_cold_render()
+        test_compact_bars_are_smaller_and_equivalent()
+        test_cover_falls_back_to_original_artwork()
+        sys.exit(0)
+    except AssertionError as e:
+        print('❌', e)
+        sys.exit(1)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Test de stale-while-revalidate: frescura, refresco en segundo plano y gracia ante errores."""
+import sys
+import os
+import time
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.render_cache import RenderedSVG, badge_key
+from api.swr import StaleWhileRevalidate, FRESH, STALE
+
+BADGE = badge_key('tok', 'user', 'dark', 400, 90)
+
+
+def _swr(**kwargs):
+    options = dict(enabled=True, ttl=10, max_staleness=300, error_grace=3600)
+    options.update(kwargs)
+    swr = StaleWhileRevalidate(**options)
+    swr.record(BADGE, 'etag-1', RenderedSVG.compress('<svg>a</svg>'))
+    return swr
+
+
+def _age(swr, seconds):
+    swr._latest.peek(BADGE)[0].created -= seconds
+
+
+def test_fresh_stale_and_expired():
+    swr = _swr()
+    entry, state = swr.lookup(BADGE)
+    assert state == FRESH and entry.etag == 'etag-1'
+    _age(swr, 60)
+    assert swr.lookup(BADGE)[1] == STALE
+    _age(swr, 600)
+    assert swr.lookup(BADGE) == (None, None), "Más allá de max_staleness hay que esperar a Plex"
+    assert swr.fallback(BADGE).etag == 'etag-1', "Dentro de la gracia por error se sigue sirviendo"
+    _age(swr, 7200)
+    assert swr.fallback(BADGE) is None
+    assert StaleWhileRevalidate(enabled=False).lookup(BADGE) == (None, None)
+
+
+def test_invalidation_forces_revalidation_but_keeps_fallback():
+    swr = _swr()
+    time.sleep(0.01)
+    swr.invalidate_token('tok')
+    assert swr.lookup(BADGE) == (None, None)
+    assert swr.fallback(BADGE) is not None
+    swr.record(BADGE, 'etag-2', RenderedSVG.compress('<svg>b</svg>'))
+    assert swr.lookup(BADGE)[0].etag == 'etag-2'
+
+
+def test_one_background_refresh_per_badge():
+    swr = _swr()
+    release, done = threading.Event(), threading.Event()
+    calls = []
+
+    def refresh():
+        calls.append(1)
+        release.wait(5)
+        swr.record(BADGE, 'etag-3', RenderedSVG.compress('<svg>c</svg>'))
+        done.set()
+
+    assert swr.schedule(BADGE, refresh)
+    assert not swr.schedule(BADGE, refresh), "Ya hay un refresco en curso"
+    release.set()
+    assert done.wait(5)
+    assert calls == [1] and swr.lookup(BADGE)[0].etag == 'etag-3'
+    print('✅ Test SWR passed')
+
+
+def test_badge_falls_back_when_render_fails_or_plex_unreachable():
+    import app as app_module
+
+    class DisconnectedClient:
+        def is_connected(self):
+            return False
+
+    saved = (app_module.swr, app_module.fetch_badge, app_module.get_plex_client)
+    app_module.swr = swr = _swr(ttl=0)
+    badge = badge_key('tok', 'user', 'dark', 400, 90)
+    try:
+        def broken_render():
+            raise RuntimeError("render roto")
+
+        app_module.fetch_badge = lambda *args, **kwargs: ('etag-nueva', broken_render)
+        etag, render = app_module.resolve_badge('tok', 'user', 'dark', 400, 90, force_refresh=True)
+        rendered = render()
+        assert rendered.body == b'<svg>a</svg>' and not rendered.complete, "Un fallo al renderizar sirve el último render"
+
+        app_module.fetch_badge = saved[1]
+        app_module.get_plex_client = lambda token: DisconnectedClient()
+        etag, render = app_module.resolve_badge('tok', 'user', 'dark', 400, 90, force_refresh=True)
+        assert etag == 'etag-1' and render().body == b'<svg>a</svg>', "Con Plex inaccesible se sirve el último render"
+        assert swr.fallback(badge).etag == 'etag-1'
+        app_module.swr = _swr(error_grace=-1)
+        try:
+            app_module.resolve_badge('tok', 'user', 'dark', 400, 90, force_refresh=True)
+        except app_module.PlexUnavailable:
+            pass
+        else:
+            raise AssertionError("Sin último render bueno el error llega a la ruta")
+    finally:
+        app_module.swr, app_module.fetch_badge, app_module.get_plex_client = saved
+
+
+if __name__ == '__main__':
+    try:
+        test_fresh_stale_and_expired()
+        test_invalidation_forces_revalidation_but_keeps_fallback()
+        test_one_background_refresh_per_badge()
+        test_badge_falls_back_when_render_fails_or_plex_unreachable()
+        sys.exit(0)
+    except AssertionError as e:
+        print('❌', e)
+        sys.exit(1)
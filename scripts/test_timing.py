@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Test de los tiempos por etapa: acumulación, propagación a hilos y cabecera Server-Timing."""
+import sys
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import timing
+from api.timing import stage, bind
+
+
+def test_stage_is_noop_outside_request():
+    assert timing.current() is None
+    with stage('sessions'):
+        pass
+    assert timing.current() is None
+
+    def fn():
+        return 1
+    assert bind(fn) is fn
+
+
+def test_stages_accumulate_and_render_header():
+    token = timing.begin()
+    try:
+        with stage('sessions'):
+            time.sleep(0.01)
+        for _ in range(3):
+            with stage('history'):
+                pass
+        timings = timing.current()
+        header = timings.header()
+        line = json.loads(timings.log_line(path='/api/now-playing', status=200))
+    finally:
+        timing.end(token)
+
+    names = [part.split(';')[0] for part in header.split(', ')]
+    assert names == ['sessions', 'history', 'total'], header
+    assert float(header.split(', ')[0].split('dur=')[1]) >= 10
+    assert line['path'] == '/api/now-playing' and line['status'] == 200
+    assert line['stages']['history']['n'] == 3
+    assert isinstance(line['stages']['sessions'], float)
+    assert timing.current() is None
+
+
+def test_bind_records_stages_from_pool_threads():
+    token = timing.begin()
+    try:
+        def work():
+            with stage('cover_download'):
+                pass
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            pool.submit(bind(work)).result()
+            pool.submit(work).result()  # sin bind no llega a la petición
+        stages = timing.current().snapshot()
+    finally:
+        timing.end(token)
+    assert stages['cover_download'][1] == 1
+
+
+def test_flask_response_carries_server_timing():
+    import app as app_module
+
+    with app_module.app.test_client() as client:
+        resp = client.get('/api/cache/clear')
+    assert 'total;dur=' in resp.headers.get('Server-Timing', '')
+    assert timing.current() is None
+
+
+if __name__ == '__main__':
+    test_stage_is_noop_outside_request()
+    print("✅ Test stage fuera de petición passed")
+    test_stages_accumulate_and_render_header()
+    print("✅ Test acumulación y cabecera passed")
+    test_bind_records_stages_from_pool_threads()
+    print("✅ Test propagación a hilos passed")
+    test_flask_response_carries_server_timing()
+    print("✅ Test cabecera en la respuesta Flask passed")
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""Test de la versión del build: entorno, fichero VERSION y git, resuelta una sola vez."""
+import sys
+import os
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api.version as version
+
+
+def test_version_sources_in_order():
+    saved = {k: os.environ.pop(k, None) for k in ('APP_VERSION', 'VERCEL_GIT_COMMIT_SHA')}
+    try:
+        os.environ['VERCEL_GIT_COMMIT_SHA'] = '0123456789abcdef'
+        assert version.resolve_version() == '0123456'
+        os.environ['APP_VERSION'] = '1.2.3'
+        assert version.resolve_version() == '1.2.3', "APP_VERSION tiene prioridad"
+        del os.environ['APP_VERSION'], os.environ['VERCEL_GIT_COMMIT_SHA']
+        with tempfile.NamedTemporaryFile('w', suffix='VERSION', delete=False) as fh:
+            fh.write('abc1234\n')
+        try:
+            assert version._from_file(fh.name) == 'abc1234'
+        finally:
+            os.unlink(fh.name)
+        assert version._from_file(fh.name) is None
+    finally:
+        for key, value in saved.items():
+            os.environ.pop(key, None)
+            if value is not None:
+                os.environ[key] = value
+    assert version.BUILD_VERSION, "La versión se resuelve al importar"
+    print('✅ Test version passed')
+
+
+if __name__ == '__main__':
+    try:
+        test_version_sources_in_order()
+        sys.exit(0)
+    except AssertionError as e:
+        print('❌', e)
+        sys.exit(1)